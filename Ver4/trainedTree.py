@@ -1,17 +1,26 @@
+import os
+import sys
 import pandas as pd
 import numpy as np
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.preprocessing import LabelEncoder
-import joblib  # 🔁 NEW: for saving models
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dataset_cache import load_dataset
+from experiment_cache import ExperimentCache, array_digest, experiment_key
+from profiling import stage
+from tree_compiler import check_identical, compile_forest, generate_if_else_code
+from tree_store import write_store
 
 # ------------------------------
-# Load the Data
+# Load the Data (cached, already label-encoded)
 # ------------------------------
-df = pd.read_excel("Data_CM.xlsx", sheet_name="Sheet1")
+with stage("load_dataset"):
+    data = load_dataset("Data_CM.xlsx", sheet_name="Sheet1")
 
-enzyme_names = df.iloc[:, 0]
-label = df.iloc[:, -1]
-features = df.iloc[:, 1:-1]
+enzyme_names = data.enzyme_names
+feature_names = data.feature_names
+features = data.X
 
 # ------------------------------
 # Define Feature Categories
@@ -27,93 +36,70 @@ categories = {
 }
 
 # ------------------------------
-# Encode the Label
-# ------------------------------
-le_label = LabelEncoder()
-y_encoded = le_label.fit_transform(label)
-
-# ------------------------------
-# Safe Encoding Helper
-# ------------------------------
-def safe_label_encoding(column):
-    le = LabelEncoder()
-    encoded = le.fit_transform(column)
-    reverse_map = dict(zip(range(len(le.classes_)), le.classes_))
-    return encoded, reverse_map
-
-# ------------------------------
-# Generate C-style If-Else Tree
+# Encoded Label (classes kept for decoding leaves)
 # ------------------------------
-def generate_if_else_code(tree, feature_names, label_encoder, reverse_maps):
-    tree_ = tree.tree_
-    feature_name = [
-        feature_names[i] if i != -2 else "undefined!"
-        for i in tree_.feature
-    ]
-
-    def recurse(node, depth):
-        indent = "    " * depth
-        if tree_.feature[node] != -2:
-            name = feature_name[node]
-            threshold = tree_.threshold[node]
-            threshold = int(threshold + 0.5)
-
-            if name in reverse_maps:
-                val = reverse_maps[name].get(threshold, f"<UNK_{threshold}>")
-                left = recurse(tree_.children_left[node], depth + 1)
-                right = recurse(tree_.children_right[node], depth + 1)
-                return (
-                    f'{indent}if (strcmp({name}, "{val}") == 0) {{\n'
-                    f'{left}\n{indent}}} else {{\n{right}\n{indent}}}'
-                )
-            else:
-                left = recurse(tree_.children_left[node], depth + 1)
-                right = recurse(tree_.children_right[node], depth + 1)
-                return (
-                    f"{indent}if ({name} <= {threshold}) {{\n"
-                    f"{left}\n{indent}}} else {{\n{right}\n{indent}}}"
-                )
-        else:
-            value = np.argmax(tree_.value[node])
-            class_name = label_encoder.inverse_transform([value])[0]
-            return f'{indent}return "{class_name}";'
-
-    return recurse(0, 0)
+le_label = LabelEncoder().fit(data.label_classes)
+y_encoded = data.y
 
 # ------------------------------
 # Train Trees and Generate Output
 # ------------------------------
 output_lines = []
+trained = {}
+cache = ExperimentCache.default()
 
 for category, indices in categories.items():
-    X = features.iloc[:, indices].copy()
-    reverse_maps = {}
+    columns = [feature_names[j] for j in indices]
+    X = pd.DataFrame(features[:, indices], columns=columns)
 
-    for col in X.columns:
-        if X[col].dtype == "object":
-            X[col], rev_map = safe_label_encoding(X[col])
-            reverse_maps[col] = rev_map
+    # Categorical columns were encoded by safe_label_encoding in the loader
+    reverse_maps = {col: data.reverse_maps[col] for col in columns if col in data.reverse_maps}
 
-    clf = DecisionTreeClassifier(random_state=42)
-    clf.fit(X, y_encoded)
-
-    # 🔁 Save trained model
-    model_filename = f"model_{category}.pkl"
-    joblib.dump(clf, model_filename)
+    # Fitted trees are reused while the data and parameters are unchanged
+    params = {"random_state": 42}
+    with stage("fit", category=category):
+        if cache is None:
+            clf = DecisionTreeClassifier(**params).fit(X, y_encoded)
+        else:
+            key = experiment_key(kind="fit", data=array_digest(X.to_numpy(), y_encoded),
+                                 feature_names=columns, params=params)
+            clf = cache.memoize(key, lambda: DecisionTreeClassifier(**params).fit(X, y_encoded))
+
+    # Executable counterpart of the generated code: packed node arrays that
+    # must reproduce sklearn's predictions on the training rows
+    with stage("predict", category=category):
+        identical = check_identical(clf, compile_forest(clf), X)
+    if not identical:
+        raise RuntimeError(f"compiled tree for {category} disagrees with sklearn")
+
+    # 🔁 Keep trained model for the model store
+    trained[category] = {
+        "model": clf,
+        "columns": indices,
+        "feature_names": columns,
+        "reverse_maps": reverse_maps,
+    }
 
     # Generate code
-    code = generate_if_else_code(clf, list(X.columns), le_label, reverse_maps)
+    with stage("codegen", category=category):
+        code = generate_if_else_code(clf, list(X.columns), le_label, reverse_maps)
     output_lines.append(f"// Category: {category}")
     output_lines.append("const char* predict(...) {")
     output_lines.append(code)
     output_lines.append("}")
     output_lines.append("=" * 60)
 
+# ------------------------------
+# Save Models (one memory-mappable file, see tree_store.py)
+# ------------------------------
+with stage("write_model_store"):
+    write_store("models.trees", trained, le_label.classes_)
+
 # ------------------------------
 # Save C-style Code to File
 # ------------------------------
-with open("result_C_code.txt", "w") as f:
+with stage("write_results"), open("result_C_code.txt", "w") as f:
     f.write("\n".join(output_lines))
 
-print("✅ C-code generated and models saved as model_<Category>.pkl")
+print("✅ C-code generated and models saved to models.trees")
 
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+# ------------------------------
+# Vectorized classify_murzyme
+# ------------------------------
+# classify_murzyme() in kmm_paper_reprised.ipynb walks one dict and, for
+# every feature that is not None, adds a hard-coded weight to either the
+# classical or the murzyme score. Here the weights live in a config file
+# (murzyme_weights.json) and become one (2 * feature x side) matrix: the
+# first half applies when "value == if_equal", the second half otherwise. A
+# whole feature matrix plus its missing-value mask is scored with one masked
+# matrix product.
+#
+# classify_murzyme returns UNPREDICTABLE only on exact float ties, and float
+# sums of weights such as 0.8 and 0.9 depend on summation order. Rows whose
+# two scores come out within TIE_TOLERANCE of each other are therefore
+# re-summed feature by feature in config order, exactly like the dict
+# version's sequential "+=", so labels always match it.
+
+DEFAULT_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "murzyme_weights.json")
+SIDES = ("classical", "murzyme")
+TIE_TOLERANCE = 1e-9
+
+CLASSICAL, MURZYME, UNPREDICTABLE = "CLASSICAL", "MURZYME", "UNPREDICTABLE"
+
+
+class WeightTable:
+    """Scoring weights as arrays.
+
+    names     feature names, in scoring order
+    if_equal  (n_features,) value that selects the 'then' weights
+    then      (n_features, 2) weights added when value == if_equal
+    other     (n_features, 2) weights added otherwise
+    Columns of then/other are (classical, murzyme).
+    """
+
+    def __init__(self, names, if_equal, then, other):
+        self.names = list(names)
+        self.if_equal = np.asarray(if_equal, dtype=np.float64)
+        self.then = np.asarray(then, dtype=np.float64)
+        self.other = np.asarray(other, dtype=np.float64)
+
+    @classmethod
+    def from_config(cls, config):
+        names, if_equal, then, other = [], [], [], []
+        for entry in config["features"]:
+            names.append(entry["name"])
+            if_equal.append(entry["if_equal"])
+            then.append([entry["then"].get(side, 0.0) for side in SIDES])
+            other.append([entry["else"].get(side, 0.0) for side in SIDES])
+            unknown = (set(entry["then"]) | set(entry["else"])) - set(SIDES)
+            if unknown:
+                raise ValueError(f"{entry['name']}: unknown score(s) {sorted(unknown)}")
+        return cls(names, if_equal, then, other)
+
+
+def load_weights(path=DEFAULT_WEIGHTS_PATH):
+    with open(path) as f:
+        return WeightTable.from_config(json.load(f))
+
+
+# ------------------------------
+# Inputs
+# ------------------------------
+def features_from_dicts(dicts, names):
+    """Stack classify_murzyme-style dicts into (values, missing) arrays."""
+    values = np.zeros((len(dicts), len(names)), dtype=np.float64)
+    missing = np.ones((len(dicts), len(names)), dtype=bool)
+    for i, d in enumerate(dicts):
+        for j, name in enumerate(names):
+            v = d.get(name)
+            if v is not None:
+                values[i, j] = v
+                missing[i, j] = False
+    return values, missing
+
+
+# ------------------------------
+# Scoring
+# ------------------------------
+def _sequential_scores(equal, other, table):
+    # Feature-by-feature accumulation in config order (the dict version's order)
+    acc = np.zeros((equal.shape[0], 2), dtype=np.float64)
+    for j in range(equal.shape[1]):
+        acc += equal[:, j, None] * table.then[j] + other[:, j, None] * table.other[j]
+    return acc
+
+
+def score_batch(values, missing, table, chunk_rows=262_144):
+    """(classical, murzyme) score arrays for an (n_rows, n_features) batch."""
+    values = np.asarray(values, dtype=np.float64)
+    missing = np.asarray(missing, dtype=bool)
+    weights = np.concatenate([table.then, table.other])   # (2 * n_features, 2)
+    scores = np.empty((values.shape[0], 2), dtype=np.float64)
+
+    for start in range(0, values.shape[0], chunk_rows):
+        v = values[start:start + chunk_rows]
+        present = ~missing[start:start + chunk_rows]
+        equal = present & (v == table.if_equal)
+        other = present & ~equal
+
+        block = np.concatenate([equal, other], axis=1).astype(np.float64) @ weights
+        near_tie = np.abs(block[:, 0] - block[:, 1]) <= TIE_TOLERANCE
+        if near_tie.any():
+            block[near_tie] = _sequential_scores(equal[near_tie], other[near_tie], table)
+        scores[start:start + chunk_rows] = block
+
+    return scores[:, 0], scores[:, 1]
+
+
+def labels_from_scores(classical, murzyme):
+    # classify_murzyme always sets ZerothOrderKinetics = 1, which fails one of
+    # the consistency rules, so its label is decided by the score comparison.
+    labels = np.full(len(classical), UNPREDICTABLE, dtype=object)
+    labels[classical > murzyme] = CLASSICAL
+    labels[murzyme > classical] = MURZYME
+    return labels
+
+
+def classify_batch(values, missing, table=None):
+    table = load_weights() if table is None else table
+    return labels_from_scores(*score_batch(values, missing, table))
+
+
+def classify_dicts(dicts, table=None):
+    table = load_weights() if table is None else table
+    return classify_batch(*features_from_dicts(dicts, table.names), table)
+
+
+# ------------------------------
+# Agreement with the notebook's dict-based function
+# ------------------------------
+def random_inputs(n, table, seed=0, p_missing=0.3):
+    """Random feature dicts (0/1 values, some None) in classify_murzyme format."""
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 2, size=(n, len(table.names)))
+    missing = rng.random((n, len(table.names))) < p_missing
+    return [
+        {name: (None if missing[i, j] else int(values[i, j])) for j, name in enumerate(table.names)}
+        for i in range(n)
+    ]
+
+
+def verify_against_notebook(n=100_000, seed=0, table=None):
+    """Number of random inputs on which the batch labels differ from classify_murzyme."""
+    from kmm_notebook import load_definitions
+
+    table = load_weights() if table is None else table
+    classify_murzyme = load_definitions()["classify_murzyme"]
+    dicts = random_inputs(n, table, seed)
+    expected = [classify_murzyme(d) for d in dicts]
+    return int(sum(a != b for a, b in zip(expected, classify_dicts(dicts, table))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score proteins with the classify_murzyme weights in one batch")
+    parser.add_argument("input", nargs="?", help="CSV with one column per weighted feature; empty cells are missing")
+    parser.add_argument("-o", "--output", default="-", help="output CSV (default: stdout)")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS_PATH, help="weight config (JSON)")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--verify", type=int, metavar="N", help="compare against the notebook on N random inputs")
+    args = parser.parse_args(argv)
+
+    table = load_weights(args.weights)
+    if args.verify:
+        mismatches = verify_against_notebook(args.verify, table=table)
+        print(f"{mismatches} mismatches out of {args.verify} random inputs")
+        return 1 if mismatches else 0
+    if args.input is None:
+        parser.error("an input CSV is required unless --verify is given")
+
+    import pandas as pd
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        first = True
+        for frame in pd.read_csv(args.input, chunksize=args.chunk_size):
+            block = frame.reindex(columns=table.names).to_numpy(dtype=np.float64)
+            missing = np.isnan(block)
+            classical, murzyme = score_batch(np.nan_to_num(block), missing, table)
+            result = pd.DataFrame({"classical": classical, "murzyme": murzyme,
+                                   "label": labels_from_scores(classical, murzyme)})
+            result.to_csv(out, header=first, index=False)
+            first = False
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# ------------------------------
+# Benchmark suite for the hot paths
+# ------------------------------
+# Every case is timed on synthetic data shaped like the 20-feature schema of
+# random_forest.py, at row counts from 10^2 to 10^7. Cases that cannot
+# reasonably run at the largest sizes (per-row Python loops, tree fitting)
+# carry a row cap and are skipped above it. Results are written as JSON;
+# --compare reads two result files and flags cases that got slower.
+#
+#   python benchmark.py -o bench_before.json
+#   python benchmark.py -o bench_after.json
+#   python benchmark.py --compare bench_before.json bench_after.json
+
+DEFAULT_SIZES = (10**2, 10**3, 10**4, 10**5, 10**6, 10**7)
+DEFAULT_THRESHOLD = 0.10   # slowdown ratio reported as a regression
+DEFAULT_MIN_DELTA = 1e-3   # seconds; smaller slowdowns are timer noise
+
+# Columns that are 0-3 ordinals in random_forest.py (selectivity, specificity,
+# modulator diversity); every other feature is binary
+ORDINAL_COLUMNS = (10, 11, 12)
+N_FEATURES = 20
+CATEGORIES = {
+    "Structure": list(range(0, 5)),
+    "Theoretical": list(range(5, 10)),
+    "Experimental": list(range(10, 20)),
+}
+
+
+# ------------------------------
+# Synthetic data
+# ------------------------------
+def synthetic_features(n_rows, seed=0):
+    """(n_rows, 20) int8 matrix with the value ranges of random_forest.py."""
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 2, size=(n_rows, N_FEATURES), dtype=np.int8)
+    X[:, ORDINAL_COLUMNS] = rng.integers(0, 4, size=(n_rows, len(ORDINAL_COLUMNS)), dtype=np.int8)
+    return X
+
+
+def synthetic_labels(X, seed=0, noise=0.05):
+    """0/1 labels driven by the murburn-side features, with some label noise."""
+    rng = np.random.default_rng(seed + 1)
+    murburn_votes = X[:, [0, 5, 7, 8, 13, 14, 15, 16, 17, 18, 19]].sum(axis=1)
+    y = (murburn_votes > 5).astype(np.int64)
+    flip = rng.random(len(y)) < noise
+    y[flip] = 1 - y[flip]
+    return y
+
+
+class SyntheticData:
+    """Features and labels for one size; extra inputs are built on first use."""
+
+    def __init__(self, n_rows, seed=0):
+        self.n_rows = n_rows
+        self.seed = seed
+        self.X = synthetic_features(n_rows, seed)
+        self.y = synthetic_labels(self.X, seed)
+        self._extra = {}
+
+    def extra(self, name, build):
+        if name not in self._extra:
+            self._extra[name] = build()
+        return self._extra[name]
+
+
+# ------------------------------
+# Cases
+# ------------------------------
+# setup(data) does all preparation and returns the zero-argument callable
+# that is timed.
+Case = namedtuple("Case", ["name", "max_rows", "setup"])
+
+
+def _setup_information_gain(data):
+    from info_gain_engine import information_gain_all
+
+    return lambda: information_gain_all(data.X, data.y)
+
+
+def _setup_split_loop(data):
+    from split_evaluation import evaluate_categories
+
+    return lambda: evaluate_categories(data.X, data.y, CATEGORIES, n_splits=20, test_size=0.4)
+
+
+def _setup_rf_fit(data):
+    from sklearn.ensemble import RandomForestClassifier
+
+    return lambda: RandomForestClassifier(random_state=42, n_estimators=100).fit(data.X, data.y)
+
+
+def _setup_rf_predict(data):
+    from random_forest import train_forest
+
+    clf = train_forest()
+    X = data.X.astype(np.float32)
+    return lambda: clf.predict(X)
+
+
+def _setup_codegen(data):
+    from sklearn.preprocessing import LabelEncoder
+    from sklearn.tree import DecisionTreeClassifier
+
+    from tree_compiler import generate_if_else_code
+
+    # Tree size grows with the data, so the generated code does too
+    clf = DecisionTreeClassifier(random_state=42).fit(data.X, data.y)
+    names = [f"f{j}" for j in range(N_FEATURES)]
+    le = LabelEncoder().fit([0, 1])
+    return lambda: generate_if_else_code(clf, names, le, {})
+
+
+def _murzyme_arrays(data):
+    # Same distribution as batch_scorer.random_inputs, generated as arrays so
+    # the batch case scales to 10^7 rows
+    def build():
+        from batch_scorer import load_weights
+
+        table = load_weights()
+        rng = np.random.default_rng(data.seed)
+        values = rng.integers(0, 2, size=(data.n_rows, len(table.names))).astype(np.float64)
+        missing = rng.random((data.n_rows, len(table.names))) < 0.3
+        return table, values, missing
+
+    return data.extra("murzyme_arrays", build)
+
+
+def _setup_classify_murzyme(data):
+    from kmm_notebook import load_definitions
+
+    classify_murzyme = load_definitions()["classify_murzyme"]
+    table, values, missing = _murzyme_arrays(data)
+    dicts = [
+        {name: (None if missing[i, j] else int(values[i, j])) for j, name in enumerate(table.names)}
+        for i in range(data.n_rows)
+    ]
+    return lambda: [classify_murzyme(d) for d in dicts]
+
+
+def _setup_classify_batch(data):
+    from batch_scorer import classify_batch
+
+    table, values, missing = _murzyme_arrays(data)
+    return lambda: classify_batch(values, missing, table)
+
+
+def _setup_consistency_check(data):
+    from kmm_notebook import load_definitions
+    from model_batch import FIELDS, random_columns
+
+    ns = load_definitions()
+    columns = random_columns(data.n_rows, data.seed)
+    models = []
+    for i in range(data.n_rows):
+        m = ns["Model"]()
+        for field, (section, _) in FIELDS.items():
+            getattr(m, section)[field] = columns[field][i]
+        models.append(m)
+    consistency_check = ns["consistency_check"]
+    return lambda: [consistency_check(m) for m in models]
+
+
+def _setup_consistency_batch(data):
+    from model_batch import check_batch, random_batch
+
+    batch = random_batch(data.n_rows, data.seed)
+    return lambda: check_batch(batch)
+
+
+CASES = (
+    Case("information_gain", 10**7, _setup_information_gain),
+    Case("split_loop", 10**5, _setup_split_loop),
+    Case("rf_fit", 10**5, _setup_rf_fit),
+    Case("rf_predict", 10**6, _setup_rf_predict),
+    Case("generate_if_else_code", 10**5, _setup_codegen),
+    Case("classify_murzyme", 10**5, _setup_classify_murzyme),
+    Case("classify_murzyme_batch", 10**7, _setup_classify_batch),
+    Case("consistency_check", 10**5, _setup_consistency_check),
+    Case("consistency_check_batch", 10**7, _setup_consistency_batch),
+)
+
+
+# ------------------------------
+# Running
+# ------------------------------
+def _time(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    import sklearn
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run(cases=CASES, sizes=DEFAULT_SIZES, repeat=3, seed=0, log=sys.stderr):
+    """Benchmark results as a JSON-ready dict."""
+    results = []
+    for n_rows in sizes:
+        active = [case for case in cases if n_rows <= case.max_rows]
+        if not active:
+            continue
+        data = SyntheticData(n_rows, seed)
+        for case in active:
+            fn = case.setup(data)
+            times = _time(fn, repeat)
+            best = min(times)
+            results.append({
+                "case": case.name,
+                "rows": n_rows,
+                "repeat": repeat,
+                "best_s": best,
+                "median_s": float(np.median(times)),
+                "rows_per_s": n_rows / best if best > 0 else None,
+            })
+            if log is not None:
+                print(f"{case.name:26s} {n_rows:>10d} rows  {best:10.4f}s", file=log)
+        del data
+    return {"environment": environment(), "results": results}
+
+
+# ------------------------------
+# Comparing two runs
+# ------------------------------
+def compare(old, new, threshold=DEFAULT_THRESHOLD, min_delta=DEFAULT_MIN_DELTA):
+    """Rows of (case, rows, old_s, new_s, ratio, regressed) for cases in both runs.
+
+    A case regressed when it is more than ``threshold`` slower relative to the
+    old run and more than ``min_delta`` seconds slower in absolute terms.
+    """
+    before = {(r["case"], r["rows"]): r["best_s"] for r in old["results"]}
+    rows = []
+    for r in new["results"]:
+        key = (r["case"], r["rows"])
+        if key not in before:
+            continue
+        ratio = r["best_s"] / before[key] if before[key] > 0 else float("inf")
+        regressed = ratio > 1.0 + threshold and r["best_s"] - before[key] > min_delta
+        rows.append((r["case"], r["rows"], before[key], r["best_s"], ratio, regressed))
+    return rows
+
+
+def print_comparison(rows, out=sys.stdout):
+    print(f"{'case':26s} {'rows':>10s} {'old (s)':>10s} {'new (s)':>10s} {'ratio':>7s}", file=out)
+    for case, n_rows, old_s, new_s, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{case:26s} {n_rows:>10d} {old_s:10.4f} {new_s:10.4f} {ratio:7.2f}{flag}", file=out)
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the IG, evaluation, forest, codegen and rule-engine hot paths")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="results file (JSON)")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated row counts (e.g. 1e2,1e4)")
+    parser.add_argument("--cases", help="comma-separated case names (default: all)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown ratio above 1 reported as a regression (default: 0.10)")
+    parser.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA,
+                        help="ignore slowdowns smaller than this many seconds (default: 0.001)")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        rows = compare(_load(args.compare[0]), _load(args.compare[1]), args.threshold, args.min_delta)
+        print_comparison(rows)
+        regressions = sum(r[-1] for r in rows)
+        print(f"{regressions} regression(s) out of {len(rows)} comparable measurements")
+        return 1 if regressions else 0
+
+    cases = CASES
+    if args.cases:
+        wanted = args.cases.split(",")
+        unknown = set(wanted) - {c.name for c in CASES}
+        if unknown:
+            parser.error(f"unknown case(s): {', '.join(sorted(unknown))}")
+        cases = [c for c in CASES if c.name in wanted]
+    sizes = [int(float(s)) for s in args.sizes.split(",")]
+
+    report = run(cases, sizes, args.repeat, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"{len(report['results'])} measurements written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+
+# ------------------------------
+# Bit-packed feature vectors
+# ------------------------------
+# Every feature in the 20-column schema of random_forest.py is binary or a
+# small ordinal (0-3), so two bits per feature are enough and a whole vector
+# fits in one uint64: feature j occupies bits 2j and 2j+1. A packed .npy of
+# codes is 20x smaller than the same table stored as int64 columns.
+
+BITS_PER_FEATURE = 2
+MAX_VALUE = (1 << BITS_PER_FEATURE) - 1
+MAX_FEATURES = 64 // BITS_PER_FEATURE
+
+
+def pack_codes(X):
+    """(n_rows, n_features) values in 0..3 -> (n_rows,) uint64 codes."""
+    X = np.asarray(X)
+    if X.ndim != 2:
+        raise ValueError(f"expected a 2-D feature matrix, got shape {X.shape}")
+    if X.shape[1] > MAX_FEATURES:
+        raise ValueError(f"at most {MAX_FEATURES} features fit in a uint64 code, got {X.shape[1]}")
+
+    Xi = X.astype(np.uint64)
+    if X.size and (X.min() < 0 or X.max() > MAX_VALUE or not np.array_equal(Xi, X)):
+        raise ValueError(f"features must be integers in 0..{MAX_VALUE} to be bit-packed")
+
+    shifts = np.arange(X.shape[1], dtype=np.uint64) * np.uint64(BITS_PER_FEATURE)
+    return np.bitwise_or.reduce(Xi << shifts, axis=1) if X.shape[1] else np.zeros(len(X), np.uint64)
+
+
+def packable_rows(X):
+    """Boolean mask of the rows of X whose values are all integers in 0..3."""
+    X = np.asarray(X)
+    with np.errstate(invalid="ignore"):
+        return ((X >= 0) & (X <= MAX_VALUE) & (X == np.round(X))).all(axis=1)
+
+
+def unpack_codes(codes, n_features):
+    """Inverse of pack_codes; returns an (n_rows, n_features) uint8 matrix."""
+    codes = np.asarray(codes, dtype=np.uint64)
+    shifts = np.arange(n_features, dtype=np.uint64) * np.uint64(BITS_PER_FEATURE)
+    return ((codes[:, None] >> shifts) & np.uint64(MAX_VALUE)).astype(np.uint8)
+
+
+# ------------------------------
+# Deduplicating prediction memo
+# ------------------------------
+def model_fingerprint(model):
+    """Stable key for a fitted model, so memo files never mix models.
+
+    Tree models are hashed through their packed node arrays, which leaves
+    runtime-only settings such as n_jobs out of the key.
+    """
+    from tree_compiler import compile_forest
+
+    h = hashlib.sha256(type(model).__qualname__.encode())
+    try:
+        compiled = compile_forest(model)
+    except AttributeError:
+        h.update(pickle.dumps(model, protocol=4))
+        return h.hexdigest()
+
+    for array in (compiled.feature, compiled.threshold, compiled.left, compiled.right,
+                  compiled.value, compiled.roots, compiled.classes_.astype(str)):
+        h.update(np.ascontiguousarray(array).tobytes())
+    return h.hexdigest()
+
+
+class PredictionMemo:
+    """LRU cache of class probabilities keyed on packed feature codes.
+
+    Each distinct code in a batch is predicted at most once and the result
+    is broadcast back to every row that shares it. Entries survive between
+    runs through save()/load(); a memo file is only reused for the model it
+    was built with.
+    """
+
+    def __init__(self, model, n_features, max_entries=1_000_000):
+        self.model = model
+        self.n_features = n_features
+        self.max_entries = max_entries
+        self.key = model_fingerprint(model)
+        self._store = OrderedDict()   # code -> probability row
+        self.rows = 0
+        self.hits = 0
+        self.misses = 0
+        self.model_calls = 0
+
+    def __len__(self):
+        return len(self._store)
+
+    def predict_proba(self, X):
+        codes = pack_codes(X)
+        unique, inverse = np.unique(codes, return_inverse=True)
+        n_classes = len(self.model.classes_)
+        table = np.empty((len(unique), n_classes), dtype=np.float64)
+
+        missing = []
+        for i, code in enumerate(unique.tolist()):
+            row = self._store.get(code)
+            if row is None:
+                missing.append(i)
+            else:
+                self._store.move_to_end(code)
+                table[i] = row
+
+        if missing:
+            missing = np.asarray(missing)
+            table[missing] = self.model.predict_proba(
+                unpack_codes(unique[missing], self.n_features).astype(np.float32)
+            )
+            self.model_calls += 1
+            for i in missing.tolist():
+                self._store[int(unique[i])] = table[i].copy()
+            while len(self._store) > self.max_entries:
+                self._store.popitem(last=False)
+
+        self.rows += len(codes)
+        self.hits += len(unique) - len(missing)
+        self.misses += len(missing)
+        return table[inverse.ravel()]
+
+    def predict(self, X):
+        return self.model.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    # ------------------------------
+    # Persistence
+    # ------------------------------
+    def save(self, path):
+        codes = np.fromiter(self._store.keys(), dtype=np.uint64, count=len(self._store))
+        probs = np.array(list(self._store.values()), dtype=np.float64).reshape(len(codes), -1)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, model_key=np.array(self.key), n_features=self.n_features, codes=codes, probs=probs)
+        os.replace(tmp, path)
+
+    def load(self, path):
+        """Merge entries from ``path``; returns False if it belongs to another model."""
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as saved:
+            if str(saved["model_key"]) != self.key or int(saved["n_features"]) != self.n_features:
+                return False
+            # Stored oldest first, so re-inserting keeps the LRU order
+            for code, row in zip(saved["codes"].tolist(), saved["probs"]):
+                self._store[code] = row
+                self._store.move_to_end(code)
+        while len(self._store) > self.max_entries:
+            self._store.popitem(last=False)
+        return True
+
+    def stats(self):
+        return {
+            "rows": self.rows,
+            "distinct_hits": self.hits,
+            "distinct_misses": self.misses,
+            "model_calls": self.model_calls,
+            "entries": len(self._store),
+        }
@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from classify_service import DEFAULT_PORT, STORE_PATH
+from random_forest import features
+from tree_store import TreeStore
+
+# ------------------------------
+# Load generator for classify_service.py
+# ------------------------------
+# Opens --connections sockets and keeps --concurrency requests in flight
+# across them (closed loop: a new request is sent as soon as one is
+# answered) until --requests have completed. Reports client-side p50/p99
+# latency and throughput, then the server's own counters.
+#
+#   python classify_load.py --spawn --requests 20000 --concurrency 128
+#   python classify_load.py --port 8765 --kind values      # Ver4 category trees
+
+def random_requests(kind, n, seed=0, store_path=STORE_PATH):
+    rng = np.random.default_rng(seed)
+    if kind == "features":
+        rows = rng.integers(0, 4, size=(n, len(features))).tolist()
+        return [{"id": i, "features": row} for i, row in enumerate(rows)]
+
+    # Raw Ver4 cells drawn from the values each category tree was trained on
+    with TreeStore(store_path) as store:
+        choices = {}
+        for name in store.categories:
+            choices.update({f: list(v.values()) for f, v in store[name].reverse_maps.items()})
+    picks = {f: rng.integers(0, len(values), size=n) for f, values in choices.items()}
+    return [
+        {"id": i, "values": {f: choices[f][pick[i]] for f, pick in picks.items()}}
+        for i in range(n)
+    ]
+
+
+async def _worker(host, port, queue, in_flight, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+    sent = {}   # request id -> send time
+    sending = [True]
+
+    async def send():
+        while True:
+            await in_flight.acquire()
+            if queue.empty():
+                in_flight.release()
+                break
+            request = queue.get_nowait()
+            sent[request["id"]] = time.perf_counter()
+            writer.write(json.dumps(request).encode() + b"\n")
+            await writer.drain()
+        sending[0] = False
+
+    async def receive():
+        while sending[0] or sent:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("server closed the connection")
+            response = json.loads(line)
+            latencies.append(time.perf_counter() - sent.pop(response["id"]))
+            if "error" in response:
+                errors.append(response["error"])
+            in_flight.release()
+
+    receiver = asyncio.create_task(receive())
+    try:
+        await send()
+        if sent:
+            await receiver
+        else:
+            # Nothing left to answer: the receiver is parked on readline()
+            receiver.cancel()
+    finally:
+        writer.close()
+
+
+async def _server_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"id": "stats", "op": "stats"}\n')
+    stats = json.loads(await reader.readline())["stats"]
+    writer.close()
+    return stats
+
+
+async def run_load(host, port, requests, concurrency, connections):
+    """Client-side summary dict plus the server's stats after the run."""
+    queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+    in_flight = asyncio.Semaphore(concurrency)
+    latencies, errors = [], []
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _worker(host, port, queue, in_flight, latencies, errors) for _ in range(connections)
+    ))
+    elapsed = time.perf_counter() - start
+
+    lat = np.asarray(latencies) * 1e3
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": float(np.percentile(lat, 50)) if len(lat) else None,
+        "p99_ms": float(np.percentile(lat, 99)) if len(lat) else None,
+        "first_error": errors[0] if errors else None,
+    }, await _server_stats(host, port)
+
+
+def _wait_for_port(host, port, proc, timeout=60.0):
+    import socket
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit("classify_service.py exited before accepting connections")
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"classify_service.py did not listen on {host}:{port} within {timeout:.0f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate load against classify_service.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--kind", choices=("features", "values"), default="features",
+                        help="forest vectors or raw Ver4 cell values")
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight at once")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spawn", action="store_true",
+                        help="start classify_service.py for the run; remaining options after -- go to it")
+    args, service_args = parser.parse_known_args(argv)
+    if service_args and not args.spawn:
+        parser.error(f"unrecognized arguments: {' '.join(service_args)}")
+
+    proc = None
+    if args.spawn:
+        service_args = [a for a in service_args if a != "--"]
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "classify_service.py")
+        proc = subprocess.Popen([sys.executable, script, "--host", args.host, "--port", str(args.port), *service_args])
+        _wait_for_port(args.host, args.port, proc)
+    try:
+        requests = random_requests(args.kind, args.requests, args.seed)
+        client, server = asyncio.run(
+            run_load(args.host, args.port, requests, args.concurrency, min(args.connections, args.concurrency)))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    print(f"Client: {client['requests']} requests in {client['seconds']:.2f}s "
+          f"({client['throughput_rps']:,.0f} req/s), p50 {client['p50_ms']:.2f} ms, p99 {client['p99_ms']:.2f} ms, "
+          f"{client['errors']} errors")
+    if client["first_error"]:
+        print(f"  first error: {client['first_error']}")
+    print(f"Server: {server['requests']} requests in {server['batches']} batches "
+          f"(mean batch {server['mean_batch']:.1f}), p50 {server['p50_ms']:.2f} ms, p99 {server['p99_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
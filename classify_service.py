@@ -0,0 +1,349 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from random_forest import MODEL_PATH, features
+from tree_compiler import compile_forest
+from tree_store import TreeStore
+
+# ------------------------------
+# Local classification service
+# ------------------------------
+# Loads the random_forest.py forest and the Ver4 category trees once and
+# answers classification requests over a local TCP socket, one JSON object
+# per line:
+#
+#   {"id": 1, "features": [0, 0, 1, ...]}            20 values, random_forest.py order
+#   {"id": 2, "values": {"Heme?": "Yes", ...}}        raw Ver4 cells, by feature name
+#   {"id": 3, "op": "stats"}                          latency/throughput counters
+#
+# Concurrent requests are not scored one by one: each model has a
+# MicroBatcher that queues them and runs one vectorized prediction per batch,
+# as soon as --max-batch requests are waiting or the oldest one has waited
+# --max-wait-ms. Inference runs on a worker thread, so the event loop keeps
+# accepting requests while a batch is scored.
+#
+#   python random_forest.py                   # writes random_forest.pkl (optional)
+#   python classify_service.py --port 8765 --max-batch 256 --max-wait-ms 2
+#   python classify_load.py --port 8765 --requests 20000 --concurrency 128
+
+DEFAULT_PORT = 8765
+STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Ver4", "models.trees")
+
+
+# ------------------------------
+# Counters
+# ------------------------------
+class ServiceStats:
+    """Request counters plus a window of recent latencies for percentiles."""
+
+    def __init__(self, window=100_000):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_rows = 0
+        self.latencies = deque(maxlen=window)   # seconds, queueing + inference
+        self.finished = deque(maxlen=window)    # perf_counter of completions
+
+    def record_batch(self, size):
+        self.batches += 1
+        self.batched_rows += size
+
+    def record(self, latency, ok=True):
+        self.requests += 1
+        self.errors += not ok
+        self.latencies.append(latency)
+        self.finished.append(time.perf_counter())
+
+    def snapshot(self):
+        now = time.perf_counter()
+        lat = np.fromiter(self.latencies, dtype=np.float64, count=len(self.latencies))
+        p50, p99 = (np.percentile(lat, [50, 99]) * 1e3).tolist() if len(lat) else (None, None)
+        # Throughput over the last 10 s of completions, and since start
+        recent = sum(1 for t in self.finished if now - t <= 10.0)
+        uptime = now - self.started
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": self.batches,
+            "mean_batch": self.batched_rows / self.batches if self.batches else 0.0,
+            "p50_ms": p50,
+            "p99_ms": p99,
+            "throughput_rps": self.requests / uptime if uptime > 0 else 0.0,
+            "recent_rps": recent / min(10.0, uptime) if uptime > 0 else 0.0,
+            "uptime_s": uptime,
+        }
+
+
+# ------------------------------
+# Micro-batching
+# ------------------------------
+class MicroBatcher:
+    """Coalesces single-row requests into batches for ``predict_batch``.
+
+    ``predict_batch(items)`` receives the submitted items in order and returns
+    one result per item; it runs on ``executor`` (the default thread pool when
+    None). A failing batch fails every request in it.
+    """
+
+    def __init__(self, predict_batch, max_batch=256, max_wait=0.002, stats=None, executor=None):
+        self.predict_batch = predict_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.stats = stats
+        self.executor = executor
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch:
+            # Take whatever is already queued without yielding
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if len(batch) >= self.max_batch:
+                break
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.predict_batch, items)
+            except Exception as exc:  # noqa: BLE001 - reported to every caller
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            if self.stats is not None:
+                self.stats.record_batch(len(batch))
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+# ------------------------------
+# Models
+# ------------------------------
+class ForestModel:
+    """The random_forest.py forest, compiled for batch evaluation."""
+
+    def __init__(self, clf):
+        self.classes = [str(c) for c in clf.classes_]
+        self.compiled = compile_forest(clf)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        if os.path.exists(path):
+            import joblib
+
+            return cls(joblib.load(path))
+        # No persisted forest yet: train the same one random_forest.py would
+        from random_forest import train_forest
+
+        return cls(train_forest(n_jobs=1))
+
+    def predict_batch(self, rows):
+        proba = self.compiled.predict_proba(np.asarray(rows, dtype=np.float32))
+        codes = np.argmax(proba, axis=1)
+        return [
+            {"label": self.classes[c], "proba": dict(zip(self.classes, p.round(6).tolist()))}
+            for c, p in zip(codes, proba)
+        ]
+
+
+class CategoryTrees:
+    """The Ver4 category trees; every category with all its features given is scored."""
+
+    def __init__(self, store):
+        self.store = store
+        self.models = {name: store[name] for name in store.categories}
+
+    @classmethod
+    def load(cls, path=STORE_PATH):
+        return cls(TreeStore(path))
+
+    def predict_batch(self, requests):
+        results = [{} for _ in requests]
+        for name, model in self.models.items():
+            rows, where = [], []
+            for i, values in enumerate(requests):
+                if all(f in values for f in model.feature_names):
+                    rows.append([values[f] for f in model.feature_names])
+                    where.append(i)
+            if not rows:
+                continue
+            try:
+                labels = model.predict(model.encode(rows))
+            except (ValueError, TypeError):
+                # An unseen value in one request must not fail the others
+                labels = []
+                for row in rows:
+                    try:
+                        labels.append(model.predict(model.encode([row]))[0])
+                    except (ValueError, TypeError) as exc:
+                        labels.append({"error": str(exc)})
+            for i, label in zip(where, labels):
+                results[i][name] = label
+        return results
+
+
+# ------------------------------
+# Server
+# ------------------------------
+class ClassifyService:
+    def __init__(self, forest=None, categories=None, max_batch=256, max_wait=0.002):
+        self.stats = ServiceStats()
+        self.forest = forest
+        self.categories = categories
+        self._batchers = {}
+        if forest is not None:
+            self._batchers["features"] = MicroBatcher(forest.predict_batch, max_batch, max_wait, self.stats)
+        if categories is not None:
+            self._batchers["values"] = MicroBatcher(categories.predict_batch, max_batch, max_wait, self.stats)
+
+    def _validate(self, request):
+        if "features" in request:
+            row = request["features"]
+            if not isinstance(row, list) or len(row) != len(features):
+                raise ValueError(f"'features' must be a list of {len(features)} numbers")
+            return "features", [float(v) for v in row]
+        if "values" in request:
+            values = request["values"]
+            if not isinstance(values, dict):
+                raise ValueError("'values' must map Ver4 feature names to cell values")
+            # Cells are looked up in the encoders; lists or objects would fail the whole micro-batch
+            bad = [name for name, value in values.items() if not isinstance(value, (str, int, float, bool))]
+            if bad:
+                raise ValueError(f"'values' must hold strings or numbers, not lists or objects: {', '.join(bad)}")
+            return "values", values
+        raise ValueError("request needs 'features', 'values' or 'op'")
+
+    async def handle(self, request):
+        """Response dict for one decoded request."""
+        if request.get("op") == "stats":
+            return {"id": request.get("id"), "stats": self.stats.snapshot()}
+
+        start = time.perf_counter()
+        try:
+            kind, payload = self._validate(request)
+            if kind not in self._batchers:
+                raise ValueError(f"no model loaded for '{kind}' requests")
+            result = await self._batchers[kind].submit(payload)
+        except (ValueError, TypeError) as exc:
+            self.stats.record(time.perf_counter() - start, ok=False)
+            return {"id": request.get("id"), "error": str(exc)}
+        except Exception as exc:  # noqa: BLE001 - a failed batch must still answer every request
+            self.stats.record(time.perf_counter() - start, ok=False)
+            return {"id": request.get("id"), "error": f"{type(exc).__name__}: {exc}"}
+        self.stats.record(time.perf_counter() - start)
+        return {"id": request.get("id"), "result": result}
+
+    async def _respond(self, line, writer):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as exc:
+            response = {"id": None, "error": f"bad request: {exc}"}
+        else:
+            response = await self.handle(request)
+        writer.write(json.dumps(response).encode() + b"\n")
+
+    async def _connection(self, reader, writer):
+        # Requests on one connection may be pipelined; responses carry the id
+        pending = set()
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.create_task(self._respond(line, writer))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                    if writer.transport.get_write_buffer_size() > 1 << 20:
+                        await writer.drain()
+            if pending:
+                await asyncio.gather(*pending)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, ready=None):
+        for batcher in self._batchers.values():
+            batcher.start()
+        server = await asyncio.start_server(self._connection, host, port, limit=1 << 20)
+        if ready is not None:
+            ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for batcher in self._batchers.values():
+                await batcher.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve murzyme classifications with request micro-batching")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--model", default=MODEL_PATH, help="forest written by random_forest.py")
+    parser.add_argument("--store", default=STORE_PATH, help="category trees written by Ver4/trainedTree.py")
+    parser.add_argument("--max-batch", type=int, default=256, help="largest batch scored at once")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="longest wait for a batch to fill")
+    args = parser.parse_args(argv)
+
+    forest = ForestModel.load(args.model)
+    categories = CategoryTrees.load(args.store) if os.path.exists(args.store) else None
+    service = ClassifyService(forest, categories, args.max_batch, args.max_wait_ms / 1e3)
+
+    def ready(server):
+        loaded = "forest" + (" and Ver4 category trees" if categories is not None else "")
+        address = server.sockets[0].getsockname()
+        print(f"Serving {loaded} on {address[0]}:{address[1]}", file=sys.stderr, flush=True)
+
+    try:
+        asyncio.run(service.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(service.stats.snapshot()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
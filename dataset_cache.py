@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from profiling import stage
+
+# ------------------------------
+# Cached, label-encoded view of the Data_CM workbook
+# ------------------------------
+# Every entry point used to call pd.read_excel() and re-encode the same
+# columns. The first load converts the sheet into memory-mapped .npy arrays
+# plus a small JSON header; later loads skip Excel parsing entirely. A .csv in
+# the same layout (ingest.py -o merged.csv) is converted the same way and
+# keyed on its own sha256; the sheet name only names its entry.
+#
+# Cache layout (next to the workbook by default):
+#   .murburn_cache/index.json                      path -> (size, mtime, sha256)
+#   .murburn_cache/<stem>-<sheet>-<sha256[:16]>/   X.npy, y.npy, meta.json
+
+CACHE_DIR_NAME = ".murburn_cache"
+CACHE_VERSION = 1
+
+
+class Dataset:
+    """Enzyme names, label-encoded feature matrix and encoded labels."""
+
+    def __init__(self, enzyme_names, feature_names, X, y, label_name,
+                 label_classes, reverse_maps, digest):
+        self.enzyme_names = enzyme_names    # Column A
+        self.feature_names = feature_names  # Columns B to U
+        self.X = X                          # (n_rows, n_features) int64, encoded
+        self.y = y                          # (n_rows,) int64, encoded label
+        self.label_name = label_name        # Column V header
+        self.label_classes = label_classes  # y code -> original label
+        self.reverse_maps = reverse_maps    # {feature: {code: original value}}
+        self.digest = digest                # sha256 of the workbook bytes
+
+    @property
+    def n_rows(self):
+        return self.X.shape[0]
+
+    @property
+    def n_features(self):
+        return self.X.shape[1]
+
+    def decode_labels(self, codes):
+        return [self.label_classes[c] for c in codes]
+
+
+# ------------------------------
+# Encoding (identical to the per-script LabelEncoder calls)
+# ------------------------------
+def safe_label_encoding(column):
+    from sklearn.preprocessing import LabelEncoder
+
+    le = LabelEncoder()
+    encoded = le.fit_transform(column)
+    reverse_map = dict(zip(range(len(le.classes_)), le.classes_))
+    return encoded, reverse_map
+
+
+def _to_builtin(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _encode_frame(df):
+    enzyme_names = [str(name) for name in df.iloc[:, 0]]
+    label = df.iloc[:, -1]
+    features = df.iloc[:, 1:-1]
+
+    X = np.empty(features.shape, dtype=np.int64)
+    reverse_maps = {}
+    for j, col in enumerate(features.columns):
+        if features[col].dtype == "object":
+            X[:, j], rev_map = safe_label_encoding(features[col])
+            reverse_maps[col] = {k: _to_builtin(v) for k, v in rev_map.items()}
+        else:
+            X[:, j] = features[col].astype(int)
+
+    y, label_map = safe_label_encoding(label)
+    label_classes = [_to_builtin(label_map[k]) for k in range(len(label_map))]
+
+    meta = {
+        "version": CACHE_VERSION,
+        "enzyme_names": enzyme_names,
+        "feature_names": [str(c) for c in features.columns],
+        "label_name": str(df.columns[-1]),
+        "label_classes": label_classes,
+        "reverse_maps": reverse_maps,
+    }
+    return X, np.asarray(y, dtype=np.int64), meta
+
+
+# ------------------------------
+# Cache keys
+# ------------------------------
+def file_digest(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _read_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "index.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(cache_dir, index):
+    tmp = os.path.join(cache_dir, f"index.json.{os.getpid()}")
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp, os.path.join(cache_dir, "index.json"))
+
+
+def cached_digest(path, cache_dir):
+    """sha256 of ``path``; re-hashed only when its size or mtime changed."""
+    abspath = os.path.abspath(path)
+    st = os.stat(abspath)
+    index = _read_index(cache_dir)
+    entry = index.get(abspath)
+    if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+        return entry["sha256"]
+
+    digest = file_digest(abspath)
+    index[abspath] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+    _write_index(cache_dir, index)
+    return digest
+
+
+def _entry_dir(cache_dir, path, sheet_name, digest):
+    stem = os.path.splitext(os.path.basename(path))[0].replace(" ", "_")
+    return os.path.join(cache_dir, f"{stem}-{sheet_name}-{digest[:16]}")
+
+
+# ------------------------------
+# Public loader
+# ------------------------------
+def _open_entry(entry, digest, mmap_mode):
+    with open(os.path.join(entry, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("version") != CACHE_VERSION:
+        raise ValueError(f"stale cache entry {entry}")
+
+    # JSON turns the integer codes of reverse_maps into strings
+    reverse_maps = {
+        col: {int(k): v for k, v in rev_map.items()}
+        for col, rev_map in meta["reverse_maps"].items()
+    }
+    return Dataset(
+        enzyme_names=meta["enzyme_names"],
+        feature_names=meta["feature_names"],
+        X=np.load(os.path.join(entry, "X.npy"), mmap_mode=mmap_mode),
+        y=np.load(os.path.join(entry, "y.npy"), mmap_mode=mmap_mode),
+        label_name=meta["label_name"],
+        label_classes=meta["label_classes"],
+        reverse_maps=reverse_maps,
+        digest=digest,
+    )
+
+
+def _build_entry(path, sheet_name, entry):
+    import pandas as pd
+
+    if path.lower().endswith(".csv"):
+        with stage("csv_parse", path=path):
+            df = pd.read_csv(path)
+    else:
+        with stage("excel_parse", path=path):
+            df = pd.read_excel(path, sheet_name=sheet_name)
+    with stage("label_encode"):
+        X, y, meta = _encode_frame(df)
+
+    # Write into a scratch directory first so a crashed run never leaves a
+    # half-written entry behind.
+    with stage("cache_write"):
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=os.path.dirname(entry))
+        try:
+            os.chmod(tmp, 0o755)
+            np.save(os.path.join(tmp, "X.npy"), X)
+            np.save(os.path.join(tmp, "y.npy"), y)
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp, entry)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.isdir(entry):
+                raise
+
+
+def load_dataset(path="Data_CM.xlsx", sheet_name="Sheet1", cache_dir=None,
+                 refresh=False, mmap_mode="r"):
+    """Load ``path`` (a workbook or .csv) through the columnar cache, converting it on first use.
+
+    The returned arrays are read-only memory maps by default; pass
+    ``mmap_mode=None`` to get ordinary in-memory arrays.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    with stage("dataset_digest"):
+        digest = cached_digest(path, cache_dir)
+    entry = _entry_dir(cache_dir, path, sheet_name, digest)
+
+    if refresh and os.path.isdir(entry):
+        shutil.rmtree(entry)
+    if not os.path.isdir(entry):
+        _build_entry(path, sheet_name, entry)
+
+    try:
+        return _open_entry(entry, digest, mmap_mode)
+    except (OSError, ValueError, KeyError):
+        # Corrupt or outdated entry: rebuild it once
+        shutil.rmtree(entry, ignore_errors=True)
+        _build_entry(path, sheet_name, entry)
+        return _open_entry(entry, digest, mmap_mode)
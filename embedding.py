@@ -0,0 +1,396 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from dataset_cache import CACHE_DIR_NAME, cached_digest
+from profiling import stage
+
+# ------------------------------
+# PCA / t-SNE embeddings for the explorer plots
+# ------------------------------
+# The explorer serves PCA and t-SNE coordinates from precomputed pca/ and
+# tnse/ files; this produces them from the feature matrix.
+#
+#   PCA    IncrementalPCA fitted chunk by chunk, then a second pass projects
+#          every chunk into a memory-mapped .npy, so neither the input nor
+#          the projection has to fit in RAM.
+#   t-SNE  Barnes-Hut t-SNE (O(n log n), nearest-neighbour affinities) on the
+#          leading principal components of an anchor sample: up to
+#          --tsne-max-points distinct vectors, deduplicated within a random
+#          sample of rows rather than across the whole projection. Every row
+#          is then placed chunk by chunk by interpolating its nearest anchors
+#          in PCA space; rows equal to an anchor take its coordinates.
+#
+# Results are cached next to the data under .murburn_cache/embeddings/, keyed
+# on the dataset's sha256 and the embedding parameters; rerunning on the same
+# data loads them instead of refitting. The t-SNE anchors (row indices and
+# coordinates) are cached too, so "project" places new proteins against the
+# anchors alone: exactly for PCA, by nearest-neighbour interpolation for
+# t-SNE, without refitting or reading the whole embedding.
+#
+#   python embedding.py embed Data_CM.xlsx --tsne --export plots/
+#   python embedding.py embed proteome.npy --components 10 --tsne
+#   python embedding.py project proteome.npy new_proteins.csv --export plots/new
+
+EMBEDDING_VERSION = 2
+DEFAULT_CHUNK_SIZE = 65536
+
+PCAModel = namedtuple("PCAModel", ["mean", "components", "explained_variance_ratio", "n_samples"])
+PCAModel.__doc__ = "Fitted PCA: project(X) = (X - mean) @ components.T"
+
+TSNEAnchors = namedtuple("TSNEAnchors", ["rows", "coords"])
+TSNEAnchors.__doc__ = "Rows of the PCA projection embedded by t-SNE, and their (n_anchors, 2) coordinates"
+
+Embedding = namedtuple("Embedding", ["pca_model", "pca", "tsne", "tsne_anchors", "ids", "labels", "entry"])
+Embedding.__doc__ = """Embedding of one dataset.
+
+pca           (n_rows, n_components) float32 projection, memory-mapped from the cache
+tsne          (n_rows, 2) float32 t-SNE coordinates, memory-mapped, or None
+tsne_anchors  TSNEAnchors the t-SNE coordinates are interpolated from, or None
+ids           row names, or None
+labels        row labels, or None
+entry         cache directory holding the arrays
+"""
+
+
+# ------------------------------
+# Sources
+# ------------------------------
+def _is_workbook(path):
+    return path.lower().endswith((".xlsx", ".xlsm", ".xls"))
+
+
+def iter_source_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, sheet_name="Sheet1", id_column=None):
+    """Yield float64 feature chunks of a workbook, .npy or CSV, in row order."""
+    if _is_workbook(path):
+        from dataset_cache import load_dataset
+
+        X = load_dataset(path, sheet_name=sheet_name).X
+        for start in range(0, len(X), chunk_size):
+            yield np.asarray(X[start:start + chunk_size], dtype=np.float64)
+        return
+
+    from rf_predict import iter_input_chunks
+
+    # The id column is not a feature; .npy inputs have none
+    for _, X in iter_input_chunks(path, chunk_size, None if path.endswith(".npy") else id_column):
+        yield X.astype(np.float64)
+
+
+def source_rows(path, sheet_name="Sheet1", id_column=None):
+    """(ids, labels) of a source; either may be None."""
+    if _is_workbook(path):
+        from dataset_cache import load_dataset
+
+        data = load_dataset(path, sheet_name=sheet_name)
+        return list(data.enzyme_names), data.decode_labels(data.y)
+    if id_column is None or path.endswith(".npy"):
+        return None, None
+    import pandas as pd
+
+    return pd.read_csv(path, usecols=[id_column])[id_column].astype(str).tolist(), None
+
+
+def _rebatch(chunks, minimum):
+    """Re-yield chunks so that none is shorter than ``minimum`` rows.
+
+    Short chunks are merged with the ones after them, and a short tail into the
+    chunk before it; only an input with fewer than ``minimum`` rows in total
+    comes out short.
+    """
+    ready = held = None
+    for chunk in chunks:
+        held = chunk if held is None else np.vstack([held, chunk])
+        if len(held) >= minimum:
+            if ready is not None:
+                yield ready
+            ready, held = held, None
+    if held is not None:
+        ready = held if ready is None else np.vstack([ready, held])
+    if ready is not None:
+        yield ready
+
+
+# ------------------------------
+# PCA
+# ------------------------------
+def fit_pca(chunks, n_components):
+    """Incremental PCA over an iterable of chunks."""
+    from sklearn.decomposition import IncrementalPCA
+
+    ipca = None
+    for chunk in _rebatch(chunks, n_components):
+        if ipca is None:
+            # Never more components than features
+            ipca = IncrementalPCA(n_components=min(n_components, chunk.shape[1]))
+        ipca.partial_fit(chunk)
+    if ipca is None:
+        raise ValueError("no rows to fit")
+    return PCAModel(ipca.mean_, ipca.components_, ipca.explained_variance_ratio_, int(ipca.n_samples_seen_))
+
+
+def project(model, X):
+    X = np.asarray(X, dtype=np.float64)
+    return ((X - model.mean) @ model.components.T).astype(np.float32)
+
+
+def _save_pca_model(path, model):
+    np.savez(path, **model._asdict())
+
+
+def _load_pca_model(path):
+    with np.load(path) as saved:
+        return PCAModel(saved["mean"], saved["components"], saved["explained_variance_ratio"],
+                        int(saved["n_samples"]))
+
+
+# ------------------------------
+# t-SNE
+# ------------------------------
+def interpolate(anchors, anchor_xy, points, k=10, out=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Place ``points`` at the inverse-distance mean of their k nearest anchors.
+
+    A point equal to an anchor takes that anchor's coordinates. ``points`` is
+    read and ``out`` written chunk by chunk, so both may be memory-mapped.
+    """
+    from sklearn.neighbors import NearestNeighbors
+
+    anchors = np.asarray(anchors, dtype=np.float32)
+    k = min(k, len(anchors))
+    nn = NearestNeighbors(n_neighbors=k).fit(anchors)
+    if out is None:
+        out = np.empty((len(points), anchor_xy.shape[1]), dtype=np.float32)
+    for start in range(0, len(points), chunk_size):
+        chunk = np.asarray(points[start:start + chunk_size], dtype=np.float32)
+        dist, idx = nn.kneighbors(chunk)
+        w = 1.0 / np.maximum(dist, 1e-9)
+        xy = (anchor_xy[idx] * w[:, :, None]).sum(axis=1) / w.sum(axis=1, keepdims=True)
+        exact = (anchors[idx[:, 0]] == chunk).all(axis=1)
+        xy[exact] = anchor_xy[idx[exact, 0]]
+        out[start:start + len(chunk)] = xy
+    return out
+
+
+def _distinct_sample(Y, max_points, rng):
+    """Row indices of up to ``max_points`` distinct rows of Y, ordered by value.
+
+    Only a random sample of twice that many rows is read and deduplicated, so
+    the cost does not grow with the number of rows.
+    """
+    n = len(Y)
+    rows = np.arange(n) if n <= 2 * max_points else np.sort(rng.choice(n, 2 * max_points, replace=False))
+    _, first = np.unique(np.asarray(Y[rows], dtype=np.float32), axis=0, return_index=True)
+    rows = rows[first]
+    if len(rows) > max_points:
+        rows = rows[np.sort(rng.choice(len(rows), max_points, replace=False))]
+    return rows
+
+
+def fit_tsne(Y, perplexity=30.0, max_points=20_000, seed=0):
+    """Barnes-Hut t-SNE of an anchor sample of Y (PCA scores), as TSNEAnchors."""
+    from sklearn.manifold import TSNE
+
+    rows = _distinct_sample(Y, max_points, np.random.default_rng(seed))
+    anchors = np.asarray(Y[rows], dtype=np.float32)
+    if len(rows) < 3:
+        # t-SNE needs a few points; degenerate inputs keep their first two PCs
+        coords = np.zeros((len(rows), 2), dtype=np.float32)
+        coords[:, :min(2, anchors.shape[1])] = anchors[:, :2]
+        return TSNEAnchors(rows, coords)
+
+    tsne = TSNE(n_components=2, perplexity=min(perplexity, (len(rows) - 1) / 3.0), init="pca",
+                method="barnes_hut", random_state=seed)
+    with stage("tsne_fit", points=len(rows)):
+        return TSNEAnchors(rows, tsne.fit_transform(anchors).astype(np.float32))
+
+
+def _save_anchors(path, anchors):
+    np.savez(path, **anchors._asdict())
+
+
+def _load_anchors(path):
+    with np.load(path) as saved:
+        return TSNEAnchors(saved["rows"], saved["coords"])
+
+
+# ------------------------------
+# Cache
+# ------------------------------
+def _params_key(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def cache_entry(path, params, cache_dir=None):
+    """Cache directory of the embedding of ``path`` with ``params``."""
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+    digest = cached_digest(path, cache_dir)
+    stem = os.path.splitext(os.path.basename(path))[0].replace(" ", "_")
+    return os.path.join(cache_dir, "embeddings", f"{stem}-{digest[:16]}-{_params_key(params)}")
+
+
+def _publish(tmp, entry):
+    """Move a finished scratch directory into place (another run may have won)."""
+    try:
+        os.replace(tmp, entry)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(entry):
+            raise
+
+
+def embed(path, n_components=10, tsne=False, perplexity=30.0, tsne_max_points=20_000, seed=0,
+          sheet_name="Sheet1", id_column=None, chunk_size=DEFAULT_CHUNK_SIZE, cache_dir=None, refresh=False):
+    """Embedding of a dataset, computed once per dataset hash and parameters."""
+    params = {"version": EMBEDDING_VERSION, "n_components": n_components, "sheet": sheet_name}
+    entry = cache_entry(path, params, cache_dir)
+    if refresh and os.path.isdir(entry):
+        shutil.rmtree(entry)
+
+    if not os.path.isdir(entry):
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=os.path.dirname(entry))
+        try:
+            with stage("pca_fit"):
+                model = fit_pca(iter_source_chunks(path, chunk_size, sheet_name, id_column), n_components)
+            _save_pca_model(os.path.join(tmp, "pca_model.npz"), model)
+            # Second pass: project chunk by chunk into a memory-mapped file
+            out = np.lib.format.open_memmap(os.path.join(tmp, "pca.npy"), mode="w+", dtype=np.float32,
+                                            shape=(model.n_samples, model.components.shape[0]))
+            with stage("pca_project"):
+                start = 0
+                for chunk in iter_source_chunks(path, chunk_size, sheet_name, id_column):
+                    out[start:start + len(chunk)] = project(model, chunk)
+                    start += len(chunk)
+            out.flush()
+            del out
+            _publish(tmp, entry)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    model = _load_pca_model(os.path.join(entry, "pca_model.npz"))
+    pca = np.load(os.path.join(entry, "pca.npy"), mmap_mode="r")
+
+    coords = anchors = None
+    if tsne:
+        # t-SNE results live in the same entry, one pair of files per setting;
+        # the coordinates are written last, so their presence implies the anchors
+        stem = f"tsne-{_params_key({'perplexity': perplexity, 'max_points': tsne_max_points, 'seed': seed})}"
+        tsne_path = os.path.join(entry, f"{stem}.npy")
+        anchors_path = os.path.join(entry, f"{stem}-anchors.npz")
+        if not os.path.exists(tsne_path):
+            anchors = fit_tsne(pca, perplexity, tsne_max_points, seed)
+            tmp_path = f"{anchors_path}.{os.getpid()}.tmp.npz"
+            _save_anchors(tmp_path, anchors)
+            os.replace(tmp_path, anchors_path)
+
+            tmp_path = f"{tsne_path}.{os.getpid()}.tmp.npy"
+            out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(len(pca), 2))
+            with stage("tsne_interpolate", points=len(pca)):
+                interpolate(pca[anchors.rows], anchors.coords, pca, out=out, chunk_size=chunk_size)
+            out.flush()
+            del out
+            os.replace(tmp_path, tsne_path)
+        anchors = _load_anchors(anchors_path)
+        coords = np.load(tsne_path, mmap_mode="r")
+
+    ids, labels = source_rows(path, sheet_name, id_column)
+    return Embedding(model, pca, coords, anchors, ids, labels, entry)
+
+
+def place_new(embedding, X_new, k=10):
+    """(pca, tsne) coordinates of new rows in an existing embedding, without refitting.
+
+    t-SNE coordinates are interpolated from the cached anchors only.
+    """
+    pca_new = project(embedding.pca_model, X_new)
+    tsne_new = None
+    if embedding.tsne_anchors is not None:
+        anchors = embedding.tsne_anchors
+        tsne_new = interpolate(embedding.pca[anchors.rows], anchors.coords, pca_new, k)
+    return pca_new, tsne_new
+
+
+# ------------------------------
+# Export
+# ------------------------------
+def export_csv(path, blocks, ids=None, labels=None):
+    """CSV of id/label columns followed by every (prefix, coords) block."""
+    import pandas as pd
+
+    frame = pd.concat([
+        pd.DataFrame(np.asarray(coords), columns=[f"{prefix}{i + 1}" for i in range(coords.shape[1])])
+        for prefix, coords in blocks
+    ], axis=1)
+    if labels is not None:
+        frame.insert(0, "label", labels)
+    if ids is not None:
+        frame.insert(0, "id", ids)
+    frame.to_csv(path, index=False, float_format="%.5f")
+
+
+def _export(directory, pca, tsne, ids, labels):
+    os.makedirs(os.path.join(directory, "pca"), exist_ok=True)
+    export_csv(os.path.join(directory, "pca", "pca.csv"), [("pc", pca)], ids, labels)
+    if tsne is not None:
+        os.makedirs(os.path.join(directory, "tnse"), exist_ok=True)
+        export_csv(os.path.join(directory, "tnse", "tsne.csv"), [("tsne", tsne)], ids, labels)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cached incremental PCA and t-SNE embeddings of feature tables")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, text in (("embed", "embed a dataset (cached by content hash)"),
+                       ("project", "place new rows into the embedding of a dataset")):
+        p = sub.add_parser(name, help=text)
+        p.add_argument("source", help="Data_CM-style workbook, .npy matrix or CSV of features")
+        if name == "project":
+            p.add_argument("new", help=".npy or CSV with the same feature columns")
+        p.add_argument("--sheet", default="Sheet1")
+        p.add_argument("--id-column", help="CSV column holding row names")
+        p.add_argument("--components", type=int, default=10)
+        p.add_argument("--tsne", action="store_true", help="also compute (or reuse) a t-SNE embedding")
+        p.add_argument("--perplexity", type=float, default=30.0)
+        p.add_argument("--tsne-max-points", type=int, default=20_000,
+                       help="distinct vectors embedded directly; the rest are interpolated")
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        p.add_argument("--refresh", action="store_true", help="recompute even if cached")
+        p.add_argument("--export", help="write pca/pca.csv and tnse/tsne.csv under this directory")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    emb = embed(args.source, args.components, args.tsne, args.perplexity, args.tsne_max_points, args.seed,
+                args.sheet, args.id_column, args.chunk_size, refresh=args.refresh)
+    explained = emb.pca_model.explained_variance_ratio
+    print(f"{len(emb.pca)} rows, {len(explained)} components ({explained.sum():.1%} of variance) "
+          f"in {time.perf_counter() - start:.1f}s; cached in {emb.entry}", file=sys.stderr)
+
+    if args.command == "embed":
+        if args.export:
+            _export(args.export, emb.pca, emb.tsne, emb.ids, emb.labels)
+        return
+
+    new_ids, _ = source_rows(args.new, args.sheet, args.id_column)
+    X_new = np.vstack(list(iter_source_chunks(args.new, args.chunk_size, args.sheet, args.id_column)))
+    pca_new, tsne_new = place_new(emb, X_new)
+    print(f"{len(X_new)} new rows placed", file=sys.stderr)
+    if args.export:
+        _export(args.export, pca_new, tsne_new, new_ids, None)
+    else:
+        blocks = [("pc", pca_new)] + ([("tsne", tsne_new)] if tsne_new is not None else [])
+        export_csv(sys.stdout, blocks, new_ids)
+
+
+if __name__ == "__main__":
+    main()
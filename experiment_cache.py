@@ -0,0 +1,206 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+
+import numpy as np
+
+from dataset_cache import CACHE_DIR_NAME
+
+# ------------------------------
+# Content-addressed experiment cache
+# ------------------------------
+# Every run refits every tree even when neither the data nor the parameters
+# changed. This memoizes fitted trees and per-split outputs on disk, keyed on
+# a sha256 of everything that determines them:
+#
+#   experiment_key(data=array_digest(X, y), columns=[...], seed=3, params={...})
+#
+# The key also records the scikit-learn version, since a different version
+# may grow a different tree. Entries are pickles under
+# .murburn_cache/experiments/<key[:2]>/<key>.pkl; a hit bumps the file's mtime
+# and, once the directory grows past ``max_bytes``, the least recently used
+# entries are removed. Writes go through a temporary file and os.replace, so
+# concurrent runs never see half-written entries.
+#
+#   MURBURN_EXPERIMENT_CACHE=0          disable caching in the scripts
+#   MURBURN_EXPERIMENT_CACHE=dir/       cache in dir/ instead
+#
+#   python experiment_cache.py                  size and entry count
+#   python experiment_cache.py --max-mb 64      evict down to 64 MB
+#   python experiment_cache.py --clear
+
+ENV_VAR = "MURBURN_EXPERIMENT_CACHE"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+KEY_VERSION = 1
+
+
+# ------------------------------
+# Keys
+# ------------------------------
+def array_digest(*arrays):
+    """sha256 over the dtype, shape and bytes of each array."""
+    h = hashlib.sha256()
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        h.update(f"{a.dtype.str}{a.shape}".encode())
+        h.update(memoryview(a).cast("B"))
+    return h.hexdigest()
+
+
+def _canonical(value):
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple, range)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return {"__array__": array_digest(value)}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def experiment_key(**parts):
+    """Hex sha256 of the keyword arguments (JSON-canonical, order-free)."""
+    import sklearn
+
+    payload = {"version": KEY_VERSION, "sklearn": sklearn.__version__, "parts": _canonical(parts)}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+# ------------------------------
+# Store
+# ------------------------------
+class ExperimentCache:
+    """Size-bounded LRU store of pickled results addressed by experiment_key()."""
+
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root or os.path.join(CACHE_DIR_NAME, "experiments")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+
+    @classmethod
+    def default(cls):
+        """The scripts' cache, or None when MURBURN_EXPERIMENT_CACHE=0."""
+        setting = os.environ.get(ENV_VAR, "")
+        if setting == "0":
+            return None
+        return cls(setting or None)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + ".pkl")
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return default
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Unreadable entry (crashed writer, incompatible pickle): drop it
+            self._remove(path)
+            self.misses += 1
+            return default
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            self._remove(tmp)
+            raise
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self.entries())
+        else:
+            self._size += os.path.getsize(path)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def memoize(self, key, fn):
+        """Cached ``fn()`` for ``key``, computing and storing it on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = fn()
+            self.put(key, value)
+        return value
+
+    def entries(self):
+        """(path, size, last use) of every entry."""
+        out = []
+        if not os.path.isdir(self.root):
+            return out
+        for sub in os.scandir(self.root):
+            if not sub.is_dir():
+                continue
+            for e in os.scandir(sub.path):
+                if e.name.endswith(".pkl"):
+                    try:
+                        st = e.stat()
+                    except FileNotFoundError:
+                        continue
+                    out.append((e.path, st.st_size, st.st_mtime_ns))
+        return out
+
+    def evict(self, max_bytes=None):
+        """Remove least recently used entries until the store fits ``max_bytes``."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= limit:
+                break
+            self._remove(path)
+            total -= size
+            removed += 1
+        self._size = total
+        return removed
+
+    def clear(self):
+        return self.evict(0)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or trim the experiment cache")
+    parser.add_argument("root", nargs="?", default=None, help=f"cache directory (default ./{CACHE_DIR_NAME}/experiments)")
+    parser.add_argument("--max-mb", type=float, help="evict least recently used entries down to this size")
+    parser.add_argument("--clear", action="store_true", help="remove every entry")
+    args = parser.parse_args(argv)
+
+    cache = ExperimentCache(args.root)
+    if args.clear:
+        print(f"removed {cache.clear()} entries")
+    elif args.max_mb is not None:
+        print(f"removed {cache.evict(int(args.max_mb * 1024 * 1024))} entries")
+    entries = cache.entries()
+    total = sum(size for _, size, _ in entries)
+    print(f"{cache.root}: {len(entries)} entries, {total / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
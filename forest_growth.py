@@ -0,0 +1,225 @@
+import argparse
+import os
+import sys
+from collections import namedtuple
+
+import joblib
+import numpy as np
+
+from random_forest import MODEL_PATH, features, train_data, train_labels, train_forest
+
+# ------------------------------
+# Incremental growth of the random forest
+# ------------------------------
+# random_forest.py trains a 100-tree forest from scratch. Here the forest is
+# kept on disk (random_forest.pkl, the file rf_predict.py reads) together
+# with every labeled row it has seen (random_forest_rows.npz). New rows are
+# appended and a few trees are added with warm_start, optionally retiring the
+# oldest ones, instead of refitting the whole forest. Fitting and prediction
+# use every core (n_jobs=-1).
+#
+# "convergence" shows how accuracy and importances settle as trees are added,
+# computed from per-tree probabilities in one pass over the forest.
+#
+#   python forest_growth.py init
+#   python forest_growth.py grow new_enzymes.csv --trees 20 --drop-oldest 20
+#   python forest_growth.py convergence --eval holdout.csv --step 5
+
+ROWS_PATH = "random_forest_rows.npz"
+LABEL_COLUMN = "label"
+
+Convergence = namedtuple("Convergence", ["n_trees", "accuracy", "agreement", "importances", "stable_size"])
+Convergence.__doc__ = """Metrics of the forest made of the first k trees, for every k in n_trees.
+
+accuracy     (len(n_trees),) accuracy on the labeled evaluation rows (NaN without labels)
+agreement    (len(n_trees),) fraction of evaluation rows predicted like the full forest
+importances  (len(n_trees), n_features) feature_importances_ of each prefix
+stable_size  smallest k from which accuracy, agreement and importances all stay
+             within tolerance of the full forest
+"""
+
+
+# ------------------------------
+# Persistence
+# ------------------------------
+def load_forest(model_path=MODEL_PATH, rows_path=ROWS_PATH, n_jobs=-1):
+    clf = joblib.load(model_path)
+    clf.set_params(n_jobs=n_jobs)
+    with np.load(rows_path, allow_pickle=False) as rows:
+        X, y = rows["X"], rows["y"]
+    return clf, X, y.astype(str)
+
+
+def save_forest(clf, X, y, model_path=MODEL_PATH, rows_path=ROWS_PATH):
+    joblib.dump(clf, model_path)
+    tmp = f"{rows_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, X=np.asarray(X, dtype=np.float64), y=np.asarray(y, dtype=str))
+    os.replace(tmp, rows_path)
+
+
+def initial_forest(n_jobs=-1):
+    """The forest of random_forest.py and the rows it was trained on."""
+    return train_forest(n_jobs=n_jobs), np.asarray(train_data, dtype=np.float64), np.asarray(train_labels)
+
+
+def read_labeled_rows(path):
+    """(X, y) from a CSV with the 20 feature columns and a 'label' column."""
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    missing = [name for name in features if name not in df.columns]
+    if missing:
+        raise ValueError(f"{path}: missing feature columns {missing}")
+    y = df[LABEL_COLUMN].astype(str).to_numpy() if LABEL_COLUMN in df.columns else None
+    return df[features].to_numpy(dtype=np.float64), y
+
+
+# ------------------------------
+# Growing
+# ------------------------------
+def grow(clf, X, y, n_trees, drop_oldest=0):
+    """Add ``n_trees`` trees fitted on (X, y), then retire the ``drop_oldest`` oldest.
+
+    The new trees see every row passed in, so pass the full labeled set
+    (old rows plus new arrivals). Returns the same, updated classifier.
+    """
+    unknown = set(np.unique(y)) - set(clf.classes_.astype(str))
+    if unknown:
+        raise ValueError(f"labels {sorted(unknown)} are not classes of the forest; retrain it with init")
+    if drop_oldest >= len(clf.estimators_) + n_trees:
+        raise ValueError("cannot drop every tree of the forest")
+
+    # warm_start derives the new trees' seeds from random_state after skipping
+    # len(estimators_) draws; once trees have been dropped that would replay
+    # seeds still in use, so every growth round gets its own random_state.
+    rounds = getattr(clf, "growth_rounds_", 0) + 1
+    base_seed = getattr(clf, "base_seed_", clf.random_state)
+    if not isinstance(base_seed, (int, np.integer)):
+        base_seed = 0
+    clf.set_params(warm_start=True, n_estimators=len(clf.estimators_) + n_trees,
+                   random_state=int(np.random.SeedSequence([base_seed, rounds]).generate_state(1)[0]))
+    clf.fit(X, y)
+    clf.growth_rounds_ = rounds
+    clf.base_seed_ = base_seed
+
+    if drop_oldest:
+        clf.estimators_ = clf.estimators_[drop_oldest:]
+        clf.n_estimators = len(clf.estimators_)
+    clf.set_params(warm_start=False)
+    return clf
+
+
+# ------------------------------
+# Convergence over tree prefixes
+# ------------------------------
+def _tree_importances(clf):
+    # RandomForestClassifier.feature_importances_ averages the normalized
+    # importances of the trees that have a split
+    imps = np.zeros((len(clf.estimators_), clf.n_features_in_))
+    used = np.zeros(len(clf.estimators_), dtype=bool)
+    for i, tree in enumerate(clf.estimators_):
+        if tree.tree_.node_count > 1:
+            imps[i] = tree.feature_importances_
+            used[i] = True
+    return imps, used
+
+
+def convergence(clf, X_eval, y_eval=None, step=1, acc_tol=0.01, imp_tol=0.02):
+    """Accuracy, agreement and importances of every ``step``-th prefix of the forest."""
+    X_eval = np.asarray(X_eval, dtype=np.float32)
+    n = len(clf.estimators_)
+    sizes = np.unique(np.r_[np.arange(step, n + 1, step), n])
+
+    # Per-tree probabilities, summed in tree order like RandomForestClassifier
+    proba = np.zeros((len(X_eval), len(clf.classes_)))
+    imps, used = _tree_importances(clf)
+    imp_sum = np.zeros(clf.n_features_in_)
+    n_used = 0
+    accuracy, importances, predictions = [], [], []
+    size_iter = iter(sizes)
+    target = next(size_iter)
+    for k, tree in enumerate(clf.estimators_, 1):
+        proba += tree.predict_proba(X_eval)
+        if used[k - 1]:
+            imp_sum += imps[k - 1]
+            n_used += 1
+        if k == target:
+            pred = clf.classes_[np.argmax(proba, axis=1)]
+            predictions.append(pred)
+            accuracy.append(np.mean(pred.astype(str) == y_eval) if y_eval is not None else np.nan)
+            mean_imp = imp_sum / max(n_used, 1)
+            total = mean_imp.sum()
+            importances.append(mean_imp / total if total > 0 else mean_imp)
+            target = next(size_iter, None)
+
+    final = predictions[-1]
+    agreement = np.array([np.mean(p == final) for p in predictions])
+    accuracy = np.array(accuracy)
+    importances = np.array(importances)
+
+    within = (np.abs(agreement - 1.0) <= acc_tol) & (np.abs(importances - importances[-1]).max(axis=1) <= imp_tol)
+    if y_eval is not None:
+        within &= np.abs(accuracy - accuracy[-1]) <= acc_tol
+    # Smallest size from which every larger prefix stays within tolerance
+    unstable = np.flatnonzero(~within)
+    stable_size = int(sizes[unstable[-1] + 1]) if len(unstable) else int(sizes[0])
+    return Convergence(sizes, accuracy, agreement, importances, stable_size)
+
+
+def format_convergence(conv, top=3):
+    lines = [f"{'trees':>6s} {'accuracy':>9s} {'agreement':>10s}  top importances"]
+    for i, k in enumerate(conv.n_trees):
+        order = np.argsort(-conv.importances[i])[:top]
+        imps = ", ".join(f"{features[j]} {conv.importances[i, j]:.3f}" for j in order)
+        acc = f"{conv.accuracy[i]:9.4f}" if not np.isnan(conv.accuracy[i]) else f"{'-':>9s}"
+        lines.append(f"{k:6d} {acc} {conv.agreement[i]:10.4f}  {imps}")
+    lines.append(f"Smallest stable forest: {conv.stable_size} trees")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grow the random forest incrementally and check its convergence")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--rows", default=ROWS_PATH, help="labeled rows the forest has been trained on")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("init", help="train the random_forest.py forest and store its rows")
+    p = sub.add_parser("grow", help="append labeled rows and add trees")
+    p.add_argument("source", nargs="?", help="CSV with the feature columns and a 'label' column")
+    p.add_argument("--trees", type=int, default=20)
+    p.add_argument("--drop-oldest", type=int, default=0)
+    p = sub.add_parser("convergence", help="report accuracy and importances per forest size")
+    p.add_argument("--eval", help="CSV of evaluation rows (with 'label' for accuracy); default: stored rows")
+    p.add_argument("--step", type=int, default=5)
+    p.add_argument("--acc-tol", type=float, default=0.01)
+    p.add_argument("--imp-tol", type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    if args.command == "init":
+        clf, X, y = initial_forest(args.n_jobs)
+        save_forest(clf, X, y, args.model, args.rows)
+        print(f"{len(clf.estimators_)} trees trained on {len(y)} rows")
+        return 0
+
+    clf, X, y = load_forest(args.model, args.rows, args.n_jobs)
+    if args.command == "grow":
+        if args.source:
+            X_new, y_new = read_labeled_rows(args.source)
+            if y_new is None:
+                raise SystemExit(f"{args.source}: a '{LABEL_COLUMN}' column is required to grow the forest")
+            X, y = np.vstack([X, X_new]), np.concatenate([y, y_new])
+        grow(clf, X, y, args.trees, args.drop_oldest)
+        save_forest(clf, X, y, args.model, args.rows)
+        print(f"{len(clf.estimators_)} trees, trained on {len(y)} rows")
+        return 0
+
+    X_eval, y_eval = read_labeled_rows(args.eval) if args.eval else (X, y)
+    conv = convergence(clf, X_eval, y_eval, args.step, args.acc_tol, args.imp_tol)
+    print("\n".join(format_convergence(conv)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
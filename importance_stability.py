@@ -0,0 +1,262 @@
+import argparse
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from profiling import stage
+from split_evaluation import DEFAULT_TREE_PARAMS, make_splits, split_pool, worker_arrays
+from subset_search import GROUPINGS
+
+# ------------------------------
+# Permutation importance and bootstrap stability
+# ------------------------------
+# The scripts report impurity-based feature_importances_ from a handful of
+# fits. This runs many resampling rounds of two kinds:
+#
+#   permutation  fit a tree on one of the repeated 60:40 splits, then shuffle
+#                each feature's test column in turn; importance = drop in test
+#                accuracy. Rounds cycle over the splits with fresh shuffles.
+#   bootstrap    fit a tree on a bootstrap resample of all rows; records the
+#                impurity importances, so their spread shows how much a
+#                single fit's ranking can be trusted.
+#
+# Rounds run in waves on a process pool (split_evaluation.split_pool), whose
+# workers read X, y and the split indices from shared memory. Every round
+# draws its randomness from (seed, kind, round index), so results do not
+# depend on the number of workers or the wave size.
+#
+# Each feature gets the mean and a percentile interval over the rounds, and
+# the fraction of rounds in which it ranks in the top k. With early exit, a
+# kind stops once no interval bound has moved by more than --tol between two
+# consecutive waves.
+#
+#   python importance_stability.py Data_CM.xlsx --rounds 5000
+#   python importance_stability.py Data_CM.xlsx --category Experimental --kinds bootstrap --no-early-exit
+
+KINDS = ("permutation", "bootstrap")
+
+StabilityReport = namedtuple(
+    "StabilityReport",
+    ["kind", "columns", "samples", "mean", "lower", "upper", "top_frequency", "converged"],
+)
+StabilityReport.__doc__ = """Importance distribution of one kind over the rounds run.
+
+columns        feature indices, in the order of every per-feature array
+samples        (n_rounds, n_features) importance of every round
+mean           (n_features,)
+lower, upper   (n_features,) percentile interval at the requested confidence
+top_frequency  (n_features,) fraction of rounds ranking the feature in the top k
+converged      True when early exit stopped before the round limit
+"""
+
+
+def round_seeds(seed, kind, rounds):
+    """One 32-bit seed per round index, independent of how rounds are batched."""
+    kind_id = KINDS.index(kind)
+    return [int(np.random.SeedSequence([seed, kind_id, r]).generate_state(1)[0]) for r in rounds]
+
+
+# ------------------------------
+# Worker side
+# ------------------------------
+def _permutation_task(task):
+    from sklearn.tree import DecisionTreeClassifier
+
+    columns, split, seeds, params = task
+    X, y, train, test = worker_arrays()
+    X_train, y_train = X[train[split]][:, columns], y[train[split]]
+    X_test, y_test = X[test[split]][:, columns], y[test[split]]
+
+    clf = DecisionTreeClassifier(**params).fit(X_train, y_train)
+    base = np.mean(clf.predict(X_test) == y_test)
+    n_test, n_cols = X_test.shape
+    drops = np.empty((len(seeds), n_cols))
+    for r, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        # Every feature shuffled in its own copy, predicted in one call
+        stacked = np.tile(X_test, (n_cols, 1))
+        for j in range(n_cols):
+            stacked[j * n_test:(j + 1) * n_test, j] = X_test[rng.permutation(n_test), j]
+        correct = (clf.predict(stacked) == np.tile(y_test, n_cols)).reshape(n_cols, n_test)
+        drops[r] = base - correct.mean(axis=1)
+    return drops
+
+
+def _bootstrap_task(task):
+    from sklearn.tree import DecisionTreeClassifier
+
+    columns, seeds, params = task
+    X, y, _, _ = worker_arrays()
+    out = np.empty((len(seeds), len(columns)))
+    for r, seed in enumerate(seeds):
+        rows = np.random.default_rng(seed).integers(0, len(y), len(y))
+        out[r] = DecisionTreeClassifier(**params).fit(X[rows][:, columns], y[rows]).feature_importances_
+    return out
+
+
+# ------------------------------
+# Summaries
+# ------------------------------
+def summarize(kind, columns, samples, confidence=0.95, top_k=5, converged=False):
+    """StabilityReport of an (n_rounds, n_features) array of importances."""
+    alpha = (1.0 - confidence) / 2.0
+    lower, upper = np.quantile(samples, [alpha, 1.0 - alpha], axis=0)
+    # Rank within each round; ties share the better rank
+    k = min(top_k, samples.shape[1])
+    kth = -np.partition(-samples, k - 1, axis=1)[:, k - 1:k]
+    in_top = (samples >= kth) & (samples > 0)
+    return StabilityReport(kind, list(columns), samples, samples.mean(axis=0), lower, upper,
+                           in_top.mean(axis=0), converged)
+
+
+def interval_shift(previous, current):
+    """Largest move of any interval bound between two reports."""
+    return float(max(np.abs(current.lower - previous.lower).max(), np.abs(current.upper - previous.upper).max()))
+
+
+# ------------------------------
+# Driver
+# ------------------------------
+class StabilityAnalysis:
+    """Runs importance rounds over a shared-memory process pool.
+
+    Use as a context manager so the worker pool is shut down afterwards.
+    """
+
+    def __init__(self, X, y, columns=None, n_splits=20, test_size=0.4, n_jobs=None, tree_params=None,
+                 seed=0, confidence=0.95, top_k=5):
+        self.X = np.asarray(X)
+        self.y = np.unique(np.asarray(y), return_inverse=True)[1].ravel()
+        self.columns = list(range(self.X.shape[1]) if columns is None else columns)
+        self.params = dict(DEFAULT_TREE_PARAMS if tree_params is None else tree_params)
+        self.n_jobs = (os.cpu_count() or 1) if n_jobs is None else n_jobs
+        self.seed = seed
+        self.confidence = confidence
+        self.top_k = top_k
+        self.train, self.test = make_splits(len(self.y), range(n_splits), test_size)
+        self._pool = None
+        self._run = None
+
+    def __enter__(self):
+        self._pool = split_pool(self.X, self.y, self.train, self.test, self.n_jobs)
+        self._run = self._pool.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        pool, self._pool, self._run = self._pool, None, None
+        return pool.__exit__(*exc)
+
+    def _tasks(self, kind, rounds):
+        seeds = round_seeds(self.seed, kind, rounds)
+        per_task = max(1, -(-len(rounds) // (4 * self.n_jobs)))
+        if kind == "bootstrap":
+            return [(self.columns, seeds[i:i + per_task], self.params) for i in range(0, len(seeds), per_task)]
+        # Permutation rounds are grouped by split so each task fits one tree
+        n_splits = len(self.train)
+        by_split = {}
+        for r, seed in zip(rounds, seeds):
+            by_split.setdefault(r % n_splits, []).append(seed)
+        return [(self.columns, split, split_seeds[i:i + per_task], self.params)
+                for split, split_seeds in sorted(by_split.items())
+                for i in range(0, len(split_seeds), per_task)]
+
+    def run(self, kind, max_rounds=1000, wave=None, tol=None, min_rounds=None):
+        """StabilityReport after ``max_rounds`` rounds, or earlier once intervals settle (``tol``)."""
+        if kind not in KINDS:
+            raise ValueError(f"unknown kind {kind!r}; expected one of {KINDS}")
+        wave = wave or max(len(self.train), 10 * self.n_jobs)
+        min_rounds = min_rounds if min_rounds is not None else 2 * wave
+        fn = _bootstrap_task if kind == "bootstrap" else _permutation_task
+
+        waves, done, report, converged = [], 0, None, False
+        while done < max_rounds:
+            rounds = list(range(done, min(done + wave, max_rounds)))
+            tasks = self._tasks(kind, rounds)
+            with stage(f"{kind}_wave", rounds=len(rounds), n_tasks=len(tasks)):
+                outputs = self._run(fn, tasks)
+            waves.append(self._in_round_order(kind, rounds, np.concatenate(outputs)))
+            done = rounds[-1] + 1
+
+            current = summarize(kind, self.columns, np.vstack(waves), self.confidence, self.top_k)
+            settled = (tol is not None and report is not None and done >= min_rounds
+                       and interval_shift(report, current) <= tol)
+            report = current
+            if settled and done < max_rounds:
+                converged = True
+                break
+        return report._replace(converged=converged)
+
+    def _in_round_order(self, kind, rounds, samples):
+        if kind == "bootstrap":
+            return samples
+        # Permutation tasks come back grouped by split
+        n_splits = len(self.train)
+        order = sorted(rounds, key=lambda r: (r % n_splits, r))
+        return samples[np.argsort(order, kind="stable")]
+
+
+# ------------------------------
+# Report
+# ------------------------------
+def format_report(report, feature_names, top=None):
+    order = np.argsort(-report.mean)[:top]
+    level = "converged" if report.converged else "round limit"
+    lines = [f"{report.kind.capitalize()} importance, {len(report.samples)} rounds ({level}):",
+             f"  {'feature':<32s} {'mean':>8s} {'interval':>19s} {'top-k':>6s}"]
+    for j in order:
+        name = feature_names[report.columns[j]]
+        lines.append(f"  {name:<32s} {report.mean[j]:8.4f} [{report.lower[j]:8.4f}, {report.upper[j]:8.4f}] "
+                     f"{report.top_frequency[j]:6.1%}")
+    return lines
+
+
+def main(argv=None):
+    from dataset_cache import load_dataset
+
+    parser = argparse.ArgumentParser(description="Permutation importance and bootstrap stability of the features")
+    parser.add_argument("data", nargs="?", default="Data_CM.xlsx", help="workbook laid out like Data_CM.xlsx")
+    parser.add_argument("--sheet", default="Sheet1")
+    parser.add_argument("--kinds", default=",".join(KINDS), help=f"comma-separated subset of {', '.join(KINDS)}")
+    parser.add_argument("--category", help="restrict to one feature category of murzyme_classical_classification.py")
+    parser.add_argument("--rounds", type=int, default=2000, help="round limit per kind")
+    parser.add_argument("--wave", type=int, default=None, help="rounds per wave (early-exit check interval)")
+    parser.add_argument("--tol", type=float, default=0.002, help="largest interval move that counts as settled")
+    parser.add_argument("--no-early-exit", action="store_true", help="always run --rounds rounds")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--splits", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--n-jobs", type=int, default=None)
+    parser.add_argument("-o", "--output", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    kinds = args.kinds.split(",")
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        parser.error(f"unknown kind: {', '.join(sorted(unknown))}")
+
+    data = load_dataset(args.data, sheet_name=args.sheet)
+    columns = None
+    if args.category:
+        groups = GROUPINGS["murzyme_classical_classification.py"]
+        if args.category not in groups:
+            parser.error(f"unknown category {args.category!r}; expected one of {', '.join(groups)}")
+        columns = [c for c in groups[args.category] if c < data.n_features]
+
+    lines = []
+    with StabilityAnalysis(data.X, data.y, columns, n_splits=args.splits, n_jobs=args.n_jobs, seed=args.seed,
+                           confidence=args.confidence, top_k=args.top_k) as analysis:
+        for kind in kinds:
+            report = analysis.run(kind, args.rounds, args.wave, None if args.no_early_exit else args.tol)
+            lines.extend(format_report(report, data.feature_names))
+            lines.append("")
+    print("\n".join(lines))
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write("\n".join(lines))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+import argparse
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+from info_gain_engine import contingency_tables, scores_from_tables
+
+# ------------------------------
+# Incremental information-gain store
+# ------------------------------
+# Information gain only depends on the (feature, value, label) counts, so the
+# store keeps those counts and nothing else. Appending or removing a batch
+# updates them in O(batch); scores are derived from the counts on demand, and
+# stores built on different machines are merged by adding their counts.
+#
+# Raw cell values (strings such as "Yes"/"High" or numbers) are mapped to
+# per-feature codes in order of first appearance, so no global re-encoding is
+# ever needed. Empty cells (None/NaN) are one more value, like any other.
+#
+#   python incremental_ig.py init ig_store.npz Data_CM.xlsx
+#   python incremental_ig.py add ig_store.npz new_enzymes.csv
+#   python incremental_ig.py remove ig_store.npz retracted.xlsx
+#   python incremental_ig.py merge ig_store.npz lab_b_store.npz
+#   python incremental_ig.py show ig_store.npz
+
+STORE_VERSION = 1
+
+
+def _key(value):
+    """Hashable, JSON-friendly form of a cell value; empty cells become None."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class IGStore:
+    """Running (feature, value, label) counts for a fixed list of features.
+
+    tables  (n_features, n_values, n_classes) int64 counts; value codes index
+            vocab[j], class codes index labels
+    """
+
+    def __init__(self, feature_names):
+        self.feature_names = list(feature_names)
+        self.vocab = [[] for _ in self.feature_names]   # code -> raw value, per feature
+        self.labels = []                                # code -> raw label
+        self._codes = [{} for _ in self.feature_names]  # raw value -> code, per feature
+        self._label_codes = {}
+        self.tables = np.zeros((len(self.feature_names), 0, 0), dtype=np.int64)
+
+    @property
+    def n_rows(self):
+        return int(self.tables[0].sum()) if len(self.tables) else 0
+
+    def __len__(self):
+        return self.n_rows
+
+    # ------------------------------
+    # Encoding
+    # ------------------------------
+    def _grow(self):
+        n_values = max((len(v) for v in self.vocab), default=0)
+        n_classes = len(self.labels)
+        f, v, c = self.tables.shape
+        if v < n_values or c < n_classes:
+            grown = np.zeros((f, max(v, n_values), max(c, n_classes)), dtype=np.int64)
+            grown[:, :v, :c] = self.tables
+            self.tables = grown
+
+    def _encode(self, rows, labels, extend):
+        rows = list(rows)
+        labels = [_key(label) for label in labels]
+        if len(rows) != len(labels):
+            raise ValueError(f"{len(rows)} rows but {len(labels)} labels")
+
+        X = np.empty((len(rows), len(self.feature_names)), dtype=np.int64)
+        for i, row in enumerate(rows):
+            if len(row) != len(self.feature_names):
+                raise ValueError(f"row {i} has {len(row)} values, expected {len(self.feature_names)}")
+            for j, value in enumerate(row):
+                value = _key(value)
+                codes = self._codes[j]
+                if value not in codes:
+                    if not extend:
+                        raise ValueError(f"{self.feature_names[j]!r} has never seen the value {value!r}")
+                    codes[value] = len(self.vocab[j])
+                    self.vocab[j].append(value)
+                X[i, j] = codes[value]
+
+        y = np.empty(len(labels), dtype=np.int64)
+        for i, label in enumerate(labels):
+            if label not in self._label_codes:
+                if not extend:
+                    raise ValueError(f"label {label!r} has never been seen")
+                self._label_codes[label] = len(self.labels)
+                self.labels.append(label)
+            y[i] = self._label_codes[label]
+
+        self._grow()
+        return X, y
+
+    def _batch_tables(self, X, y):
+        _, n_values, n_classes = self.tables.shape
+        return contingency_tables(X, y, n_values=n_values, n_classes=n_classes)
+
+    # ------------------------------
+    # Updates
+    # ------------------------------
+    def add(self, rows, labels):
+        """Count a batch of rows (sequences of raw values in feature order)."""
+        X, y = self._encode(rows, labels, extend=True)
+        if len(y):
+            self.tables += self._batch_tables(X, y)
+        return self
+
+    def remove(self, rows, labels):
+        """Un-count rows that were added before; nothing changes on error."""
+        X, y = self._encode(rows, labels, extend=False)
+        if not len(y):
+            return self
+        remaining = self.tables - self._batch_tables(X, y)
+        if (remaining < 0).any():
+            raise ValueError("removing rows that were never added")
+        self.tables = remaining
+        return self
+
+    def merge(self, other):
+        """Add the counts of another store over the same features."""
+        if other.feature_names != self.feature_names:
+            raise ValueError("stores track different features")
+
+        # Translate the other store's codes into ours, extending our vocabularies
+        for j, values in enumerate(other.vocab):
+            for value in values:
+                if value not in self._codes[j]:
+                    self._codes[j][value] = len(self.vocab[j])
+                    self.vocab[j].append(value)
+        for label in other.labels:
+            if label not in self._label_codes:
+                self._label_codes[label] = len(self.labels)
+                self.labels.append(label)
+        self._grow()
+
+        label_map = np.array([self._label_codes[label] for label in other.labels], dtype=np.intp)
+        for j, values in enumerate(other.vocab):
+            value_map = np.array([self._codes[j][value] for value in values], dtype=np.intp)
+            if len(value_map) and len(label_map):
+                counts = other.tables[j, :len(values), :len(other.labels)]
+                np.add.at(self.tables[j], (value_map[:, None], label_map[None, :]), counts)
+        return self
+
+    # ------------------------------
+    # Scores
+    # ------------------------------
+    def scores(self):
+        """InfoGainScores for every feature over all rows counted so far."""
+        return scores_from_tables(self.tables)
+
+    def ranking(self):
+        """(feature name, information gain) pairs, highest gain first."""
+        ig = self.scores().information_gain
+        return sorted(zip(self.feature_names, ig.tolist()), key=lambda pair: -pair[1])
+
+    # ------------------------------
+    # Persistence
+    # ------------------------------
+    def save(self, path):
+        header = {
+            "version": STORE_VERSION,
+            "feature_names": self.feature_names,
+            "vocab": self.vocab,
+            "labels": self.labels,
+        }
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, header=np.array(json.dumps(header)), tables=self.tables)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            header = json.loads(str(saved["header"]))
+            tables = saved["tables"]
+        if header.get("version") != STORE_VERSION:
+            raise ValueError(f"{path}: unsupported store version {header.get('version')}")
+
+        store = cls(header["feature_names"])
+        store.vocab = [list(values) for values in header["vocab"]]
+        store.labels = list(header["labels"])
+        store._codes = [{value: code for code, value in enumerate(values)} for values in store.vocab]
+        store._label_codes = {label: code for code, label in enumerate(store.labels)}
+        store.tables = tables.astype(np.int64)
+        return store
+
+
+# ------------------------------
+# Reading Data_CM-style tables
+# ------------------------------
+def read_rows(path, sheet_name="Sheet1"):
+    """(feature_names, rows, labels) from a sheet laid out like Data_CM.xlsx.
+
+    Column A holds the enzyme name, the last column the label and everything
+    in between the features.
+    """
+    import pandas as pd
+
+    if path.lower().endswith((".xlsx", ".xlsm", ".xls")):
+        df = pd.read_excel(path, sheet_name=sheet_name)
+    else:
+        df = pd.read_csv(path)
+    features = df.iloc[:, 1:-1]
+    rows = features.astype(object).to_numpy().tolist()
+    labels = df.iloc[:, -1].tolist()
+    return [str(c) for c in features.columns], rows, labels
+
+
+def _check_columns(store, names, path):
+    if names != store.feature_names:
+        raise SystemExit(f"{path}: feature columns do not match the store")
+
+
+def _print_scores(store, out=sys.stdout):
+    scores = store.scores()
+    out.write(f"Rows counted\t-\t{store.n_rows}\n")
+    out.write(f"Information Gain before split\t-\t{scores.entropy:.6f}\n")
+    out.write("Feature\tInformation Gain\tGain Ratio\n")
+    for j, name in enumerate(store.feature_names):
+        out.write(f"{name}\t{scores.information_gain[j]:.6f}\t{scores.gain_ratio[j]:.6f}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep information gain up to date as labeled enzymes are added")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("init", help="create a store from a sheet")
+    p.add_argument("store")
+    p.add_argument("source")
+    p.add_argument("--sheet", default="Sheet1")
+    for name, text in (("add", "count the rows of a sheet"), ("remove", "un-count the rows of a sheet")):
+        p = sub.add_parser(name, help=text)
+        p.add_argument("store")
+        p.add_argument("source")
+        p.add_argument("--sheet", default="Sheet1")
+    p = sub.add_parser("merge", help="add the counts of other stores")
+    p.add_argument("store")
+    p.add_argument("others", nargs="+")
+    p = sub.add_parser("show", help="print the current scores")
+    p.add_argument("store")
+    args = parser.parse_args(argv)
+
+    if args.command == "init":
+        names, rows, labels = read_rows(args.source, args.sheet)
+        store = IGStore(names).add(rows, labels)
+    else:
+        store = IGStore.load(args.store)
+        if args.command in ("add", "remove"):
+            names, rows, labels = read_rows(args.source, args.sheet)
+            _check_columns(store, names, args.source)
+            getattr(store, args.command)(rows, labels)
+        elif args.command == "merge":
+            for other in args.others:
+                store.merge(IGStore.load(other))
+
+    if args.command != "show":
+        store.save(args.store)
+    _print_scores(store)
+
+
+if __name__ == "__main__":
+    main()
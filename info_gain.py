@@ -1,17 +1,15 @@
-import pandas as pd
-import numpy as np
-from sklearn.preprocessing import LabelEncoder
-import math
+from dataset_cache import load_dataset
+from info_gain_engine import information_gain_all
 
 # ------------------------------
-# Load the Excel Data
+# Load the Excel Data (cached, already label-encoded)
 # ------------------------------
-df = pd.read_excel("Data_CM.xlsx", sheet_name="Sheet1")
+data = load_dataset("Data_CM.xlsx", sheet_name="Sheet1")
 
 # Extract enzyme name, features, and label
-enzyme_names = df.iloc[:, 0]       # Column A
-label = df.iloc[:, -1]             # Column V
-features = df.iloc[:, 1:-1]        # Columns B to U → indices 1 to 20 → relative to features: 0 to 19
+enzyme_names = data.enzyme_names   # Column A
+feature_names = data.feature_names # Columns B to U → indices 1 to 20 → relative to features: 0 to 19
+features = data.X                  # Encoded feature matrix
 
 # ------------------------------
 # Define Feature Categories (corrected ranges)
@@ -27,50 +25,24 @@ categories = {
 }
 
 # ------------------------------
-# Encode the Output Class
+# Encoded Output Class (Column V)
 # ------------------------------
-le_label = LabelEncoder()
-y_encoded = le_label.fit_transform(label)
-
-# ------------------------------
-# Define Entropy and Information Gain Functions
-# ------------------------------
-def entropy(y):
-    values, counts = np.unique(y, return_counts=True)
-    probs = counts / len(y)
-    return -np.sum([p * math.log2(p) for p in probs if p > 0])
-
-def information_gain(X_col, y):
-    unique_vals = np.unique(X_col)
-    weighted_entropy = 0
-    for val in unique_vals:
-        subset_y = y[X_col == val]
-        weight = len(subset_y) / len(y)
-        weighted_entropy += weight * entropy(subset_y)
-    return entropy(y) - weighted_entropy
+y_encoded = data.y
 
 # ------------------------------
 # Calculate Information Gain
 # ------------------------------
-entropy_before_split = entropy(y_encoded)
+# One vectorized pass builds the contingency tables for all features
+scores = information_gain_all(features, y_encoded)
+entropy_before_split = scores.entropy
 
 results = [f"Information Gain before split\t-\t{entropy_before_split:.6f}"]
 results.append("Feature\tCategory\tInformation Gain")
 
-le_feat = LabelEncoder()
-
 for category, indices in categories.items():
     for idx in indices:
-        feature_name = features.columns[idx]
-        col = features[feature_name]
-
-        # Encode categorical data if necessary
-        if col.dtype == 'object':
-            col_encoded = le_feat.fit_transform(col)
-        else:
-            col_encoded = col.astype(int)
-
-        ig = information_gain(col_encoded, y_encoded)
+        feature_name = feature_names[idx]
+        ig = scores.information_gain[idx]
         results.append(f"{feature_name}\t{category}\t{ig:.6f}")
 
 # ------------------------------
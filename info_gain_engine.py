@@ -0,0 +1,244 @@
+import argparse
+import math
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+# ------------------------------
+# Batched information-gain engine
+# ------------------------------
+# Builds the (feature, value, label) contingency table for every column in a
+# single bincount pass and derives all split scores from it. Features must be
+# integer codes (the label-encoded matrix from dataset_cache works as is).
+
+InfoGainScores = namedtuple(
+    "InfoGainScores",
+    ["entropy", "information_gain", "gain_ratio", "mutual_info", "split_info"],
+)
+InfoGainScores.__doc__ = """Scores for every column of a feature matrix.
+
+entropy           H(y) in bits, before any split (scalar)
+information_gain  H(y) - H(y | x) in bits, one value per feature
+gain_ratio        information_gain / split_info (0 where split_info is 0)
+mutual_info       I(x; y) in nats, as reported by sklearn's mutual_info_score
+split_info        H(x) in bits, one value per feature
+"""
+
+
+# ------------------------------
+# Contingency tables
+# ------------------------------
+def dense_codes(X):
+    """Shift/re-encode columns so every value is a small non-negative code."""
+    X = np.asarray(X)
+    if X.dtype.kind not in "iub":
+        raise TypeError("features must be integer codes; label-encode them first")
+    if X.size == 0:
+        return X.astype(np.int64)
+
+    X = X.astype(np.int64, copy=False)
+    lo = X.min(axis=0)
+    span = X.max(axis=0) - lo + 1
+    if span.max() <= max(X.shape[0], 256):
+        return X - lo
+
+    # Sparse, wide-ranging values: fall back to per-column ranks
+    out = np.empty(X.shape, dtype=np.int64)
+    for j in range(X.shape[1]):
+        out[:, j] = np.unique(X[:, j], return_inverse=True)[1]
+    return out
+
+
+def contingency_tables(X, y, n_values=None, n_classes=None, feature_block=None):
+    """Count table of shape (n_features, n_values, n_classes).
+
+    ``X`` holds non-negative integer codes and ``y`` encoded labels.
+    ``feature_block`` bounds the temporary key array to
+    ``n_rows * feature_block`` entries for very wide matrices.
+    """
+    X = np.asarray(X)
+    y = np.asarray(y, dtype=np.int64)
+    n_rows, n_features = X.shape
+    if n_values is None:
+        n_values = int(X.max()) + 1 if X.size else 1
+    if n_classes is None:
+        n_classes = int(y.max()) + 1 if y.size else 1
+    if feature_block is None:
+        feature_block = n_features
+
+    cells = n_values * n_classes
+    tables = np.empty((n_features, n_values, n_classes), dtype=np.int64)
+    for start in range(0, n_features, max(feature_block, 1)):
+        stop = min(start + feature_block, n_features)
+        block = np.asarray(X[:, start:stop], dtype=np.int64)
+        offsets = np.arange(stop - start, dtype=np.int64) * cells
+        keys = offsets + block * n_classes + y[:, None]
+        counts = np.bincount(keys.ravel(), minlength=(stop - start) * cells)
+        tables[start:stop] = counts.reshape(stop - start, n_values, n_classes)
+    return tables
+
+
+def _pad_values(tables, n_values):
+    if tables.shape[1] >= n_values:
+        return tables
+    pad = np.zeros((tables.shape[0], n_values - tables.shape[1], tables.shape[2]), dtype=tables.dtype)
+    return np.concatenate([tables, pad], axis=1)
+
+
+def add_tables(a, b):
+    """Sum two count tables that may have seen different value ranges."""
+    n_values = max(a.shape[1], b.shape[1])
+    if a.shape[2] != b.shape[2]:
+        raise ValueError("count tables were built for a different number of classes")
+    return _pad_values(a, n_values) + _pad_values(b, n_values)
+
+
+# ------------------------------
+# Scores
+# ------------------------------
+def _xlogx(counts):
+    counts = np.asarray(counts, dtype=np.float64)
+    out = np.zeros_like(counts)
+    nz = counts > 0
+    out[nz] = counts[nz] * np.log2(counts[nz])
+    return out
+
+
+def _entropy_from_counts(counts, axis=-1):
+    n = counts.sum(axis=axis)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        h = np.log2(n) - _xlogx(counts).sum(axis=axis) / n
+    return np.where(n > 0, h, 0.0)
+
+
+def scores_from_tables(tables):
+    """IG, gain ratio and mutual information for every feature at once."""
+    tables = np.asarray(tables)
+    n = tables[0].sum() if len(tables) else 0
+    class_counts = tables.sum(axis=1)   # (n_features, n_classes)
+    value_counts = tables.sum(axis=2)   # (n_features, n_values)
+
+    h_y = _entropy_from_counts(class_counts)
+    if n > 0:
+        # H(y | x) = (sum_v n_v log n_v - sum_vc n_vc log n_vc) / n
+        h_y_given_x = (_xlogx(value_counts).sum(axis=1) - _xlogx(tables).sum(axis=(1, 2))) / n
+    else:
+        h_y_given_x = np.zeros(len(tables))
+    ig = np.maximum(h_y - h_y_given_x, 0.0)
+
+    split_info = _entropy_from_counts(value_counts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gain_ratio = np.where(split_info > 0, ig / split_info, 0.0)
+
+    entropy = float(h_y[0]) if len(h_y) else 0.0
+    return InfoGainScores(entropy, ig, gain_ratio, ig * math.log(2), split_info)
+
+
+def _span_blocks(spans, n_classes, feature_block, max_cells):
+    """Column groups of similar value span whose tables stay under ``max_cells``."""
+    order = np.argsort(spans, kind="stable")
+    blocks, block = [], []
+    for j in order:
+        # spans ascend, so the newest column sets the block's table height
+        if block and ((len(block) + 1) * spans[j] * n_classes > max_cells or len(block) == feature_block):
+            blocks.append(block)
+            block = []
+        block.append(int(j))
+    if block:
+        blocks.append(block)
+    return blocks
+
+
+def information_gain_all(X, y, feature_block=None, max_cells=1 << 24):
+    """Score every column of ``X`` against labels ``y`` in one pass.
+
+    Columns are counted in groups sized by their own value span, so one
+    high-cardinality column does not widen the table of every other one.
+    Each group's table and its row-by-column key array hold at most
+    ``max_cells`` entries (a single column may exceed that).
+    """
+    y = np.unique(np.asarray(y), return_inverse=True)[1]
+    X = dense_codes(X)
+    n_classes = int(y.max()) + 1 if y.size else 1
+    if X.size == 0:
+        return scores_from_tables(contingency_tables(X, y, n_classes=n_classes))
+
+    spans = X.max(axis=0) + 1
+    n_features = X.shape[1]
+    ig, gain_ratio, mutual_info, split_info = (np.zeros(n_features) for _ in range(4))
+    entropy = 0.0
+    if feature_block is None:
+        # The key array of a block has n_rows * len(block) entries: bound it too
+        feature_block = max(1, max_cells // max(X.shape[0], 1))
+    for block in _span_blocks(spans, n_classes, feature_block, max_cells):
+        tables = contingency_tables(X[:, block], y, n_values=int(spans[block].max()), n_classes=n_classes)
+        part = scores_from_tables(tables)
+        entropy = part.entropy
+        ig[block], gain_ratio[block] = part.information_gain, part.gain_ratio
+        mutual_info[block], split_info[block] = part.mutual_info, part.split_info
+    return InfoGainScores(entropy, ig, gain_ratio, mutual_info, split_info)
+
+
+# ------------------------------
+# Chunked mode (matrices larger than RAM)
+# ------------------------------
+def iter_row_chunks(X, y, chunk_rows):
+    """Yield (X_chunk, y_chunk) slices; works on np.memmap without loading it."""
+    for start in range(0, X.shape[0], chunk_rows):
+        stop = start + chunk_rows
+        yield np.asarray(X[start:stop]), np.asarray(y[start:stop])
+
+
+def accumulate_tables(chunks, n_classes, feature_block=None):
+    """Sum contingency tables over an iterable of (X_chunk, y_chunk).
+
+    Codes must be non-negative and consistent across chunks (e.g. encoded
+    once up front); labels must already be encoded as 0..n_classes-1.
+    """
+    tables = None
+    for X_chunk, y_chunk in chunks:
+        part = contingency_tables(X_chunk, y_chunk, n_classes=n_classes, feature_block=feature_block)
+        tables = part if tables is None else add_tables(tables, part)
+    if tables is None:
+        raise ValueError("no rows to score")
+    return tables
+
+
+def information_gain_chunked(chunks, n_classes, feature_block=None):
+    return scores_from_tables(accumulate_tables(chunks, n_classes, feature_block))
+
+
+# ------------------------------
+# Command line: score .npy matrices chunk by chunk
+# ------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Information gain for every column of an encoded .npy matrix")
+    parser.add_argument("features", help="(n_rows, n_features) integer .npy file")
+    parser.add_argument("labels", help="(n_rows,) integer .npy file of encoded labels")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--feature-block", type=int, default=None)
+    parser.add_argument("--names", help="text file with one feature name per line")
+    args = parser.parse_args(argv)
+
+    X = np.load(args.features, mmap_mode="r")
+    y = np.load(args.labels, mmap_mode="r")
+    n_classes = int(max(y[start:start + args.chunk_rows].max()
+                        for start in range(0, len(y), args.chunk_rows))) + 1
+    scores = information_gain_chunked(iter_row_chunks(X, y, args.chunk_rows), n_classes, args.feature_block)
+
+    if args.names:
+        with open(args.names) as f:
+            names = [line.strip() for line in f]
+    else:
+        names = [f"f{j}" for j in range(X.shape[1])]
+
+    out = sys.stdout
+    out.write(f"Information Gain before split\t-\t{scores.entropy:.6f}\n")
+    out.write("Feature\tInformation Gain\tGain Ratio\tMutual Information\n")
+    for j, name in enumerate(names):
+        out.write(f"{name}\t{scores.information_gain[j]:.6f}\t{scores.gain_ratio[j]:.6f}\t{scores.mutual_info[j]:.6f}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import unicodedata
+from collections import namedtuple
+
+from dataset_cache import CACHE_DIR_NAME, cached_digest
+from profiling import stage
+
+# ------------------------------
+# Multi-source ingestion into the Data_CM layout
+# ------------------------------
+# Ver4 keeps overlapping copies of the enzyme table: Data_CM.xlsx (labeled),
+# "Murzymes features.xlsx" and "15 classical enzymes PDHC doubtful.xlsx"
+# (unlabeled, one class each). This merges any number of workbooks and CSV
+# files into one table with the 20-feature schema, ready for load_dataset()
+# as .xlsx or .csv:
+#
+#   Scanning   sheets are streamed row by row (openpyxl read-only mode, csv),
+#              never loaded whole into pandas. Headers are matched to the
+#              schema after Unicode/case/punctuation folding, so "O2 need"
+#              finds "O₂ Need?". Trailing footnote marks ("Yes*", "Yes#") are
+#              dropped from values; rows missing any feature are skipped.
+#   Dedupe     enzymes are matched by name (case and spacing folded). Sources
+#              are listed in precedence order: the first source that has an
+#              enzyme supplies its row and label, and any later disagreement
+#              is reported as a conflict.
+#   Labels     a source without a Label column takes the label of its spec.
+#   Increments each source's normalized rows are cached under
+#              .murburn_cache/ingest/, keyed on the file's sha256, so only
+#              sources that changed are re-read. A manifest next to the output
+#              records every source's fingerprint; when nothing changed the
+#              output is left as it is.
+#
+# A source spec is PATH[@SHEET][=LABEL]; without @SHEET every sheet is read.
+#
+#   python ingest.py -o merged.xlsx                   the three Ver4 workbooks
+#   python ingest.py -o merged.csv Data_CM.xlsx "new batch.csv=1" "Murzymes features.xlsx@Sheet2=1"
+
+NAME_COLUMN = "Enzyme System"
+LABEL_COLUMN = "Label"
+SCHEMA = [
+    "Heme?", "Flavin?", "FeS?", "Constr. Access?", "Subst > Site?",
+    "Redox?", "Exergonic?", "O₂ Need?", "DRS?", "Reversible?",
+    "Substrate Selectivity", "Product Specificity", "Modulator Diversity", "Non-Integral Stoich?",
+    "Variable Stoich?", "Unusual Kinetics (KM<Kd; KIE)", "kcat > Diffusion?", "Atypical Substrate Dep.?",
+    "Bulk Phase Dep.?", "Temp Dep.?",
+]
+NAME_ALIASES = ("enzymesystem", "enzyme", "enzymename", "name")
+LABEL_ALIASES = ("label", "class")
+FOOTNOTE_MARKS = "*#†‡"
+
+INGEST_DIR = "ingest"
+INGEST_VERSION = 1
+
+VER4_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Ver4")
+DEFAULT_SOURCES = [
+    os.path.join(VER4_DIR, "Data_CM.xlsx"),
+    os.path.join(VER4_DIR, "Murzymes features.xlsx") + "=1",
+    os.path.join(VER4_DIR, "15 classical enzymes PDHC doubtful.xlsx") + "=0",
+]
+
+Source = namedtuple("Source", ["path", "sheet", "label"])
+Source.__doc__ = """One input: a workbook (all sheets, or ``sheet``) or a CSV file.
+
+label  label given to rows when the source has no Label column (None: such rows are skipped)
+"""
+
+MergeReport = namedtuple(
+    "MergeReport",
+    ["rows", "duplicates", "conflicts", "skipped", "reread", "sources", "changed"],
+)
+MergeReport.__doc__ = """Outcome of merge_sources().
+
+rows        merged rows as (name, [20 values], label), in first-seen order
+duplicates  rows dropped because a higher-precedence source had the enzyme
+conflicts   (name, field, kept, dropped, kept_source, dropped_source) disagreements
+skipped     {source spec: rows skipped as incomplete or unlabeled}
+reread      source specs that had to be scanned (not served from the cache)
+sources     [{"spec", "sha256"}] fingerprints, as recorded in the manifest
+changed     False when every fingerprint matched the previous manifest
+"""
+
+
+def parse_source(spec):
+    """Source from PATH[@SHEET][=LABEL]."""
+    path, label = spec, None
+    head, sep, tail = spec.rpartition("=")
+    if sep and re.fullmatch(r"-?\d+", tail.strip()):
+        path, label = head, int(tail)
+    sheet = None
+    if "@" in os.path.basename(path) and not os.path.exists(path):
+        path, _, sheet = path.rpartition("@")
+    return Source(path, sheet or None, label)
+
+
+def source_spec(source):
+    spec = source.path + (f"@{source.sheet}" if source.sheet else "")
+    return spec + (f"={source.label}" if source.label is not None else "")
+
+
+# ------------------------------
+# Normalization
+# ------------------------------
+def header_key(text):
+    """Header folded for matching: NFKC (₂ -> 2), casefold, letters/digits/<> only."""
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    return re.sub(r"[^0-9a-z<>]+", "", text)
+
+
+def name_key(name):
+    """Enzyme name folded for deduplication."""
+    return " ".join(unicodedata.normalize("NFKC", str(name)).casefold().split())
+
+
+def clean_value(value):
+    """Cell value with whitespace and footnote marks stripped; None when empty."""
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return None
+        return int(value) if value.is_integer() else value
+    if isinstance(value, (int, bool)):
+        return int(value)
+    text = str(value).strip().rstrip(FOOTNOTE_MARKS).strip()
+    if not text:
+        return None
+    if re.fullmatch(r"-?\d+", text):
+        return int(text)
+    return text
+
+
+_SCHEMA_KEYS = {header_key(c): j for j, c in enumerate(SCHEMA)}
+
+
+def map_header(header):
+    """(name index, label index or None, {schema index: column index}) for a header row."""
+    keys = [header_key(h) if h is not None else "" for h in header]
+    name = next((i for i, k in enumerate(keys) if k in NAME_ALIASES), None)
+    label = next((i for i, k in enumerate(keys) if k in LABEL_ALIASES), None)
+    columns = {}
+    for i, k in enumerate(keys):
+        j = _SCHEMA_KEYS.get(k)
+        if j is not None and j not in columns:
+            columns[j] = i
+    return name, label, columns
+
+
+# ------------------------------
+# Lazy scanning
+# ------------------------------
+def iter_tables(source):
+    """(table name, row iterator) per sheet of a workbook, or the single CSV table."""
+    if source.path.lower().endswith((".csv", ".tsv", ".txt")):
+        def rows():
+            with open(source.path, newline="", encoding="utf-8-sig") as f:
+                dialect = "excel-tab" if source.path.lower().endswith(".tsv") else "excel"
+                yield from csv.reader(f, dialect)
+
+        yield os.path.basename(source.path), rows()
+        return
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(source.path, read_only=True, data_only=True)
+    try:
+        sheets = [source.sheet] if source.sheet else wb.sheetnames
+        for sheet in sheets:
+            if sheet not in wb.sheetnames:
+                raise ValueError(f"{source.path}: no sheet {sheet!r}")
+            yield sheet, wb[sheet].iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def scan_source(source):
+    """Normalized rows (name, values, label) of a source and the number of rows skipped."""
+    out, skipped = [], 0
+    for table, rows in iter_tables(source):
+        header = next(rows, None)
+        if header is None:
+            continue
+        name_col, label_col, columns = map_header(header)
+        if name_col is None or not columns:
+            raise ValueError(f"{source.path} [{table}]: header has no enzyme name or feature columns")
+        for row in rows:
+            row = list(row)
+            name = clean_value(row[name_col]) if name_col < len(row) else None
+            if name is None:
+                continue
+            values = [clean_value(row[columns[j]]) if j in columns and columns[j] < len(row) else None
+                      for j in range(len(SCHEMA))]
+            label = clean_value(row[label_col]) if label_col is not None and label_col < len(row) else None
+            if label is None:
+                label = source.label
+            if label is None or any(v is None for v in values):
+                skipped += 1
+                continue
+            out.append((str(name), values, label))
+    return out, skipped
+
+
+# ------------------------------
+# Per-source cache and manifest
+# ------------------------------
+def _ingest_dir(cache_dir):
+    path = os.path.join(cache_dir, INGEST_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _write_json(path, payload):
+    tmp = f"{path}.{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def load_source(source, cache_dir):
+    """(rows, skipped, fingerprint, reread) of a source, scanning it only when its bytes changed."""
+    ingest_dir = _ingest_dir(cache_dir)
+    digest = cached_digest(source.path, cache_dir)
+    stem = os.path.splitext(os.path.basename(source.path))[0].replace(" ", "_")
+    label = "" if source.label is None else source.label
+    entry = os.path.join(ingest_dir, f"{stem}-{source.sheet or 'all'}-{label}-{digest[:16]}.json")
+    fingerprint = {"spec": source_spec(source), "sha256": digest}
+    try:
+        with open(entry, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("version") == INGEST_VERSION:
+            rows = [(name, values, label) for name, values, label in cached["rows"]]
+            return rows, cached["skipped"], fingerprint, False
+    except (OSError, ValueError, KeyError):
+        pass
+
+    with stage("scan_source", path=source.path):
+        rows, skipped = scan_source(source)
+    _write_json(entry, {"version": INGEST_VERSION, "rows": rows, "skipped": skipped})
+    return rows, skipped, fingerprint, True
+
+
+def manifest_path(output):
+    return output + ".manifest.json"
+
+
+def read_manifest(output):
+    try:
+        with open(manifest_path(output), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# ------------------------------
+# Merge
+# ------------------------------
+def merge_sources(sources, cache_dir=None, previous=None):
+    """MergeReport of ``sources`` in precedence order (first wins)."""
+    merged, origin = {}, {}
+    duplicates, conflicts, skipped, reread, fingerprints = 0, [], {}, [], []
+    for source in sources:
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(os.path.abspath(source.path)), CACHE_DIR_NAME)
+        rows, n_skipped, fingerprint, was_read = load_source(source, cache_dir)
+        spec = fingerprint["spec"]
+        fingerprints.append(fingerprint)
+        skipped[spec] = n_skipped
+        if was_read:
+            reread.append(spec)
+
+        for name, values, label in rows:
+            key = name_key(name)
+            if key not in merged:
+                merged[key] = (name, values, label)
+                origin[key] = spec
+                continue
+            duplicates += 1
+            _, kept_values, kept_label = merged[key]
+            fields = [(SCHEMA[j], kept_values[j], values[j]) for j in range(len(SCHEMA))
+                      if kept_values[j] != values[j]]
+            if kept_label != label:
+                fields.append((LABEL_COLUMN, kept_label, label))
+            conflicts.extend((name, field, kept, dropped, origin[key], spec) for field, kept, dropped in fields)
+
+    changed = previous is None or previous.get("sources") != fingerprints
+    return MergeReport(list(merged.values()), duplicates, conflicts, skipped, reread, fingerprints, changed)
+
+
+def write_table(path, rows):
+    """Write rows in the Data_CM layout (.csv, or a streamed .xlsx with one Sheet1)."""
+    header = [NAME_COLUMN] + SCHEMA + [LABEL_COLUMN]
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if path.lower().endswith(".csv"):
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows([name] + values + [label] for name, values, label in rows)
+    else:
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Sheet1")
+        ws.append(header)
+        for name, values, label in rows:
+            ws.append([name] + values + [label])
+        wb.save(tmp)
+    os.replace(tmp, path)
+
+
+def ingest(sources, output, cache_dir=None, force=False):
+    """Merge ``sources`` into ``output`` unless the manifest shows nothing changed."""
+    previous = None if force or not os.path.exists(output) else read_manifest(output)
+    report = merge_sources(sources, cache_dir, previous)
+    if report.changed:
+        with stage("write_table", rows=len(report.rows)):
+            write_table(output, report.rows)
+        _write_json(manifest_path(output), {
+            "version": INGEST_VERSION,
+            "sources": report.sources,
+            "rows": len(report.rows),
+            "duplicates": report.duplicates,
+            "conflicts": [list(c) for c in report.conflicts],
+            "skipped": report.skipped,
+        })
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge enzyme workbooks/CSVs into one Data_CM-style table")
+    parser.add_argument("sources", nargs="*",
+                        help="PATH[@SHEET][=LABEL] in precedence order (default: the Ver4 workbooks)")
+    parser.add_argument("-o", "--output", default="merged.xlsx", help=".xlsx or .csv")
+    parser.add_argument("--cache-dir", default=None, help=f"default: {CACHE_DIR_NAME}/ next to the first source")
+    parser.add_argument("--force", action="store_true", help="rewrite the output even if no source changed")
+    parser.add_argument("--conflicts", action="store_true", help="list every conflicting value")
+    args = parser.parse_args(argv)
+
+    sources = [parse_source(s) for s in (args.sources or DEFAULT_SOURCES)]
+    for source in sources:
+        if not os.path.exists(source.path):
+            parser.error(f"no such file: {source.path}")
+
+    report = ingest(sources, args.output, args.cache_dir, args.force)
+    for spec, n in report.skipped.items():
+        state = "scanned" if spec in report.reread else "cached"
+        print(f"{spec}: {state}, {n} incomplete or unlabeled rows skipped")
+    print(f"{len(report.rows)} enzymes, {report.duplicates} duplicates, {len(report.conflicts)} conflicting values")
+    if args.conflicts:
+        for name, field, kept, dropped, kept_source, dropped_source in report.conflicts:
+            print(f"  {name} / {field}: kept {kept!r} ({kept_source}), dropped {dropped!r} ({dropped_source})")
+    print(f"written to {args.output}" if report.changed else f"{args.output} is up to date")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+import json
+import os
+
+# ------------------------------
+# Access to the rule-based definitions in kmm_paper_reprised.ipynb
+# ------------------------------
+# Model, OccamsRazor, consistency_check and classify_murzyme live in the
+# notebook. The batch engines reproduce them and use this loader to check
+# that they still agree with the reference code. Only cells that consist of
+# class/def statements are executed; demo and training cells are skipped.
+
+NOTEBOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kmm_paper_reprised.ipynb")
+
+
+def _is_definition_cell(source):
+    lines = [line for line in source.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+    return bool(lines) and all(
+        line.startswith(("def ", "class ", " ", "\t")) for line in lines
+    )
+
+
+def load_definitions(path=NOTEBOOK_PATH):
+    """Namespace holding every class/function defined in the notebook."""
+    with open(path, encoding="utf-8") as f:
+        notebook = json.load(f)
+
+    namespace = {"__name__": "kmm_notebook_defs"}
+    for cell in notebook["cells"]:
+        if cell["cell_type"] != "code":
+            continue
+        source = "".join(cell["source"])
+        if _is_definition_cell(source):
+            exec(compile(source, path, "exec"), namespace)
+    return namespace
@@ -0,0 +1,307 @@
+import argparse
+from collections import namedtuple
+
+import numpy as np
+
+# ------------------------------
+# Columnar models for consistency_check
+# ------------------------------
+# A notebook Model keeps its attributes in four dicts per object. ModelBatch
+# stores the fields consistency_check() reads as one typed column each, plus
+# a null mask, so a million models cost a few arrays instead of a million
+# dict sets. The eight rules are plain data (RULES) and are compiled into
+# numpy mask expressions over a batch.
+#
+# Semantics follow the scalar code: a rule fires when all of its terms hold.
+# A null (None or absent) value satisfies no term, so "catalytic_rate > 1e9"
+# is False for a missing rate where the notebook would raise TypeError.
+
+NUMBER, TEXT = "number", "text"
+
+# name -> (Model section, column kind), in the order consistency_check reads them
+FIELDS = {
+    "ActiveSiteAccess": ("structural", TEXT),
+    "Selectivity": ("experimental", NUMBER),
+    "Specificity": ("experimental", NUMBER),
+    "Diversity": ("experimental", NUMBER),
+    "NonIntStoichiometry": ("experimental", NUMBER),
+    "SubstrateSize": ("structural", TEXT),
+    "KmKd": ("experimental", NUMBER),
+    "ZerothOrderKinetics": ("experimental", NUMBER),
+    "CatalyticRate": ("experimental", NUMBER),
+    "SubstrateBound": ("proposal", NUMBER),
+    "IntKIE": ("experimental", TEXT),
+}
+
+Rule = namedtuple("Rule", ["name", "terms"])
+Rule.__doc__ = "A consistency rule; fires when every (field, op, value) term holds."
+
+RULES = (
+    Rule("limited_access_unselective", (("ActiveSiteAccess", "==", "limited"), ("Selectivity", "==", False))),
+    Rule("limited_access_unspecific", (("ActiveSiteAccess", "==", "limited"), ("Specificity", "==", False))),
+    Rule("unselective_nonint_stoich", (("Selectivity", "==", False), ("NonIntStoichiometry", "==", True))),
+    Rule("km_below_kd", (("KmKd", "==", True),)),
+    Rule("large_substrate", (("SubstrateSize", "==", "large"),)),
+    Rule("zeroth_order_kinetics", (("ZerothOrderKinetics", "==", 1),)),
+    Rule("rate_above_diffusion", (("CatalyticRate", ">", 1e9),)),
+    Rule("bound_substrate_high_kie", (("SubstrateBound", "==", True), ("IntKIE", "==", "HIGH"))),
+)
+
+NUMBER_OPS = {
+    "==": np.equal, "!=": np.not_equal,
+    "<": np.less, "<=": np.less_equal,
+    ">": np.greater, ">=": np.greater_equal,
+}
+TEXT_OPS = {"==": np.equal, "!=": np.not_equal}
+
+WRONG_TYPE = -2   # text code of a non-string value: present, but equal to no string
+
+CheckResult = namedtuple("CheckResult", ["failures", "rule_failures", "check_cnt"])
+CheckResult.__doc__ = """Output of check_batch.
+
+failures       (n_models,) inconsistency count per model
+rule_failures  {rule name: number of models that fail it}
+check_cnt      number of rules evaluated (consistency_check's check_cnt)
+"""
+
+
+class ModelBatch:
+    """Struct-of-arrays view of many Models.
+
+    values  {field: column}; float64 for number fields, int32 codes into
+            vocab[field] for text fields
+    null    {field: bool mask}, True where the value is None or absent
+    vocab   {field: list of strings} for text fields
+    """
+
+    __slots__ = ("size", "values", "null", "vocab")
+
+    def __init__(self, size, values, null, vocab):
+        self.size = size
+        self.values = values
+        self.null = null
+        self.vocab = vocab
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Build from {field: sequence}; None entries are null.
+
+        Fields listed in FIELDS but missing from ``columns`` are all-null.
+        Number columns may also be given as float arrays with NaN for null.
+        """
+        sizes = {len(col) for col in columns.values()}
+        if len(sizes) > 1:
+            raise ValueError(f"columns have different lengths: {sorted(sizes)}")
+        size = sizes.pop() if sizes else 0
+
+        values, null, vocab = {}, {}, {}
+        for field, (_, kind) in FIELDS.items():
+            col = columns.get(field)
+            if kind == NUMBER:
+                values[field], null[field] = _number_column(col, size)
+            else:
+                values[field], null[field], vocab[field] = _text_column(col, size)
+        return cls(size, values, null, vocab)
+
+    @classmethod
+    def from_models(cls, models):
+        """Collect the checked fields from notebook Model objects."""
+        columns = {
+            field: [getattr(m, section).get(field) for m in models]
+            for field, (section, _) in FIELDS.items()
+        }
+        return cls.from_columns(columns)
+
+    def take(self, index):
+        """Sub-batch of the rows selected by ``index`` (mask, slice or indices)."""
+        values = {f: v[index] for f, v in self.values.items()}
+        null = {f: m[index] for f, m in self.null.items()}
+        size = len(next(iter(null.values()))) if null else 0
+        return ModelBatch(size, values, null, self.vocab)
+
+
+def _number_column(col, size):
+    if col is None:
+        return np.zeros(size, dtype=np.float64), np.ones(size, dtype=bool)
+    if isinstance(col, np.ndarray) and col.dtype.kind in "biuf":
+        values = col.astype(np.float64)
+        null = np.isnan(values)
+        values[null] = 0.0
+        return values, null
+
+    values = np.zeros(size, dtype=np.float64)
+    null = np.ones(size, dtype=bool)
+    for i, v in enumerate(col):
+        # A string in a number field matches nothing, like None
+        if v is None or isinstance(v, str):
+            continue
+        values[i] = v
+        null[i] = False
+    return values, null
+
+
+def _text_column(col, size):
+    if col is None:
+        return np.full(size, -1, dtype=np.int32), np.ones(size, dtype=bool), []
+
+    vocab = {}
+    codes = np.full(size, -1, dtype=np.int32)
+    for i, v in enumerate(col):
+        if v is None:
+            continue
+        codes[i] = vocab.setdefault(v, len(vocab)) if isinstance(v, str) else WRONG_TYPE
+    return codes, codes == -1, list(vocab)
+
+
+# ------------------------------
+# Rule compilation
+# ------------------------------
+def _compile_term(field, op, constant):
+    if field not in FIELDS:
+        raise KeyError(f"unknown field {field!r}")
+    kind = FIELDS[field][1]
+    ops = NUMBER_OPS if kind == NUMBER else TEXT_OPS
+    if op not in ops:
+        raise ValueError(f"operator {op!r} is not supported for {kind} field {field!r}")
+    compare = ops[op]
+
+    if kind == NUMBER:
+        if isinstance(constant, str):
+            raise TypeError(f"{field!r} is a number field, cannot compare with {constant!r}")
+        constant = float(constant)
+
+        def term(batch):
+            return compare(batch.values[field], constant) & ~batch.null[field]
+    else:
+        def term(batch):
+            vocab = batch.vocab[field]
+            code = vocab.index(constant) if constant in vocab else -3
+            return compare(batch.values[field], code) & ~batch.null[field]
+    return term
+
+
+def compile_rule(rule):
+    """Turn a Rule into a function batch -> bool mask of the models it flags."""
+    terms = [_compile_term(*t) for t in rule.terms]
+
+    def mask(batch):
+        out = terms[0](batch)
+        for term in terms[1:]:
+            out &= term(batch)
+        return out
+
+    mask.__name__ = rule.name
+    return mask
+
+
+def compile_rules(rules=RULES):
+    return [(rule.name, compile_rule(rule)) for rule in rules]
+
+
+def check_batch(batch, rules=RULES):
+    """consistency_check for every model of the batch in one vectorized pass."""
+    compiled = compile_rules(rules) if rules and isinstance(rules[0], Rule) else rules
+    failures = np.zeros(batch.size, dtype=np.int16)
+    rule_failures = {}
+    for name, mask in compiled:
+        fired = mask(batch)
+        failures += fired
+        rule_failures[name] = int(np.count_nonzero(fired))
+    return CheckResult(failures, rule_failures, len(compiled))
+
+
+# ------------------------------
+# Agreement with the notebook's consistency_check
+# ------------------------------
+FIELD_CHOICES = {
+    "ActiveSiteAccess": ["limited", "open", None],
+    "Selectivity": [True, False, None],
+    "Specificity": [True, False, None],
+    "Diversity": [True, False, None],
+    "NonIntStoichiometry": [True, False, None],
+    "SubstrateSize": ["large", "small", None],
+    "KmKd": [True, False, None],
+    "ZerothOrderKinetics": [0, 1, None],
+    "CatalyticRate": [1e3, 1e6, 1e9, 5e9],
+    "SubstrateBound": [True, False, None],
+    "IntKIE": ["HIGH", "LOW", None],
+}
+
+
+def random_columns(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        field: [choices[k] for k in rng.integers(0, len(choices), n)]
+        for field, choices in FIELD_CHOICES.items()
+    }
+
+
+def random_batch(n, seed=0):
+    """ModelBatch holding the same models as random_columns(n, seed), built without lists."""
+    rng = np.random.default_rng(seed)
+    values, null, vocab = {}, {}, {}
+    for field, choices in FIELD_CHOICES.items():
+        picks = rng.integers(0, len(choices), n)
+        is_null = np.array([c is None for c in choices])
+        if FIELDS[field][1] == NUMBER:
+            lookup = np.array([0.0 if c is None else float(c) for c in choices])
+        else:
+            vocab[field] = [c for c in choices if c is not None]
+            lookup = np.array([-1 if c is None else vocab[field].index(c) for c in choices], dtype=np.int32)
+        values[field] = lookup[picks]
+        null[field] = is_null[picks]
+    return ModelBatch(n, values, null, vocab)
+
+
+def verify_against_notebook(n=20_000, seed=0):
+    """Number of random models on which check_batch differs from consistency_check.
+
+    CatalyticRate is never None here because the scalar version cannot
+    compare None with 1e9.
+    """
+    from kmm_notebook import load_definitions
+
+    ns = load_definitions()
+    columns = random_columns(n, seed)
+    models = []
+    for i in range(n):
+        m = ns["Model"]()
+        for field, (section, _) in FIELDS.items():
+            getattr(m, section)[field] = columns[field][i]
+        models.append(m)
+
+    result = check_batch(ModelBatch.from_columns(columns))
+    expected = [ns["consistency_check"](m) for m in models]
+    return int(sum(
+        (int(f), result.check_cnt) != e for f, e in zip(result.failures, expected)
+    ))
+
+
+def main(argv=None):
+    import time
+
+    parser = argparse.ArgumentParser(description="Vectorized consistency_check over a batch of models")
+    parser.add_argument("--models", type=int, default=1_000_000)
+    parser.add_argument("--verify", type=int, metavar="N", help="compare with the notebook on N random models")
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        mismatches = verify_against_notebook(args.verify)
+        print(f"{mismatches} mismatches out of {args.verify} random models")
+        return
+
+    batch = random_batch(args.models)
+    start = time.perf_counter()
+    result = check_batch(batch)
+    elapsed = time.perf_counter() - start
+    print(f"Checked {args.models} models in {elapsed:.3f}s")
+    print(f"Failure count distribution: {np.bincount(result.failures, minlength=result.check_cnt + 1).tolist()}")
+    for name, count in result.rule_failures.items():
+        print(f"  {name:28s} {count}")
+
+
+if __name__ == "__main__":
+    main()
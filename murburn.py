@@ -0,0 +1,435 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import sys
+import tempfile
+import traceback
+
+# ------------------------------
+# Unified command line
+# ------------------------------
+# One entry point for the common jobs. Only argparse and the standard library
+# are imported up front; numpy, pandas, scikit-learn and joblib are imported
+# by the subcommand that needs them, so `murburn.py predict` on one protein
+# does not pay for the rest:
+#
+#   train     fit the random forest (random_forest.py) and save it
+#   evaluate  repeated-split decision-tree metrics per feature category
+#   infogain  information gain of every feature (info_gain.py)
+#   predict   classify feature vectors given on the command line, or a file
+#             (rf_predict.py). Single vectors go through a compiled copy of
+#             the forest cached as .npz, which needs numpy only.
+#   codegen   C-style if/else code of the Ver4 category trees (trainedTree.py)
+#
+# Warm worker: `murburn.py serve` keeps a process with every library imported
+# and the loaded models in memory, listening on a local Unix socket. While it
+# runs, the other subcommands send their arguments to it and print its reply,
+# so repeated small invocations skip interpreter startup and imports. Commands
+# run one at a time in the caller's working directory. --local bypasses it;
+# restart it after changing the code.
+#
+#   python murburn.py predict 1,0,0,1,1,1,1,1,1,0,2,2,2,1,1,1,1,1,1,1
+#   python murburn.py evaluate Data_CM.xlsx --adaptive 0.01
+#   python murburn.py serve &  python murburn.py predict ...   # answered by the warm worker
+#   python murburn.py stop
+
+SOCKET_ENV_VAR = "MURBURN_SOCKET"
+COMPILED_FOREST_VERSION = 2  # part of the .npz name; 2 added missing-value routing
+GROUPING_NAMES = ("murzyme_classical_classification.py", "Ver4")
+
+
+def default_socket_path():
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.environ.get(SOCKET_ENV_VAR) or os.path.join(tempfile.gettempdir(), f"murburn-{uid}.sock")
+
+
+# ------------------------------
+# Warm state (kept across requests by the worker)
+# ------------------------------
+_warm = {}
+
+
+def warm(key, path, load):
+    """``load()``, reused while ``path`` keeps the same size and mtime."""
+    st = os.stat(path)
+    stamp = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    entry = _warm.get(key)
+    if entry is None or entry[0] != stamp:
+        entry = _warm[key] = (stamp, load())
+    return entry[1]
+
+
+def compiled_forest(model_path):
+    """tree_compiler.CompiledForest of a saved forest, cached as .npz next to it."""
+    import numpy as np
+
+    from dataset_cache import CACHE_DIR_NAME, cached_digest
+    from tree_compiler import CompiledForest
+
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(model_path)), CACHE_DIR_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"forest-{cached_digest(model_path, cache_dir)[:16]}-v{COMPILED_FOREST_VERSION}.npz")
+    if not os.path.exists(path):
+        import joblib
+
+        from tree_compiler import compile_forest
+
+        c = compile_forest(joblib.load(model_path))
+        tmp = f"{path}.{os.getpid()}.npz"
+        np.savez(tmp, feature=c.feature, threshold=c.threshold, left=c.left, right=c.right, value=c.value,
+                 roots=c.roots, classes=np.asarray(c.classes_).astype(str), missing_left=c.missing_left,
+                 meta=np.array([c.max_depth, c.n_features]))
+        os.replace(tmp, path)
+    with np.load(path) as z:
+        max_depth, n_features = z["meta"]
+        return CompiledForest(z["feature"], z["threshold"], z["left"], z["right"], z["value"], z["roots"],
+                              z["classes"], max_depth, n_features, z["missing_left"])
+
+
+# ------------------------------
+# Subcommands
+# ------------------------------
+def _write_lines(lines, output):
+    print("\n".join(lines))
+    if output:
+        with open(output, "w") as f:
+            f.write("\n".join(lines))
+
+
+def _categories(grouping, n_features):
+    from subset_search import GROUPINGS
+
+    return {name: cols for name, cols in GROUPINGS[grouping].items() if max(cols) < n_features}
+
+
+def cmd_train(args):
+    import joblib
+    import numpy as np
+
+    from random_forest import features, test_enzyme_names, train_forest, unknown_data
+
+    clf = train_forest(n_jobs=args.n_jobs)
+    joblib.dump(clf, args.model)
+    order = np.argsort(-clf.feature_importances_, kind="stable")[:10]
+    lines = ["Top features:"] + [f"  {features[j]:<22s} {clf.feature_importances_[j]:.6f}" for j in order]
+    lines += [f"{enzyme}: {label}" for enzyme, label in zip(test_enzyme_names, clf.predict(unknown_data))]
+    lines.append(f"forest saved to {args.model}")
+    print("\n".join(lines))
+    return 0
+
+
+def cmd_evaluate(args):
+    import numpy as np
+
+    from dataset_cache import load_dataset
+    from experiment_cache import ExperimentCache
+    from split_evaluation import ci_half_width, evaluate_adaptive, evaluate_categories
+
+    data = load_dataset(args.data, sheet_name=args.sheet)
+    categories = _categories(args.grouping, data.n_features)
+    cache = None if args.no_cache else ExperimentCache.default()
+    converged = {}
+    if args.adaptive is None:
+        evaluation = evaluate_categories(data.X, data.y, categories, n_splits=args.splits, test_size=args.test_size,
+                                         n_jobs=args.n_jobs, cache=cache)
+    else:
+        evaluation, converged = evaluate_adaptive(data.X, data.y, categories, tol=args.adaptive,
+                                                  max_splits=args.max_splits, test_size=args.test_size,
+                                                  n_jobs=args.n_jobs, cache=cache)
+
+    lines = []
+    for name, res in evaluation.items():
+        n = len(res.accuracy)
+        note = "" if name not in converged else (" (converged)" if converged[name] else " (split budget reached)")
+        half = ci_half_width(res.accuracy[:, None])[0]
+        lines.append(f"{name}: accuracy {np.mean(res.accuracy):.4f} ± {half:.4f} over {n} splits{note}")
+        f1 = ", ".join(f"{data.label_classes[c]} = {v:.4f}" for c, v in enumerate(res.f1.mean(axis=0)))
+        lines.append(f"  F1: {f1}")
+    _write_lines(lines, args.output)
+    return 0
+
+
+def cmd_infogain(args):
+    from dataset_cache import load_dataset
+    from info_gain_engine import information_gain_all
+
+    data = load_dataset(args.data, sheet_name=args.sheet)
+    scores = information_gain_all(data.X, data.y)
+    lines = [f"Information Gain before split\t-\t{scores.entropy:.6f}", "Feature\tCategory\tInformation Gain"]
+    for category, indices in _categories(args.grouping, data.n_features).items():
+        for idx in indices:
+            lines.append(f"{data.feature_names[idx]}\t{category}\t{scores.information_gain[idx]:.6f}")
+    _write_lines(lines, args.output)
+    return 0
+
+
+def cmd_predict(args):
+    if not os.path.exists(args.model):
+        print(f"{args.model} not found; run `murburn.py train` first", file=sys.stderr)
+        return 1
+    if args.input:
+        import rf_predict
+
+        argv = [args.input, "-m", args.model, "-o", args.output or "-"]
+        if args.id_column:
+            argv += ["--id-column", args.id_column]
+        return rf_predict.main(argv) or 0
+    if not args.vectors:
+        print("give feature vectors or --input", file=sys.stderr)
+        return 2
+
+    import numpy as np
+
+    forest = warm(("forest", args.model), args.model, lambda: compiled_forest(args.model))
+    try:
+        X = np.array([[float(v) for v in vector.split(",")] for vector in args.vectors], dtype=np.float32)
+    except ValueError as e:
+        print(f"bad feature vector: {e}", file=sys.stderr)
+        return 2
+    if X.shape[1] != forest.n_features:
+        print(f"expected {forest.n_features} comma-separated values per vector, got {X.shape[1]}", file=sys.stderr)
+        return 2
+    proba = forest.predict_proba(X)
+    lines = []
+    for p in proba:
+        probs = " ".join(f"p_{c}={v:.4f}" for c, v in zip(forest.classes_, p))
+        lines.append(f"{forest.classes_[np.argmax(p)]}\t{probs}")
+    _write_lines(lines, args.output)
+    return 0
+
+
+def cmd_codegen(args):
+    import pandas as pd
+    from sklearn.preprocessing import LabelEncoder
+    from sklearn.tree import DecisionTreeClassifier
+
+    from dataset_cache import load_dataset
+    from experiment_cache import ExperimentCache, array_digest, experiment_key
+    from tree_compiler import generate_if_else_code
+    from tree_store import write_store
+
+    data = load_dataset(args.data, sheet_name=args.sheet)
+    le_label = LabelEncoder().fit(data.label_classes)
+    cache = ExperimentCache.default()
+    params = {"random_state": 42}
+    output_lines, trained = [], {}
+    for category, indices in _categories("Ver4", data.n_features).items():
+        columns = [data.feature_names[j] for j in indices]
+        X = pd.DataFrame(data.X[:, indices], columns=columns)
+        reverse_maps = {col: data.reverse_maps[col] for col in columns if col in data.reverse_maps}
+
+        # Same cache key as Ver4/trainedTree.py, so either one reuses the other's fits
+        if cache is None:
+            clf = DecisionTreeClassifier(**params).fit(X, data.y)
+        else:
+            key = experiment_key(kind="fit", data=array_digest(X.to_numpy(), data.y),
+                                 feature_names=columns, params=params)
+            clf = cache.memoize(key, lambda: DecisionTreeClassifier(**params).fit(X, data.y))
+        trained[category] = {"model": clf, "columns": indices, "feature_names": columns,
+                             "reverse_maps": reverse_maps}
+
+        output_lines.append(f"// Category: {category}")
+        output_lines.append("const char* predict(...) {")
+        output_lines.append(generate_if_else_code(clf, columns, le_label, reverse_maps))
+        output_lines.append("}")
+        output_lines.append("=" * 60)
+
+    with open(args.output, "w") as f:
+        f.write("\n".join(output_lines))
+    message = f"C-style code written to {args.output}"
+    if args.store:
+        write_store(args.store, trained, le_label.classes_)
+        message += f", models to {args.store}"
+    print(message)
+    return 0
+
+
+# ------------------------------
+# Warm worker
+# ------------------------------
+def run_captured(argv, cwd):
+    """(exit code, stdout, stderr) of running ``argv`` in this process from ``cwd``."""
+    out, err = io.StringIO(), io.StringIO()
+    previous = os.getcwd()
+    try:
+        os.chdir(cwd)
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                args = build_parser().parse_args(argv)
+                code = args.handler(args)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                if isinstance(e.code, str):
+                    print(e.code, file=sys.stderr)
+            except Exception:
+                traceback.print_exc()
+                code = 1
+    except OSError as e:
+        err.write(f"{e}\n")
+        code = 1
+    finally:
+        os.chdir(previous)
+    return code, out.getvalue(), err.getvalue()
+
+
+def serve(socket_path):
+    import socketserver
+
+    # Pay for the heavy imports once, before the first request
+    import joblib  # noqa: F401
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+    import sklearn.ensemble  # noqa: F401
+    import sklearn.preprocessing  # noqa: F401
+    import split_evaluation  # noqa: F401
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            request = json.loads(self.rfile.readline() or b"{}")
+            if request.get("op") == "stop":
+                reply = {"code": 0, "stdout": "", "stderr": "warm worker stopped\n"}
+                self.server.stopping = True
+            else:
+                code, out, err = run_captured(request.get("argv", []), request.get("cwd", os.getcwd()))
+                reply = {"code": code, "stdout": out, "stderr": err}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+    if os.path.exists(socket_path):
+        if _connect(socket_path) is not None:
+            print(f"a warm worker is already listening on {socket_path}", file=sys.stderr)
+            return 1
+        os.remove(socket_path)  # left behind by a worker that died
+
+    old_umask = os.umask(0o077)
+    try:
+        server = socketserver.UnixStreamServer(socket_path, Handler)
+    finally:
+        os.umask(old_umask)
+    server.stopping = False
+    print(f"warm worker listening on {socket_path}", file=sys.stderr, flush=True)
+    try:
+        with server:
+            while not server.stopping:
+                server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        with contextlib.suppress(OSError):
+            os.remove(socket_path)
+    return 0
+
+
+def _connect(socket_path):
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def request(socket_path, payload):
+    """Reply of the warm worker to ``payload``, or None when none is listening."""
+    sock = _connect(socket_path)
+    if sock is None:
+        return None
+    with sock, sock.makefile("rwb") as f:
+        f.write(json.dumps(payload).encode() + b"\n")
+        f.flush()
+        line = f.readline()
+    return json.loads(line) if line else None
+
+
+def _print_reply(reply):
+    sys.stdout.write(reply["stdout"])
+    sys.stderr.write(reply["stderr"])
+    return reply["code"]
+
+
+# ------------------------------
+# Entry point
+# ------------------------------
+def build_parser():
+    from random_forest import MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Murburn enzyme classification tools")
+    parser.add_argument("--local", action="store_true", help="run in this process even if a warm worker is up")
+    parser.add_argument("--socket", default=None, help=f"warm worker socket (default ${SOCKET_ENV_VAR} or a temp path)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def data_args(p, output=None):
+        p.add_argument("data", nargs="?", default="Data_CM.xlsx", help="workbook laid out like Data_CM.xlsx")
+        p.add_argument("--sheet", default="Sheet1")
+        p.add_argument("-o", "--output", default=output, help="also write the result to this file")
+
+    p = sub.add_parser("train", help="train and save the random forest")
+    p.add_argument("-m", "--model", default=MODEL_PATH)
+    p.add_argument("--n-jobs", type=int, default=-1)
+    p.set_defaults(handler=cmd_train)
+
+    p = sub.add_parser("evaluate", help="repeated-split decision-tree metrics per feature category")
+    data_args(p)
+    p.add_argument("--grouping", choices=GROUPING_NAMES, default=GROUPING_NAMES[0])
+    p.add_argument("--splits", type=int, default=20)
+    p.add_argument("--test-size", type=float, default=0.4)
+    p.add_argument("--adaptive", type=float, metavar="TOL", help="add splits until the 95%% intervals are within +-TOL")
+    p.add_argument("--max-splits", type=int, default=200)
+    p.add_argument("--n-jobs", type=int, default=None)
+    p.add_argument("--no-cache", action="store_true", help="do not use the experiment cache")
+    p.set_defaults(handler=cmd_evaluate)
+
+    p = sub.add_parser("infogain", help="information gain of every feature")
+    data_args(p)
+    p.add_argument("--grouping", choices=GROUPING_NAMES, default=GROUPING_NAMES[0])
+    p.set_defaults(handler=cmd_infogain)
+
+    p = sub.add_parser("predict", help="classify feature vectors with the saved forest")
+    p.add_argument("vectors", nargs="*", help="comma-separated feature values, one argument per protein")
+    p.add_argument("-i", "--input", help="feature table (.npy, .csv or - for stdin), scored by rf_predict.py")
+    p.add_argument("-m", "--model", default=MODEL_PATH)
+    p.add_argument("-o", "--output", default=None)
+    p.add_argument("--id-column", help="with --input: CSV column copied to the output")
+    p.set_defaults(handler=cmd_predict)
+
+    p = sub.add_parser("codegen", help="C-style code of the Ver4 category trees")
+    data_args(p, output="result_C_code.txt")
+    p.add_argument("--store", help="also write the trees as a tree_store file (e.g. models.trees)")
+    p.set_defaults(handler=cmd_codegen)
+
+    p = sub.add_parser("serve", help="run the warm worker")
+    p.set_defaults(handler=None)
+    p = sub.add_parser("stop", help="stop the warm worker")
+    p.set_defaults(handler=None)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = build_parser().parse_args(argv)
+    socket_path = args.socket or default_socket_path()
+
+    if args.command == "serve":
+        return serve(socket_path)
+    if args.command == "stop":
+        reply = request(socket_path, {"op": "stop"})
+        if reply is None:
+            print("no warm worker is running", file=sys.stderr)
+            return 1
+        return _print_reply(reply)
+
+    # stdin belongs to this process, so piped input is always scored locally
+    if not args.local and getattr(args, "input", None) != "-":
+        reply = request(socket_path, {"argv": argv, "cwd": os.getcwd()})
+        if reply is not None:
+            return _print_reply(reply)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,25 @@
-import pandas as pd
+import argparse
+
 import numpy as np
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-from sklearn.preprocessing import LabelEncoder
+
+from dataset_cache import load_dataset
+from experiment_cache import ExperimentCache
+from profiling import stage
+from split_evaluation import evaluate_adaptive, evaluate_categories
 
 # ------------------------------
-# 1. Load the Data
+# 1. Load the Data (cached, already label-encoded)
 # ------------------------------
 file_path = "Data_CM.xlsx"
 sheet_name = "Sheet1"
 
-df = pd.read_excel(file_path, sheet_name=sheet_name)
+with stage("load_dataset"):
+    data = load_dataset(file_path, sheet_name=sheet_name)
 
 # Extract enzyme names, features, and label
-enzyme_names = df.iloc[:, 0]       # Column A
-label = df.iloc[:, -1]             # Column V
-features = df.iloc[:, 1:-1]        # Columns B to U (indices 1 to 20)
+enzyme_names = data.enzyme_names   # Column A
+feature_names = data.feature_names # Columns B to U (indices 1 to 20)
+features = data.X                  # Encoded feature matrix
 
 # ------------------------------
 # 2. Define Feature Categories (relative to features DataFrame)
@@ -32,99 +35,91 @@ categories = {
 }
 
 # ------------------------------
-# 3. Encode Labels
+# 3. Encoded Labels (Column V)
 # ------------------------------
-le_label = LabelEncoder()
-y_encoded = le_label.fit_transform(label)
+y_encoded = data.y
 
 # ------------------------------
 # 4. Train and Evaluate Decision Trees
 # ------------------------------
-results = []
-
-for category, indices in categories.items():
-    acc_list = []
-    prec_list = []   # store [prec0, prec1]
-    rec_list = []    # store [rec0, rec1]
-    f1_list = []     # store [f1_0, f1_1]
-    split_details = []
-    feature_importance_sum = np.zeros(len(indices))
-
-    for i in range(20):  # 20 train-test splits
-        X = features.iloc[:, indices].copy()
-        y = y_encoded.copy()
-
-        # Encode categorical features if any
-        for col in X.columns:
-            if X[col].dtype == 'object':
-                le = LabelEncoder()
-                X[col] = le.fit_transform(X[col])
-
-        # Train-test split (60:40)
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.4, random_state=i
-        )
-
-        # Train Decision Tree
-        clf = DecisionTreeClassifier(random_state=42)
-        clf.fit(X_train, y_train)
-        y_pred = clf.predict(X_test)
-
-        # Metrics
-        acc = accuracy_score(y_test, y_pred)
-        prec = precision_score(y_test, y_pred, average=None, zero_division=0)
-        rec = recall_score(y_test, y_pred, average=None, zero_division=0)
-        f1 = f1_score(y_test, y_pred, average=None, zero_division=0)
-
-        acc_list.append(acc)
-        prec_list.append(prec)
-        rec_list.append(rec)
-        f1_list.append(f1)
-
-        split_details.append(
-            f"  Split {i+1}: Accuracy = {acc:.4f}, "
-            f"Precision: C0 = {prec[0]:.4f}, C1 = {prec[1]:.4f}, "
-            f"Recall: C0 = {rec[0]:.4f}, C1 = {rec[1]:.4f}, "
-            f"F1: C0 = {f1[0]:.4f}, C1 = {f1[1]:.4f}"
-        )
-
-        # Feature importances
-        feature_importance_sum += clf.feature_importances_
-
-    # Average metrics
-    avg_acc = np.mean(acc_list)
-    avg_prec_class0 = np.mean([p[0] for p in prec_list])
-    avg_prec_class1 = np.mean([p[1] for p in prec_list])
-    avg_rec_class0 = np.mean([r[0] for r in rec_list])
-    avg_rec_class1 = np.mean([r[1] for r in rec_list])
-    avg_f1_class0 = np.mean([f[0] for f in f1_list])
-    avg_f1_class1 = np.mean([f[1] for f in f1_list])
-
-    avg_importances = feature_importance_sum / 20
-    feature_names = features.columns[indices]
-
-    # Store results in output list
-    results.append(f"Category: {category}")
-    results.append(f"Average Accuracy over 20 splits: {avg_acc:.4f}")
-    results.append(f"Average Precision - Class 0: {avg_prec_class0:.4f}")
-    results.append(f"Average Precision - Class 1: {avg_prec_class1:.4f}")
-    results.append(f"Average Recall - Class 0: {avg_rec_class0:.4f}")
-    results.append(f"Average Recall - Class 1: {avg_rec_class1:.4f}")
-    results.append(f"Average F1-Score - Class 0: {avg_f1_class0:.4f}")
-    results.append(f"Average F1-Score - Class 1: {avg_f1_class1:.4f}")
-    results.append("Per Split Metrics (Accuracy, Precision, Recall, F1):")
-    results.extend(split_details)
-
-    results.append("Average Feature Importances:")
-    for fname, imp in zip(feature_names, avg_importances):
-        results.append(f"  {fname}: {imp:.6f}")
-    results.append("=" * 60)
-
-# ------------------------------
-# 5. Save Results to File
-# ------------------------------
-with open("results.txt", "w") as f:
-    f.write("\n".join(results))
-
-print("All results (Accuracy, Precision, Recall, F1 for each class) saved to 'results.txt'")
-
+def build_report(evaluation):
+    results = []
+
+    for category, indices in categories.items():
+        res = evaluation[category]
+        n_splits = len(res.accuracy)
+        split_details = []
+
+        for i in range(n_splits):
+            acc, prec, rec, f1 = res.accuracy[i], res.precision[i], res.recall[i], res.f1[i]
+            split_details.append(
+                f"  Split {i+1}: Accuracy = {acc:.4f}, "
+                f"Precision: C0 = {prec[0]:.4f}, C1 = {prec[1]:.4f}, "
+                f"Recall: C0 = {rec[0]:.4f}, C1 = {rec[1]:.4f}, "
+                f"F1: C0 = {f1[0]:.4f}, C1 = {f1[1]:.4f}"
+            )
+
+        # Average metrics
+        avg_acc = np.mean(res.accuracy)
+        avg_prec_class0 = np.mean(res.precision[:, 0])
+        avg_prec_class1 = np.mean(res.precision[:, 1])
+        avg_rec_class0 = np.mean(res.recall[:, 0])
+        avg_rec_class1 = np.mean(res.recall[:, 1])
+        avg_f1_class0 = np.mean(res.f1[:, 0])
+        avg_f1_class1 = np.mean(res.f1[:, 1])
+
+        avg_importances = res.importances.sum(axis=0) / n_splits
+        category_features = [feature_names[j] for j in indices]
+
+        # Store results in output list
+        results.append(f"Category: {category}")
+        results.append(f"Average Accuracy over {n_splits} splits: {avg_acc:.4f}")
+        results.append(f"Average Precision - Class 0: {avg_prec_class0:.4f}")
+        results.append(f"Average Precision - Class 1: {avg_prec_class1:.4f}")
+        results.append(f"Average Recall - Class 0: {avg_rec_class0:.4f}")
+        results.append(f"Average Recall - Class 1: {avg_rec_class1:.4f}")
+        results.append(f"Average F1-Score - Class 0: {avg_f1_class0:.4f}")
+        results.append(f"Average F1-Score - Class 1: {avg_f1_class1:.4f}")
+        results.append("Per Split Metrics (Accuracy, Precision, Recall, F1):")
+        results.extend(split_details)
+
+        results.append("Average Feature Importances:")
+        for fname, imp in zip(category_features, avg_importances):
+            results.append(f"  {fname}: {imp:.6f}")
+        results.append("=" * 60)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decision-tree metrics per feature category over repeated splits")
+    parser.add_argument("--adaptive", type=float, metavar="TOL",
+                        help="keep adding splits until the 95%% interval of the mean accuracy and F1 is within +-TOL")
+    parser.add_argument("--max-splits", type=int, default=200, help="split budget per category with --adaptive")
+    parser.add_argument("--batch", type=int, default=None, help="splits fitted per parallel batch with --adaptive")
+    args = parser.parse_args()
+
+    with stage("evaluate"):
+        if args.adaptive is None:
+            # 20 train-test splits (60:40, random_state = 0..19) per category,
+            # fitted in parallel on the shared encoded matrix
+            evaluation = evaluate_categories(features, y_encoded, categories, n_splits=20, test_size=0.4,
+                                             cache=ExperimentCache.default())
+        else:
+            # random_state = 0, 1, 2, ... until the intervals are narrow enough
+            evaluation, converged = evaluate_adaptive(features, y_encoded, categories, tol=args.adaptive,
+                                                      max_splits=args.max_splits, batch=args.batch,
+                                                      test_size=0.4, cache=ExperimentCache.default())
+            for category, res in evaluation.items():
+                reason = "converged" if converged[category] else "split budget reached"
+                print(f"{category}: {len(res.accuracy)} splits ({reason})")
+    with stage("report"):
+        results = build_report(evaluation)
+
+    # ------------------------------
+    # 5. Save Results to File
+    # ------------------------------
+    with stage("write_results"), open("results.txt", "w") as f:
+        f.write("\n".join(results))
+
+    print("All results (Accuracy, Precision, Recall, F1 for each class) saved to 'results.txt'")
@@ -0,0 +1,210 @@
+import argparse
+from collections import namedtuple
+
+import numpy as np
+
+# ------------------------------
+# OccamsRazor tournament over many candidate models
+# ------------------------------
+# OccamsRazor(model1, model2) in kmm_paper_reprised.ipynb counts simplicity
+# points for both proposals and returns 1 (model1 simpler), 2 (model2
+# simpler) or 0 (tie). Each model's proposal fields are turned into a
+# simplicity vector once; the N x N result matrix is then evaluated in row
+# blocks of broadcast comparisons, never with N^2 Python calls.
+#
+# The reference function is not symmetric: model1 scores a point for
+# Intermediates == 0 but model2 for Intermediates == 1. The tournament
+# reproduces that exactly, which is why every model gets two base scores
+# (as first and as second argument) and every pair is played in both seats.
+
+# Fields worth one point when they equal the given value, for either seat
+COMMON_RULES = (
+    ("ShapeChange", 0),
+    ("Serial", 0),
+    ("Complexity", 0),
+    ("Probability", 1),
+    ("LongDistanceOSET", 0),
+    ("HighAffinityESComplex", 0),
+)
+FIRST_SEAT_RULES = (("Intermediates", 0),)
+SECOND_SEAT_RULES = (("Intermediates", 1),)
+STEPS_FIELD = "MechanisticSteps"
+
+DEFAULT_BLOCK_CELLS = 1 << 24  # int8 cells per block, ~16 MB
+
+SimplicityVectors = namedtuple("SimplicityVectors", ["first", "second", "steps"])
+SimplicityVectors.__doc__ = """Per-model inputs of OccamsRazor.
+
+first   (n,) int8 points earned as model1 (before the MechanisticSteps point)
+second  (n,) int8 points earned as model2 (before the MechanisticSteps point)
+steps   (n,) float64 MechanisticSteps; NaN when missing
+"""
+
+Ranking = namedtuple("Ranking", ["order", "score", "wins", "losses", "ties"])
+Ranking.__doc__ = """Tournament result; order lists model indices, simplest first.
+
+Each unordered pair is played twice (once per seat). score = wins - losses;
+ties are broken by more wins, then by input order.
+"""
+
+
+# ------------------------------
+# Simplicity vectors
+# ------------------------------
+def _proposal(model):
+    return model.proposal if hasattr(model, "proposal") else model
+
+
+def _value(proposal, field):
+    v = proposal.get(field)
+    return np.nan if v is None else float(v)
+
+
+def simplicity_vectors(models):
+    """Encode Model objects (or plain proposal dicts) once."""
+    proposals = [_proposal(m) for m in models]
+    n = len(proposals)
+
+    def points(rules):
+        total = np.zeros(n, dtype=np.int8)
+        for field, wanted in rules:
+            total += np.array([_value(p, field) == wanted for p in proposals], dtype=np.int8)
+        return total
+
+    common = points(COMMON_RULES)
+    return SimplicityVectors(
+        first=common + points(FIRST_SEAT_RULES),
+        second=common + points(SECOND_SEAT_RULES),
+        steps=np.array([_value(p, STEPS_FIELD) for p in proposals], dtype=np.float64),
+    )
+
+
+# ------------------------------
+# Blocked N x N evaluation
+# ------------------------------
+def _margin_block(vectors, rows, cols):
+    """cnt1 - cnt2 for model1 in ``rows`` against model2 in ``cols``."""
+    s1 = vectors.steps[rows, None]
+    s2 = vectors.steps[None, cols]
+    # A missing step count (NaN) gives neither side the point; the notebook
+    # raises TypeError on None there instead.
+    return (vectors.first[rows, None] - vectors.second[None, cols]
+            + (s1 < s2).astype(np.int8) - (s1 > s2).astype(np.int8))
+
+
+def _block_rows(n, block_cells):
+    return max(1, min(n, block_cells // max(n, 1)))
+
+
+def iter_result_blocks(vectors, block_cells=DEFAULT_BLOCK_CELLS):
+    """Yield (row_start, block) with block[i, j] = OccamsRazor(model_{row_start+i}, model_j)."""
+    n = len(vectors.steps)
+    cols = np.arange(n)
+    step = _block_rows(n, block_cells)
+    for start in range(0, n, step):
+        margin = _margin_block(vectors, np.arange(start, min(start + step, n)), cols)
+        block = np.zeros(margin.shape, dtype=np.int8)
+        block[margin > 0] = 1
+        block[margin < 0] = 2
+        yield start, block
+
+
+def win_matrix(vectors, block_cells=DEFAULT_BLOCK_CELLS):
+    """Full N x N matrix of OccamsRazor results (1, 2 or 0); diagonal included."""
+    n = len(vectors.steps)
+    out = np.empty((n, n), dtype=np.int8)
+    for start, block in iter_result_blocks(vectors, block_cells):
+        out[start:start + len(block)] = block
+    return out
+
+
+def rank_models(vectors, block_cells=DEFAULT_BLOCK_CELLS):
+    """Global ranking with memory bounded by ``block_cells``."""
+    n = len(vectors.steps)
+    wins = np.zeros(n, dtype=np.int64)
+    losses = np.zeros(n, dtype=np.int64)
+    cols = np.arange(n)
+    step = _block_rows(n, block_cells)
+
+    for start in range(0, n, step):
+        rows = np.arange(start, min(start + step, n))
+        margin = _margin_block(vectors, rows, cols)
+        margin[np.arange(len(rows)), rows] = 0    # a model never plays itself
+        first_wins = margin > 0
+        second_wins = margin < 0
+        # Row models sat in seat 1, column models in seat 2
+        wins[rows] += first_wins.sum(axis=1)
+        losses[rows] += second_wins.sum(axis=1)
+        wins += second_wins.sum(axis=0)
+        losses += first_wins.sum(axis=0)
+
+    games = 2 * (n - 1)
+    ties = games - wins - losses
+    score = wins - losses
+    order = np.lexsort((np.arange(n), -wins, -score))
+    return Ranking(order, score, wins, losses, ties)
+
+
+def top_k(ranking, k):
+    return ranking.order[:k]
+
+
+# ------------------------------
+# Agreement with the notebook's OccamsRazor
+# ------------------------------
+def random_proposals(n, seed=0, p_missing=0.1):
+    rng = np.random.default_rng(seed)
+    fields = [f for f, _ in COMMON_RULES] + ["Intermediates"]
+    proposals = []
+    for _ in range(n):
+        p = {f: (None if rng.random() < p_missing else int(rng.integers(0, 2))) for f in fields}
+        p[STEPS_FIELD] = int(rng.integers(1, 6))
+        proposals.append(p)
+    return proposals
+
+
+def verify_against_notebook(n=200, seed=0):
+    """Number of ordered pairs where win_matrix disagrees with OccamsRazor."""
+    from kmm_notebook import load_definitions
+
+    ns = load_definitions()
+    models = []
+    for p in random_proposals(n, seed):
+        m = ns["Model"]()
+        m.proposal.update(p)
+        models.append(m)
+
+    matrix = win_matrix(simplicity_vectors(models))
+    razor = ns["OccamsRazor"]
+    return int(sum(
+        matrix[i, j] != razor(models[i], models[j]) for i in range(n) for j in range(n)
+    ))
+
+
+def main(argv=None):
+    import time
+
+    parser = argparse.ArgumentParser(description="Rank random candidate proposals with the OccamsRazor tournament")
+    parser.add_argument("--models", type=int, default=10_000)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--block-cells", type=int, default=DEFAULT_BLOCK_CELLS)
+    parser.add_argument("--verify", type=int, metavar="N", help="compare with the notebook on N random models")
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        mismatches = verify_against_notebook(args.verify)
+        print(f"{mismatches} mismatches out of {args.verify ** 2} ordered pairs")
+        return
+
+    vectors = simplicity_vectors(random_proposals(args.models))
+    start = time.perf_counter()
+    ranking = rank_models(vectors, args.block_cells)
+    elapsed = time.perf_counter() - start
+    print(f"Ranked {args.models} models ({args.models * (args.models - 1)} games) in {elapsed:.2f}s")
+    for place, i in enumerate(top_k(ranking, args.top), 1):
+        print(f"{place:3d}. model {i}: score {ranking.score[i]}, wins {ranking.wins[i]}, "
+              f"losses {ranking.losses[i]}, ties {ranking.ties[i]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+import argparse
+import csv
+import gzip
+import mmap
+import multiprocessing
+import os
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from random_forest import features
+
+# ------------------------------
+# Structural features from PDB files
+# ------------------------------
+# Derives the structural columns that are filled in by hand in Data_CM.xlsx
+# (the notebook's Model.structural) from coordinate files. This is a partial
+# feature set: the rows hold these 5 columns only, not all 20 features.
+#
+#   Heme          a heme HETATM group (HEM, HEC, HEA, HEB)
+#   Flavin        FAD or FMN
+#   FeS           an iron-sulfur cluster (SF4, FES, F3S)
+#   ConstrAccess  the active site is buried: a solvent-access proxy, below
+#   Subst>Site    not derivable from the structure alone; left empty
+#
+# Files are memory-mapped and parsed as one byte array: line starts come from
+# a single newline scan and each fixed-width ATOM/HETATM field (first MODEL
+# only) is gathered for all records at once, so no per-line Python work
+# happens; gzipped files are decompressed into memory instead. Files are
+# fanned out over a process pool and rows are written in input order as they
+# come back, so memory stays flat however many structures are listed.
+#
+# Access proxy: the "site" is the cofactor atoms, or, without a cofactor, the
+# bound non-water ligands. A site atom counts as exposed when fewer than
+# --exposed-below protein heavy atoms lie within --radius angstroms (a
+# fully buried atom has about 350 within 10 A). The site is constrained
+# (ConstrAccess = 1) when less than --open-fraction of its atoms are exposed.
+# Structures without cofactor or ligand get an empty ConstrAccess.
+#
+#   python pdb_features.py structures/ -o structural.csv
+#   python pdb_features.py 1abc.pdb 2xyz.ent.gz --proxies
+#   python pdb_features.py @file_list.txt --schema ver4 --n-jobs 8
+
+HEME = frozenset({"HEM", "HEC", "HEA", "HEB"})
+FLAVIN = frozenset({"FAD", "FMN"})
+FES = frozenset({"SF4", "FES", "F3S"})
+COFACTORS = HEME | FLAVIN | FES
+
+# HETATM groups that are solvent, ions or crystallization additives, not ligands
+NOT_LIGANDS = frozenset({
+    "HOH", "WAT", "DOD", "H2O", "SO4", "PO4", "GOL", "EDO", "PEG", "ACT", "FMT", "DMS", "MPD", "TRS",
+    "EPE", "MES", "CL", "NA", "K", "MG", "CA", "ZN", "MN", "FE", "FE2", "CU", "NI", "CO", "CD", "IOD", "BR",
+})
+
+# Structural columns in classifier order (random_forest.py), and the Ver4 equivalents
+STRUCTURAL = features[:5]
+VER4_COLUMNS = ["Heme?", "Flavin?", "FeS?", "Constr. Access?", "Subst > Site?"]
+PROXY_COLUMNS = ["site", "site_atoms", "site_neighbors", "exposed_fraction", "protein_atoms", "residues", "error"]
+
+EXTENSIONS = (".pdb", ".ent", ".pdb.gz", ".ent.gz")
+
+# Fixed-width ATOM/HETATM fields (0-based [start, stop) byte columns)
+ATOM_NAME = (12, 16)
+ALTLOC = (16, 17)
+RESNAME = (17, 20)
+COORDS = (30, 54)
+ELEMENT = (76, 78)
+
+Structure = namedtuple("Structure", ["protein_xyz", "hetero", "residues"])
+Structure.__doc__ = """Parsed coordinates of the first model.
+
+protein_xyz  (n, 3) float32 heavy-atom coordinates of ATOM records
+hetero       {residue name: (m, 3) float32 heavy-atom coordinates} of HETATM groups
+residues     number of protein residues (CA atoms)
+"""
+
+AccessParams = namedtuple("AccessParams", ["radius", "exposed_below", "open_fraction"])
+DEFAULT_ACCESS = AccessParams(radius=10.0, exposed_below=150, open_fraction=0.25)
+
+
+# ------------------------------
+# Parsing
+# ------------------------------
+def _read(path):
+    """Bytes-like view of a PDB file: an mmap, or decompressed bytes for .gz."""
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            return f.read()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _hydrogen_mask(atom_names, elements):
+    elements = np.char.strip(elements)
+    names = np.char.strip(atom_names)
+    # Without an element column, hydrogens have an H (or D) as first letter of
+    # the name, possibly after a digit ("1HB")
+    first = np.char.ljust(names, 2).view("S1").reshape(len(names), -1)
+    named_h = np.isin(first[:, 0], [b"H", b"D"]) | (
+        np.char.isdigit(first[:, 0]) & np.isin(first[:, 1], [b"H", b"D"]))
+    return np.where(elements != b"", np.isin(elements, [b"H", b"D"]), named_h)
+
+
+def _columns(buf, starts, span):
+    """(n_lines, width) byte-string column ``span`` of every line start."""
+    start, stop = span
+    return buf[starts[:, None] + np.arange(start, stop)].copy().view(f"S{stop - start}").ravel()
+
+
+def parse_structure(data):
+    """Structure of the first model in PDB-formatted bytes.
+
+    Works on the raw buffer: line starts are found with one scan for
+    newlines and every field is gathered for all records at once.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8) if len(data) else np.zeros(0, dtype=np.uint8)
+    starts = np.r_[0, np.flatnonzero(buf == ord("\n")) + 1]
+    ends = np.r_[starts[1:] - 1, len(buf)]
+    padded = np.concatenate([buf, np.zeros(ELEMENT[1], dtype=np.uint8)])  # short last line
+
+    tag = _columns(padded, starts, (0, 6))
+    endmdl = np.flatnonzero(tag == b"ENDMDL")
+    if len(endmdl):
+        keep_lines = np.arange(len(starts)) < endmdl[0]
+    else:
+        keep_lines = np.ones(len(starts), dtype=bool)
+    is_record = keep_lines & ((tag == b"ATOM  ") | (tag == b"HETATM")) & (ends - starts >= COORDS[1])
+    starts, ends, tag = starts[is_record], ends[is_record], tag[is_record]
+    if not len(starts):
+        return Structure(np.empty((0, 3), dtype=np.float32), {}, 0)
+
+    atom = _columns(padded, starts, ATOM_NAME)
+    altloc = _columns(padded, starts, ALTLOC)
+    resname = np.char.strip(_columns(padded, starts, RESNAME))
+    element = _columns(padded, starts, ELEMENT)
+    # The element columns are optional: ignore them on lines too short to hold them
+    element[ends - starts < ELEMENT[1]] = b""
+    element[np.char.strip(element) == b""] = b""
+    xyz = _columns(padded, starts, COORDS).view("S8").reshape(-1, 3).astype(np.float32)
+
+    keep = ~_hydrogen_mask(atom, element) & np.isin(altloc, [b" ", b"A", b""])
+    is_protein = keep & (tag == b"ATOM  ")
+    is_hetero = keep & (tag == b"HETATM")
+    names = resname[is_hetero]
+    het_xyz = xyz[is_hetero]
+    hetero = {name.decode("ascii", "replace"): het_xyz[names == name] for name in np.unique(names)}
+    return Structure(xyz[is_protein], hetero, int(np.count_nonzero(is_protein & (atom == b" CA "))))
+
+
+# ------------------------------
+# Features
+# ------------------------------
+def neighbor_counts(site, protein, radius, chunk=256):
+    """Protein atoms within ``radius`` of every site atom."""
+    counts = np.empty(len(site), dtype=np.int64)
+    r2 = np.float32(radius * radius)
+    # Only protein atoms inside the site's bounding box (+radius) can count
+    lo, hi = site.min(axis=0) - radius, site.max(axis=0) + radius
+    protein = protein[np.all((protein >= lo) & (protein <= hi), axis=1)]
+    for start in range(0, len(site), chunk):
+        diff = site[start:start + chunk, None, :] - protein[None, :, :]
+        counts[start:start + chunk] = (np.einsum("ijk,ijk->ij", diff, diff) <= r2).sum(axis=1)
+    return counts
+
+
+def structure_features(structure, access=DEFAULT_ACCESS):
+    """{column: value} for the STRUCTURAL columns plus the PROXY_COLUMNS."""
+    groups = set(structure.hetero)
+    row = {
+        "Heme": int(bool(groups & HEME)),
+        "Flavin": int(bool(groups & FLAVIN)),
+        "FeS": int(bool(groups & FES)),
+        "ConstrAccess": None,
+        "Subst>Site": None,
+        "protein_atoms": len(structure.protein_xyz),
+        "residues": structure.residues,
+    }
+
+    cofactors = sorted(groups & COFACTORS)
+    ligands = sorted(g for g in groups - COFACTORS - NOT_LIGANDS if len(structure.hetero[g]) > 1)
+    site_groups = cofactors or ligands
+    row["site"] = "+".join(site_groups) if site_groups else "none"
+    if site_groups and len(structure.protein_xyz):
+        site = np.concatenate([structure.hetero[g] for g in site_groups])
+        counts = neighbor_counts(site, structure.protein_xyz, access.radius)
+        exposed = float(np.mean(counts < access.exposed_below))
+        row.update(
+            site_atoms=len(site),
+            site_neighbors=round(float(counts.mean()), 1),
+            exposed_fraction=round(exposed, 3),
+            ConstrAccess=int(exposed < access.open_fraction),
+        )
+    return row
+
+
+def extract(task):
+    """Worker: (path, access) -> (path, row); errors are reported in the row."""
+    path, access = task
+    try:
+        data = _read(path)
+    except (OSError, ValueError, EOFError) as exc:
+        return path, {"error": f"{type(exc).__name__}: {exc}"}
+
+    # Only the message outlives the except block: the traceback would keep
+    # the parser's numpy views into the mmap alive and make close() fail
+    error = None
+    try:
+        row = structure_features(parse_structure(data), access)
+    except ValueError as exc:
+        error = f"{type(exc).__name__}: {exc}"
+    if isinstance(data, mmap.mmap):
+        data.close()
+    return path, ({"error": error} if error is not None else row)
+
+
+# ------------------------------
+# Input discovery and output
+# ------------------------------
+def iter_paths(sources):
+    """PDB paths from files, directories (recursive) and @list files, lazily."""
+    for source in sources:
+        if source.startswith("@"):
+            with open(source[1:]) as f:
+                yield from iter_paths(line.strip() for line in f if line.strip())
+        elif os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield source
+
+
+def structure_id(path):
+    name = os.path.basename(path)
+    for ext in EXTENSIONS:
+        if name.lower().endswith(ext):
+            return name[:-len(ext)]
+    return name
+
+
+def _format(value, schema):
+    if value is None:
+        return ""
+    if schema == "ver4":
+        return "Yes" if value else "No"
+    return value
+
+
+def extract_all(paths, access=DEFAULT_ACCESS, n_jobs=None, chunksize=8):
+    """Yield (path, row) in input order, fanning files out over processes."""
+    tasks = ((path, access) for path in paths)
+    if n_jobs == 1:
+        yield from map(extract, tasks)
+        return
+    with multiprocessing.Pool(n_jobs) as pool:
+        yield from pool.imap(extract, tasks, chunksize=chunksize)
+
+
+def write_rows(out, results, schema="forest", proxies=False, progress=False):
+    """Write CSV rows as results arrive; returns (structures, failures, seconds)."""
+    columns = VER4_COLUMNS if schema == "ver4" else STRUCTURAL
+    writer = csv.writer(out)
+    writer.writerow(["id", *columns, *(PROXY_COLUMNS if proxies else [])])
+
+    n, failed = 0, 0
+    start = time.perf_counter()
+    for path, row in results:
+        if "error" in row:
+            failed += 1
+            print(f"{path}: {row['error']}", file=sys.stderr)
+        values = [_format(row.get(name), schema) for name in STRUCTURAL]
+        extra = [_format(row.get(name), "forest") for name in PROXY_COLUMNS] if proxies else []
+        writer.writerow([structure_id(path), *values, *extra])
+        n += 1
+        if progress and n % 1000 == 0:
+            elapsed = time.perf_counter() - start
+            print(f"{n} structures, {60 * n / elapsed:,.0f}/min", file=sys.stderr)
+    return n, failed, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Derive structural classifier features from PDB files")
+    parser.add_argument("sources", nargs="+", help="PDB files, directories, or @file with one path per line")
+    parser.add_argument("-o", "--output", default="-", help="output CSV (default: stdout)")
+    parser.add_argument("--schema", choices=("forest", "ver4"), default="forest",
+                        help="random_forest.py column names and 0/1, or Data_CM.xlsx names and Yes/No")
+    parser.add_argument("--proxies", action="store_true", help="also write the access proxy columns")
+    parser.add_argument("--radius", type=float, default=DEFAULT_ACCESS.radius)
+    parser.add_argument("--exposed-below", type=int, default=DEFAULT_ACCESS.exposed_below)
+    parser.add_argument("--open-fraction", type=float, default=DEFAULT_ACCESS.open_fraction)
+    parser.add_argument("--n-jobs", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--progress", action="store_true")
+    args = parser.parse_args(argv)
+
+    access = AccessParams(args.radius, args.exposed_below, args.open_fraction)
+    results = extract_all(iter_paths(args.sources), access, args.n_jobs)
+    if args.output == "-":
+        n, failed, elapsed = write_rows(sys.stdout, results, args.schema, args.proxies, args.progress)
+    else:
+        with open(args.output, "w", newline="") as out:
+            n, failed, elapsed = write_rows(out, results, args.schema, args.proxies, args.progress)
+
+    rate = 60 * n / elapsed if elapsed > 0 else float("inf")
+    print(f"{n} structures in {elapsed:.1f}s ({rate:,.0f}/min), {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+import argparse
+import atexit
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ------------------------------
+# Stage-level profiling hooks
+# ------------------------------
+# Pipelines wrap their stages in ``with stage("name"):``. Profiling is off
+# unless MURBURN_PROFILE is set, in which case stage() costs one dict lookup
+# and returns a shared no-op context manager. When it is set, every stage
+# records wall time, CPU time of this process and the process's peak RSS, and
+# a Chrome trace (chrome://tracing, https://ui.perfetto.dev) is written when
+# the run exits:
+#
+#   MURBURN_PROFILE=1                 ./<script>-<pid>.trace.json
+#   MURBURN_PROFILE=traces/           traces/<script>-<pid>.trace.json
+#   MURBURN_PROFILE=run.json          run.json ({pid} and {script} are expanded)
+#   MURBURN_PROFILE_TRACEMALLOC=1     also record the peak of Python allocations
+#
+# Work done inside process-pool workers is covered by the parent's stage but
+# not broken down further; CPU time is that of the profiled process only.
+#
+#   python profiling.py run.trace.json              per-stage totals
+#   python profiling.py before.json after.json      side-by-side comparison
+
+ENV_VAR = "MURBURN_PROFILE"
+TRACEMALLOC_ENV_VAR = "MURBURN_PROFILE_TRACEMALLOC"
+
+_NULL_STAGE = contextlib.nullcontext()
+_state = {"recorder": None}
+
+
+def _peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _script_name():
+    main = sys.modules.get("__main__")
+    path = getattr(main, "__file__", None) or (sys.argv[0] if sys.argv and sys.argv[0] else "python")
+    return os.path.splitext(os.path.basename(path))[0] or "python"
+
+
+def trace_path(setting):
+    """Output file for a MURBURN_PROFILE value."""
+    script, pid = _script_name(), os.getpid()
+    if setting == "1":
+        return f"{script}-{pid}.trace.json"
+    if setting.endswith(os.sep) or os.path.isdir(setting):
+        return os.path.join(setting, f"{script}-{pid}.trace.json")
+    return setting.format(pid=pid, script=script)
+
+
+class Recorder:
+    """Collects completed stages as Chrome trace 'complete' (X) events."""
+
+    def __init__(self, path, use_tracemalloc=False):
+        self.path = path
+        self.events = []
+        self.origin = time.perf_counter()
+        self.started = time.time()
+        self.pid = os.getpid()
+        self.use_tracemalloc = use_tracemalloc
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        if use_tracemalloc:
+            import tracemalloc
+
+            tracemalloc.start()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextlib.contextmanager
+    def stage(self, name, args):
+        stack = self._stack()
+        if self.use_tracemalloc:
+            import tracemalloc
+
+            # reset_peak() is global, so an enclosing stage keeps the highest
+            # peak seen before its children reset it
+            if stack:
+                stack[-1][0] = max(stack[-1][0], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        frame = [0]
+        stack.append(frame)
+
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall1, cpu1 = time.perf_counter(), time.process_time()
+            stack.pop()
+            record = dict(args)
+            record.update(cpu_s=cpu1 - cpu0, peak_rss_bytes=_peak_rss_bytes())
+            if self.use_tracemalloc:
+                import tracemalloc
+
+                peak = max(frame[0], tracemalloc.get_traced_memory()[1])
+                record["py_peak_bytes"] = peak
+                if stack:
+                    stack[-1][0] = max(stack[-1][0], peak)
+                tracemalloc.reset_peak()
+
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": (wall0 - self.origin) * 1e6,
+                "dur": (wall1 - wall0) * 1e6,
+                "pid": self.pid,
+                "tid": threading.get_ident(),
+                "args": record,
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def summary(self):
+        return summarize(self.events)
+
+    def trace(self):
+        return {
+            "traceEvents": self.events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "script": _script_name(),
+                "argv": sys.argv,
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "wall_s": time.perf_counter() - self.origin,
+                "peak_rss_bytes": _peak_rss_bytes(),
+                "summary": self.summary(),
+            },
+        }
+
+    def write(self, path=None):
+        path = path or self.path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.trace(), f)
+        os.replace(tmp, path)
+        return path
+
+
+def summarize(events):
+    """{stage name: {count, wall_s, cpu_s}} over the complete events of a trace."""
+    totals = {}
+    for e in events:
+        if e.get("ph") != "X":
+            continue
+        t = totals.setdefault(e["name"], {"count": 0, "wall_s": 0.0, "cpu_s": 0.0})
+        t["count"] += 1
+        t["wall_s"] += e["dur"] / 1e6
+        t["cpu_s"] += e.get("args", {}).get("cpu_s", 0.0)
+    return totals
+
+
+# ------------------------------
+# Public hooks
+# ------------------------------
+def _recorder():
+    recorder = _state["recorder"]
+    # Recorders are per process: a forked child starts without one
+    if recorder is not None and recorder.pid == os.getpid():
+        return recorder
+
+    setting = os.environ.get(ENV_VAR, "")
+    if not setting or setting == "0":
+        _state["recorder"] = False
+        return None
+    recorder = Recorder(trace_path(setting), os.environ.get(TRACEMALLOC_ENV_VAR, "") not in ("", "0"))
+    _state["recorder"] = recorder
+    atexit.register(_write_at_exit, recorder)
+    return recorder
+
+
+def _write_at_exit(recorder):
+    if recorder.pid == os.getpid() and recorder.events:
+        path = recorder.write()
+        print(f"profile trace written to {path}", file=sys.stderr)
+
+
+def enabled():
+    return _recorder() is not None
+
+
+def stage(name, **args):
+    """Context manager timing one pipeline stage (no-op unless profiling is on)."""
+    recorder = _state["recorder"]
+    if recorder is False:
+        return _NULL_STAGE
+    recorder = _recorder()
+    if recorder is None:
+        return _NULL_STAGE
+    return recorder.stage(name, args)
+
+
+# ------------------------------
+# Reading traces back
+# ------------------------------
+def load_summary(path):
+    with open(path) as f:
+        trace = json.load(f)
+    return summarize(trace["traceEvents"] if isinstance(trace, dict) else trace)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize or compare stage traces written with MURBURN_PROFILE")
+    parser.add_argument("traces", nargs="+", help="one trace to summarize, or two to compare")
+    args = parser.parse_args(argv)
+    if len(args.traces) > 2:
+        parser.error("give one or two trace files")
+
+    summaries = [load_summary(p) for p in args.traces]
+    names = list(summaries[0]) + [n for n in summaries[-1] if n not in summaries[0]]
+    if len(summaries) == 1:
+        print(f"{'stage':24s} {'count':>6s} {'wall (s)':>10s} {'cpu (s)':>10s}")
+        for name in sorted(names, key=lambda n: -summaries[0][n]["wall_s"]):
+            t = summaries[0][name]
+            print(f"{name:24s} {t['count']:6d} {t['wall_s']:10.4f} {t['cpu_s']:10.4f}")
+        return
+
+    old, new = summaries
+    print(f"{'stage':24s} {'old wall (s)':>12s} {'new wall (s)':>12s} {'ratio':>7s}")
+    for name in names:
+        a = old.get(name, {}).get("wall_s")
+        b = new.get(name, {}).get("wall_s")
+        ratio = f"{b / a:7.2f}" if a and b is not None else "      -"
+        fa = f"{a:12.4f}" if a is not None else f"{'-':>12s}"
+        fb = f"{b:12.4f}" if b is not None else f"{'-':>12s}"
+        print(f"{name:24s} {fa} {fb} {ratio}")
+
+
+if __name__ == "__main__":
+    main()
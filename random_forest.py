@@ -1,6 +1,5 @@
-import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier  # Using RF to force multiple features
+# Persisted forest, reused by rf_predict.py for batch/streaming scoring
+MODEL_PATH = "random_forest.pkl"
 
 # Training labels (10 classical + 10 murburn)
 train_labels = ['Classical'] * 10 + ['Murburn'] * 10
@@ -58,16 +57,6 @@ test_enzyme_names = [
     "COX2", "CYP2C19", "CYP2D6", "CYP2E1", "CYP3A4", "CYP2C9", "Mitochon"
 ]
 
-# Train Random Forest classifier to force multiple feature splits
-clf = RandomForestClassifier(random_state=42, n_estimators=100)
-clf.fit(train_data, train_labels)
-
-# Predict
-predictions = clf.predict(unknown_data)
-
-# Feature Importance
-feature_importance = clf.feature_importances_
-
 # Map features
 features = [
     'Heme', 'Flavin', 'FeS', 'ConstrAccess', 'Subst>Site', 'Redox', 'Exergonic', 'O2Need',
@@ -76,12 +65,36 @@ features = [
     'BulkPhaseDep', 'TempDep'
 ]
 
-# Ranked importance
-importance_df = pd.DataFrame({'Parameter': features, 'Importance Score': feature_importance})
-importance_df = importance_df.sort_values(by='Importance Score', ascending=False)
-importance_df.reset_index(drop=True, inplace=True)
 
-print(importance_df.head(10))  # Top 10 features
-for enzyme, classification in zip(test_enzyme_names, predictions):
-    print(f"{enzyme}: {classification}")
+def train_forest(n_jobs=None):
+    from sklearn.ensemble import RandomForestClassifier  # Using RF to force multiple features
+
+    # Train Random Forest classifier to force multiple feature splits
+    clf = RandomForestClassifier(random_state=42, n_estimators=100, n_jobs=n_jobs)
+    clf.fit(train_data, train_labels)
+    return clf
+
+
+if __name__ == "__main__":
+    # Heavy imports stay out of module import: rf_predict.py, pdb_features.py
+    # and murburn.py only need the schema above
+    import joblib
+    import pandas as pd
+
+    clf = train_forest(n_jobs=-1)
+    joblib.dump(clf, MODEL_PATH)
+
+    # Predict
+    predictions = clf.predict(unknown_data)
+
+    # Feature Importance
+    feature_importance = clf.feature_importances_
+
+    # Ranked importance
+    importance_df = pd.DataFrame({'Parameter': features, 'Importance Score': feature_importance})
+    importance_df = importance_df.sort_values(by='Importance Score', ascending=False)
+    importance_df.reset_index(drop=True, inplace=True)
 
+    print(importance_df.head(10))  # Top 10 features
+    for enzyme, classification in zip(test_enzyme_names, predictions):
+        print(f"{enzyme}: {classification}")
@@ -0,0 +1,176 @@
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+from bitpack import PredictionMemo, packable_rows
+from random_forest import MODEL_PATH, features
+
+# ------------------------------
+# Chunked batch/streaming prediction with the persisted random forest
+# ------------------------------
+# Loads the forest written by random_forest.py once, reads feature vectors
+# from .npy (memory-mapped), CSV or stdin in fixed-size chunks, scores each
+# chunk on every core and appends labels plus class probabilities to the
+# output as it goes. Peak memory depends on --chunk-size, not on input size.
+#
+#   python random_forest.py                       # trains and writes random_forest.pkl
+#   python rf_predict.py proteome.csv -o preds.csv --id-column Name
+#   python rf_predict.py vectors.npy --chunk-size 100000 > preds.csv
+#   cat vectors.csv | python rf_predict.py - --no-header
+#   python rf_predict.py proteome.csv --memo rf_memo.npz   # predict each distinct vector once
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+# ------------------------------
+# Input readers: each yields (ids or None, float32 matrix)
+# ------------------------------
+def iter_npy_chunks(path, chunk_size):
+    X = np.load(path, mmap_mode="r")
+    if X.ndim != 2:
+        raise ValueError(f"{path}: expected a 2-D array, got shape {X.shape}")
+    for start in range(0, X.shape[0], chunk_size):
+        yield None, np.asarray(X[start:start + chunk_size], dtype=np.float32)
+
+
+def iter_csv_chunks(source, chunk_size, id_column=None, header=True):
+    import pandas as pd
+
+    reader = pd.read_csv(source, chunksize=chunk_size, header=0 if header else None)
+    for frame in reader:
+        ids = None
+        if id_column is not None:
+            ids = frame.pop(id_column).astype(str).tolist()
+        if header and all(name in frame.columns for name in features):
+            frame = frame[features]
+        yield ids, frame.to_numpy(dtype=np.float32)
+
+
+def iter_input_chunks(path, chunk_size, id_column=None, header=True):
+    if path == "-":
+        return iter_csv_chunks(sys.stdin, chunk_size, id_column, header)
+    if path.endswith(".npy"):
+        if id_column is not None:
+            raise ValueError("--id-column is only supported for CSV input")
+        return iter_npy_chunks(path, chunk_size)
+    return iter_csv_chunks(path, chunk_size, id_column, header)
+
+
+# ------------------------------
+# Scoring
+# ------------------------------
+def load_forest(path=MODEL_PATH, n_jobs=-1):
+    clf = joblib.load(path)
+    clf.n_jobs = n_jobs  # predict_proba fans trees out over threads
+    return clf
+
+
+def predict_chunks(clf, chunks, memo=None):
+    """Yield (ids, labels, probabilities) for every input chunk.
+
+    With a PredictionMemo, rows are bit-packed and only vectors the memo has
+    not seen before reach the forest. Rows that cannot be packed (NaN, or a
+    value outside 0..3) go to the forest directly.
+    """
+    for ids, X in chunks:
+        if X.shape[1] != clf.n_features_in_:
+            raise ValueError(f"expected {clf.n_features_in_} feature columns, got {X.shape[1]}")
+        if memo is None:
+            proba = clf.predict_proba(X)
+        else:
+            packable = packable_rows(X)
+            if packable.all():
+                proba = memo.predict_proba(X)
+            elif not packable.any():
+                proba = clf.predict_proba(X)
+            else:
+                proba = np.empty((len(X), len(clf.classes_)))
+                proba[packable] = memo.predict_proba(X[packable])
+                proba[~packable] = clf.predict_proba(X[~packable])
+        yield ids, clf.classes_[np.argmax(proba, axis=1)], proba
+
+
+def write_predictions(out, clf, scored, progress=False):
+    """Stream predictions as CSV and return (rows, seconds)."""
+    import pandas as pd
+
+    prob_columns = [f"p_{c}" for c in clf.classes_]
+    first = True
+    n_rows = 0
+    start = time.perf_counter()
+
+    for ids, labels, proba in scored:
+        frame = pd.DataFrame(proba, columns=prob_columns)
+        frame.insert(0, "label", labels)
+        if ids is not None:
+            frame.insert(0, "id", ids)
+        frame.to_csv(out, header=first, index=False, float_format="%.6f")
+        out.flush()
+        first = False
+
+        n_rows += len(labels)
+        if progress:
+            elapsed = time.perf_counter() - start
+            print(f"{n_rows} rows, {n_rows / elapsed:,.0f} rows/sec", file=sys.stderr)
+
+    return n_rows, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score feature vectors with the persisted random forest")
+    parser.add_argument("input", help="feature table: .npy, .csv, or '-' for CSV on stdin")
+    parser.add_argument("-m", "--model", default=MODEL_PATH, help="forest written by random_forest.py")
+    parser.add_argument("-o", "--output", default="-", help="output CSV (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows scored per chunk")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="inference threads (-1 = all cores)")
+    parser.add_argument("--id-column", help="CSV column copied to the output as the row id")
+    parser.add_argument("--no-header", action="store_true", help="CSV input has no header row")
+    parser.add_argument("--progress", action="store_true", help="report throughput after every chunk")
+    parser.add_argument("--memo", help="persistent prediction memo (.npz) keyed on bit-packed vectors")
+    parser.add_argument("--memo-size", type=int, default=1_000_000, help="max distinct vectors kept in the memo")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.model):
+        parser.error(f"{args.model} not found; run random_forest.py first")
+
+    clf = load_forest(args.model, args.n_jobs)
+    memo = None
+    if args.memo:
+        memo = PredictionMemo(clf, clf.n_features_in_, max_entries=args.memo_size)
+        memo.load(args.memo)
+
+    chunks = iter_input_chunks(args.input, args.chunk_size, args.id_column, header=not args.no_header)
+    scored = predict_chunks(clf, chunks, memo)
+
+    try:
+        if args.output == "-":
+            n_rows, elapsed = write_predictions(sys.stdout, clf, scored, args.progress)
+        else:
+            with open(args.output, "w") as out:
+                n_rows, elapsed = write_predictions(out, clf, scored, args.progress)
+    except BrokenPipeError:
+        # Reader went away (e.g. piped into head): stop quietly, and keep the
+        # interpreter from failing again when it flushes stdout on exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        if memo is not None:
+            memo.save(args.memo)
+        return
+
+    rate = n_rows / elapsed if elapsed > 0 else float("inf")
+    print(f"Scored {n_rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)", file=sys.stderr)
+    if memo is not None:
+        memo.save(args.memo)
+        stats = memo.stats()
+        print(
+            f"Memo: {stats['distinct_misses']} new vectors predicted in {stats['model_calls']} model calls, "
+            f"{stats['distinct_hits']} reused, {stats['entries']} stored",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# ------------------------------
+# NumPy arrays in named shared memory
+# ------------------------------
+# Pickling a SharedArray only sends the block name, shape and dtype, so a
+# process pool can hand the same read-only matrix to every worker without
+# copying it once per task.
+
+
+class SharedArray:
+    """A NumPy array backed by a multiprocessing.shared_memory block."""
+
+    def __init__(self, shm, shape, dtype, owner=False):
+        self._shm = shm
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._owner = owner
+        self._array = None
+
+    @classmethod
+    def copy_of(cls, array):
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        shared = cls(shm, array.shape, array.dtype, owner=True)
+        shared.array[...] = array
+        shared.array.flags.writeable = False
+        return shared
+
+    @property
+    def array(self):
+        if self._array is None:
+            self._array = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+        return self._array
+
+    def __getstate__(self):
+        return {"name": self._shm.name, "shape": self.shape, "dtype": self.dtype.str}
+
+    def __setstate__(self, state):
+        self.__init__(shared_memory.SharedMemory(name=state["name"]), state["shape"], state["dtype"])
+        self.array.flags.writeable = False
+
+    def close(self):
+        self._array = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # Views of the array are still alive; the mapping goes away with them
+            pass
+        if self._owner:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,391 @@
+import argparse
+import itertools
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+from bitpack import BITS_PER_FEATURE, MAX_VALUE, pack_codes
+
+# ------------------------------
+# Nearest-neighbour index over bit-packed feature vectors
+# ------------------------------
+# Vectors are stored as bitpack codes (2 bits per feature in one uint64).
+# Two codes differ in feature j when either bit of pair j is set in their
+# XOR, so folding each pair onto its low bit and counting bits gives the
+# number of differing features (Hamming distance over features). With
+# integer feature weights, the weighted distance sum_j w_j [a_j != b_j] is a
+# popcount per bit-plane of the weights.
+#
+# Sub-linear search uses multi-index hashing: features are split into
+# n_blocks contiguous blocks and every block value points to the distinct
+# codes that have it. Two vectors at distance d < n_blocks * (s + 1) agree
+# up to s features in at least one block (pigeonhole), so probing every block
+# value within s changes of the query's finds all of them. Probes are dense
+# table lookups; when the probe count approaches the table size the search
+# falls back to a vectorized scan of all distinct codes.
+#
+# Duplicate vectors are stored once; each distinct code keeps its list of
+# entries, so a bank of millions of proteins costs as many distance
+# evaluations as it has distinct feature vectors.
+#
+#   python similarity_index.py                              # unknowns vs. training enzymes of random_forest.py
+#   python similarity_index.py build bank.csv --id-column Name -o bank_index.npz
+#   python similarity_index.py query bank_index.npz new.csv -k 5
+#   python similarity_index.py query bank_index.npz new.csv --radius 2
+
+INDEX_VERSION = 1
+MAX_BLOCK_FEATURES = 11   # 4**11 buckets per block table
+
+
+if hasattr(np, "bitwise_count"):
+    def popcount(x):
+        return np.bitwise_count(x)
+else:  # numpy < 2.0
+    _BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(x):
+        x = np.ascontiguousarray(x, dtype=np.uint64)
+        return _BYTE_COUNTS[x.view(np.uint8)].reshape(*x.shape, 8).sum(axis=-1, dtype=np.uint8)
+
+
+def _pair_fold(x):
+    # Bit 2j set iff feature j differs
+    return (x | (x >> np.uint64(1))) & np.uint64(0x5555555555555555)
+
+
+def _block_masks(block_features, changes):
+    """XOR masks that change exactly ``changes`` features of one block."""
+    masks = []
+    for positions in itertools.combinations(range(block_features), changes):
+        for values in itertools.product(range(1, MAX_VALUE + 1), repeat=changes):
+            masks.append(sum(v << (BITS_PER_FEATURE * p) for p, v in zip(positions, values)))
+    return np.asarray(masks, dtype=np.int64)
+
+
+class SimilarityIndex:
+    """k-NN and radius search over bit-packed feature vectors.
+
+    weights  optional non-negative integer weight per feature; distances are
+             then sum of the weights of the differing features
+    """
+
+    def __init__(self, codes, n_features, ids=None, weights=None, n_blocks=None):
+        codes = np.asarray(codes, dtype=np.uint64)
+        self.n_features = int(n_features)
+        self.n_entries = len(codes)
+        self.ids = None if ids is None else np.asarray(ids)
+        self._set_weights(weights)
+
+        # Distinct codes and their entries (CSR: entries of code i are
+        # entry_order[entry_start[i]:entry_start[i + 1]])
+        self.codes, inverse, counts = np.unique(codes, return_inverse=True, return_counts=True)
+        self.entry_order = np.argsort(inverse.ravel(), kind="stable")
+        self.entry_start = np.r_[0, np.cumsum(counts)]
+
+        if n_blocks is None:
+            # ~log4(n) features per block keeps buckets near one code each
+            per_block = int(math.ceil(math.log(max(len(self.codes), 2), 4)))
+            n_blocks = math.ceil(self.n_features / min(max(per_block, 1), MAX_BLOCK_FEATURES))
+        self._build_tables(max(1, min(int(n_blocks), max(self.n_features, 1))))
+        self.stats = {"queries": 0, "probes": 0, "candidates": 0, "scans": 0}
+
+    @classmethod
+    def from_features(cls, X, ids=None, weights=None, n_blocks=None):
+        X = np.asarray(X)
+        return cls(pack_codes(X), X.shape[1], ids, weights, n_blocks)
+
+    def __len__(self):
+        return self.n_entries
+
+    # ------------------------------
+    # Construction
+    # ------------------------------
+    def _set_weights(self, weights):
+        if weights is None:
+            self.weights = None
+            self._planes = None
+            self._min_weights = np.zeros(self.n_features + 1, dtype=np.int64)
+            self._min_weights[1:] = np.arange(1, self.n_features + 1)
+            return
+        w = np.asarray(weights)
+        if w.shape != (self.n_features,) or (w < 0).any() or not np.array_equal(w, np.round(w)):
+            raise ValueError(f"weights must be {self.n_features} non-negative integers")
+        self.weights = w.astype(np.int64)
+        # Bit-plane b holds the features whose weight has bit b set
+        self._planes = [np.uint64(sum(1 << (BITS_PER_FEATURE * j) for j in range(self.n_features)
+                                      if (int(self.weights[j]) >> b) & 1))
+                        for b in range(int(self.weights.max()).bit_length())]
+        # Smallest possible distance of a vector differing in h features
+        self._min_weights = np.r_[0, np.cumsum(np.sort(self.weights))]
+
+    def _build_tables(self, n_blocks):
+        self.n_blocks = n_blocks
+        size = math.ceil(self.n_features / n_blocks)
+        self.blocks = [(start, min(start + size, self.n_features)) for start in range(0, self.n_features, size)]
+        self.n_blocks = len(self.blocks)
+        self._tables = []
+        for start, stop in self.blocks:
+            keys = self._block_keys(self.codes, start, stop)
+            order = np.argsort(keys, kind="stable")
+            offsets = np.searchsorted(keys[order], np.arange(4 ** (stop - start) + 1))
+            self._tables.append((offsets, order))
+        self._masks = {}
+
+    @staticmethod
+    def _block_keys(codes, start, stop):
+        shift = np.uint64(BITS_PER_FEATURE * start)
+        mask = np.uint64((1 << (BITS_PER_FEATURE * (stop - start))) - 1)
+        return ((codes >> shift) & mask).astype(np.int64)
+
+    def _masks_within(self, block_features, changes):
+        key = (block_features, changes)
+        if key not in self._masks:
+            self._masks[key] = np.concatenate([_block_masks(block_features, c) for c in range(changes + 1)])
+        return self._masks[key]
+
+    # ------------------------------
+    # Distances
+    # ------------------------------
+    def distance(self, code, codes):
+        """Distances from one code to an array of codes."""
+        diff = _pair_fold(np.asarray(codes, dtype=np.uint64) ^ np.uint64(code))
+        if self._planes is None:
+            return popcount(diff).astype(np.int64)
+        total = np.zeros(diff.shape, dtype=np.int64)
+        for b, plane in enumerate(self._planes):
+            total += popcount(diff & plane).astype(np.int64) << b
+        return total
+
+    def _hamming_reach(self, radius):
+        """Most differing features a vector within ``radius`` can have."""
+        return int(np.searchsorted(self._min_weights, radius, side="right")) - 1
+
+    # ------------------------------
+    # Candidate generation
+    # ------------------------------
+    def _candidates(self, code, changes):
+        """Distinct-code indices that agree with ``code`` up to ``changes`` features in some block.
+
+        Returns None when probing would touch more buckets than a full scan.
+        """
+        probes = sum(len(self._masks_within(stop - start, min(changes, stop - start)))
+                     for start, stop in self.blocks)
+        if probes >= len(self.codes):
+            return None
+        found = []
+        for (start, stop), (offsets, order) in zip(self.blocks, self._tables):
+            key = int(self._block_keys(np.asarray([code], dtype=np.uint64), start, stop)[0])
+            probe = key ^ self._masks_within(stop - start, min(changes, stop - start))
+            lo, hi = offsets[probe], offsets[probe + 1]
+            hit = hi > lo
+            if hit.any():
+                lo, hi = lo[hit], hi[hit]
+                # Concatenate the bucket ranges [lo, hi) without a Python loop
+                lengths = hi - lo
+                starts = np.repeat(lo - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+                found.append(order[starts + np.arange(lengths.sum())])
+        self.stats["probes"] += probes
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+
+    def _expand(self, unique_idx, distances):
+        """Entry indices (and distances) of a set of distinct codes."""
+        counts = self.entry_start[unique_idx + 1] - self.entry_start[unique_idx]
+        starts = np.repeat(self.entry_start[unique_idx] - np.r_[0, np.cumsum(counts)[:-1]], counts)
+        entries = self.entry_order[starts + np.arange(counts.sum())]
+        return entries, np.repeat(distances, counts)
+
+    # ------------------------------
+    # Queries
+    # ------------------------------
+    def _radius_one(self, code, radius):
+        reach = self._hamming_reach(radius)
+        # Every match differs in <= reach features: some block is within reach // n_blocks
+        candidates = self._candidates(code, reach // self.n_blocks) if reach < self.n_features else None
+        if candidates is None:
+            candidates = np.arange(len(self.codes))
+            self.stats["scans"] += 1
+        d = self.distance(code, self.codes[candidates])
+        keep = d <= radius
+        self.stats["candidates"] += len(candidates)
+        entries, dist = self._expand(candidates[keep], d[keep])
+        order = np.lexsort((entries, dist))
+        return entries[order], dist[order]
+
+    def _knn_one(self, code, k):
+        k = min(k, self.n_entries)
+        for changes in itertools.count():
+            candidates = self._candidates(code, changes) if changes < self.n_features else None
+            if candidates is None:
+                candidates = np.arange(len(self.codes))
+                self.stats["scans"] += 1
+                certain = None
+            else:
+                # Vectors missed by this probe differ in >= n_blocks * (changes + 1) features
+                certain = self._min_weights[min(self.n_blocks * (changes + 1), self.n_features)]
+            d = self.distance(code, self.codes[candidates])
+            counts = self.entry_start[candidates + 1] - self.entry_start[candidates]
+            if certain is not None and counts[d < certain].sum() < k:
+                continue
+            self.stats["candidates"] += len(candidates)
+            # Closest distinct codes first, then entries in index order
+            order = np.lexsort((candidates, d))
+            need = np.searchsorted(np.cumsum(counts[order]), k)
+            # Keep every code tied with the k-th distance so entry order decides ties
+            top = order[d[order] <= d[order[min(need, len(order) - 1)]]]
+            entries, dist = self._expand(candidates[top], d[top])
+            order = np.lexsort((entries, dist))[:k]
+            return entries[order], dist[order]
+
+    def _query_codes(self, queries):
+        queries = np.asarray(queries)
+        if queries.dtype == np.uint64 and queries.ndim <= 1:
+            return np.atleast_1d(queries)
+        queries = np.atleast_2d(queries)
+        if queries.shape[1] != self.n_features:
+            raise ValueError(f"expected {self.n_features} features per query, got {queries.shape[1]}")
+        return pack_codes(queries)
+
+    def knn(self, queries, k=5):
+        """(entries, distances), each (n_queries, k); -1 pads when the index is smaller than k."""
+        codes = self._query_codes(queries)
+        entries = np.full((len(codes), k), -1, dtype=np.int64)
+        distances = np.full((len(codes), k), -1, dtype=np.int64)
+        for i, code in enumerate(codes):
+            e, d = self._knn_one(code, k)
+            entries[i, :len(e)] = e
+            distances[i, :len(d)] = d
+        self.stats["queries"] += len(codes)
+        return entries, distances
+
+    def radius(self, queries, radius):
+        """[(entries, distances), ...] of every entry within ``radius`` of each query."""
+        codes = self._query_codes(queries)
+        self.stats["queries"] += len(codes)
+        return [self._radius_one(code, radius) for code in codes]
+
+    # ------------------------------
+    # Persistence
+    # ------------------------------
+    def save(self, path):
+        codes = np.empty(self.n_entries, dtype=np.uint64)
+        codes[self.entry_order] = np.repeat(self.codes, np.diff(self.entry_start))
+        arrays = {"version": INDEX_VERSION, "n_features": self.n_features, "n_blocks": self.n_blocks, "codes": codes}
+        if self.ids is not None:
+            arrays["ids"] = self.ids.astype(str)
+        if self.weights is not None:
+            arrays["weights"] = self.weights
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, weights=None):
+        """Index saved with save(); ``weights`` overrides the stored ones."""
+        with np.load(path, allow_pickle=False) as saved:
+            if int(saved["version"]) != INDEX_VERSION:
+                raise ValueError(f"{path}: unsupported index version {int(saved['version'])}")
+            if weights is None and "weights" in saved:
+                weights = saved["weights"]
+            return cls(saved["codes"], int(saved["n_features"]), saved["ids"] if "ids" in saved else None,
+                       weights, int(saved["n_blocks"]))
+
+
+# ------------------------------
+# Command line
+# ------------------------------
+def importance_weights(levels=8):
+    """Integer weights 1..levels from the random_forest.py feature importances."""
+    from random_forest import train_forest
+
+    imp = train_forest(n_jobs=1).feature_importances_
+    return 1 + np.round((levels - 1) * imp / imp.max()).astype(np.int64)
+
+
+def _read_table(path, id_column=None):
+    from rf_predict import iter_input_chunks
+
+    ids, blocks = [], []
+    for chunk_ids, X in iter_input_chunks(path, 1 << 20, id_column):
+        blocks.append(X)
+        if chunk_ids is not None:
+            ids.extend(chunk_ids)
+    return (ids or None), np.vstack(blocks)
+
+
+def _label(index, entry):
+    return str(index.ids[entry]) if index.ids is not None else str(entry)
+
+
+def _demo(k, weights):
+    from random_forest import features, test_enzyme_names, train_data, train_labels, unknown_data
+
+    names = ["DNA Replication", "RNA Transcription", "Protein Translation", "DNA Repair", "Proteasome Machinery",
+             "NRPS", "Amylase", "Lipase", "Ligase", "Aldolase", "CPO", "HRP", "Catalase", "LiP", "LPO", "COX1",
+             "CYP1A2", "CYP2B6", "CYP2C8", "Peroxisome"]
+    index = SimilarityIndex.from_features(train_data, [f"{n} ({l})" for n, l in zip(names, train_labels)], weights)
+    entries, distances = index.knn(unknown_data, k)
+    print(f"Nearest training enzymes ({len(features)} features, "
+          f"{'weighted' if weights is not None else 'Hamming'} distance):")
+    for name, row, dist in zip(test_enzyme_names, entries, distances):
+        print(f"  {name}: " + ", ".join(f"{_label(index, e)} d={d}" for e, d in zip(row, dist) if e >= 0))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nearest-neighbour search over bit-packed feature vectors")
+    parser.add_argument("--weighted", action="store_true",
+                        help="weight features by random_forest.py importances (integer levels 1-8)")
+    sub = parser.add_subparsers(dest="command")
+    p = sub.add_parser("demo", help="nearest training enzymes of every random_forest.py unknown (default)")
+    p.add_argument("-k", type=int, default=3)
+    p = sub.add_parser("build", help="index a feature table (.npy or CSV)")
+    p.add_argument("table")
+    p.add_argument("-o", "--output", required=True)
+    p.add_argument("--id-column")
+    p.add_argument("--blocks", type=int, help="multi-index hashing blocks (default: from the table size)")
+    p = sub.add_parser("query", help="search an index with the rows of a feature table")
+    p.add_argument("index")
+    p.add_argument("table")
+    p.add_argument("--id-column")
+    p.add_argument("-k", type=int, default=5)
+    p.add_argument("--radius", type=int, help="return every entry within this distance instead of k-NN")
+    args = parser.parse_args(argv)
+
+    weights = importance_weights() if args.weighted else None
+    if args.command in (None, "demo"):
+        return _demo(getattr(args, "k", 3), weights)
+
+    if args.command == "build":
+        ids, X = _read_table(args.table, args.id_column)
+        start = time.perf_counter()
+        index = SimilarityIndex.from_features(X, ids, weights, args.blocks)
+        index.save(args.output)
+        print(f"{len(index)} entries ({len(index.codes)} distinct vectors, {index.n_blocks} blocks) indexed in "
+              f"{time.perf_counter() - start:.2f}s", file=sys.stderr)
+        return
+
+    index = SimilarityIndex.load(args.index, weights)
+    query_ids, Q = _read_table(args.table, args.id_column)
+    query_ids = query_ids or [str(i) for i in range(len(Q))]
+    start = time.perf_counter()
+    print("query,rank,entry,distance")
+    if args.radius is not None:
+        for qid, (entries, dist) in zip(query_ids, index.radius(Q, args.radius)):
+            for rank, (e, d) in enumerate(zip(entries, dist), 1):
+                print(f"{qid},{rank},{_label(index, e)},{d}")
+    else:
+        entries, distances = index.knn(Q, args.k)
+        for qid, row, dist in zip(query_ids, entries, distances):
+            for rank, (e, d) in enumerate(zip(row, dist), 1):
+                if e >= 0:
+                    print(f"{qid},{rank},{_label(index, e)},{d}")
+    elapsed = time.perf_counter() - start
+    print(f"{len(Q)} queries in {elapsed * 1e3:.1f} ms ({index.stats['candidates']} candidates, "
+          f"{index.stats['scans']} full scans)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
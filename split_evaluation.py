@@ -0,0 +1,277 @@
+import contextlib
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.tree import DecisionTreeClassifier
+
+from profiling import stage
+from shared_array import SharedArray
+
+# ------------------------------
+# Repeated train/test split evaluation engine
+# ------------------------------
+# The features are encoded once (dataset_cache), every split's index arrays
+# are drawn once up front, and the (category, split) fits are spread over a
+# process pool that reads X, y and the split indices from shared memory.
+# Metrics for all splits come from one stack of confusion matrices.
+
+SplitResults = namedtuple(
+    "SplitResults",
+    ["accuracy", "precision", "recall", "f1", "importances", "confusion"],
+)
+SplitResults.__doc__ = """Per-split metrics for one feature category.
+
+accuracy     (n_splits,)
+precision    (n_splits, n_classes), zero_division=0 like sklearn
+recall       (n_splits, n_classes)
+f1           (n_splits, n_classes)
+importances  (n_splits, n_category_features) tree feature_importances_
+confusion    (n_splits, n_classes, n_classes) rows = true, columns = predicted
+"""
+
+DEFAULT_TREE_PARAMS = {"random_state": 42}
+TRACKED_METRICS = ("accuracy", "f1")
+
+
+# ------------------------------
+# Split indices
+# ------------------------------
+def make_splits(n_rows, seeds, test_size=0.4):
+    """Stacked (train, test) index arrays, one row per seed.
+
+    Row ``i`` holds exactly the rows train_test_split(X, y,
+    test_size=test_size, random_state=seeds[i]) would return.
+    """
+    rows = np.arange(n_rows)
+    pairs = [train_test_split(rows, test_size=test_size, random_state=seed) for seed in seeds]
+    train = np.stack([p[0] for p in pairs])
+    test = np.stack([p[1] for p in pairs])
+    return train, test
+
+
+# ------------------------------
+# Vectorized metrics
+# ------------------------------
+def confusion_matrices(y_true, y_pred, n_classes):
+    """(n_splits, n_classes, n_classes) counts from stacked label arrays."""
+    y_true = np.asarray(y_true, dtype=np.int64)
+    y_pred = np.asarray(y_pred, dtype=np.int64)
+    n_splits = y_true.shape[0]
+    keys = (np.arange(n_splits)[:, None] * n_classes + y_true) * n_classes + y_pred
+    counts = np.bincount(keys.ravel(), minlength=n_splits * n_classes * n_classes)
+    return counts.reshape(n_splits, n_classes, n_classes)
+
+
+def _divide(numerator, denominator):
+    out = np.zeros(np.broadcast(numerator, denominator).shape, dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def metrics_from_confusion(confusion):
+    """Accuracy and per-class precision/recall/F1 for every split at once."""
+    tp = np.diagonal(confusion, axis1=1, axis2=2)
+    predicted = confusion.sum(axis=1)
+    actual = confusion.sum(axis=2)
+    accuracy = tp.sum(axis=1) / confusion.sum(axis=(1, 2))
+    precision = _divide(tp, predicted)
+    recall = _divide(tp, actual)
+    f1 = _divide(2 * tp, predicted + actual)
+    return accuracy, precision, recall, f1
+
+
+# ------------------------------
+# Worker side
+# ------------------------------
+_worker = {}
+
+
+def _init_worker(X, y, train, test):
+    _worker.update(X=X, y=y, train=train, test=test)
+
+
+def _array(value):
+    return value.array if isinstance(value, SharedArray) else value
+
+
+def worker_arrays():
+    """(X, y, train, test) as seen by a task running inside split_pool."""
+    return tuple(_array(_worker[name]) for name in ("X", "y", "train", "test"))
+
+
+def _fit_split(task):
+    columns, split, params = task
+    X, y, train, test = worker_arrays()
+    train, test = train[split], test[split]
+
+    clf = DecisionTreeClassifier(**params)
+    with stage("fit"):
+        clf.fit(X[train][:, columns], y[train])
+    with stage("predict"):
+        y_pred = clf.predict(X[test][:, columns])
+    return y_pred, clf.feature_importances_
+
+
+def _collect_results(outputs, names, n_seeds, y_test, n_classes):
+    results = {}
+    for c, name in enumerate(names):
+        block = outputs[c * n_seeds:(c + 1) * n_seeds]
+        y_pred = np.stack([out[0] for out in block])
+        importances = np.stack([out[1] for out in block])
+        confusion = confusion_matrices(y_test, y_pred, n_classes)
+        accuracy, precision, recall, f1 = metrics_from_confusion(confusion)
+        results[name] = SplitResults(accuracy, precision, recall, f1, importances, confusion)
+    return results
+
+
+@contextlib.contextmanager
+def split_pool(X, y, train, test, n_jobs):
+    """Yield ``run(fn, tasks)``, which maps a module-level ``fn`` over ``tasks``.
+
+    Tasks read the data and split indices through worker_arrays(). With
+    ``n_jobs > 1`` they run in a process pool over shared-memory copies,
+    otherwise in this process.
+    """
+    if n_jobs <= 1:
+        _init_worker(X, y, train, test)
+        try:
+            yield lambda fn, tasks: [fn(task) for task in tasks]
+        finally:
+            _worker.clear()
+        return
+
+    shared = [SharedArray.copy_of(a) for a in (X, y, train, test)]
+    try:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=shared) as pool:
+            def run(fn, tasks):
+                tasks = list(tasks)
+                chunksize = max(1, len(tasks) // (4 * n_jobs))
+                return list(pool.map(fn, tasks, chunksize=chunksize))
+
+            yield run
+    finally:
+        for a in shared:
+            a.close()
+
+
+# ------------------------------
+# Public entry point
+# ------------------------------
+def _split_keys(X, y, tasks, seeds, test_size):
+    from experiment_cache import array_digest, experiment_key
+
+    data = array_digest(X, y)
+    return [experiment_key(kind="split", data=data, columns=columns, seed=seeds[s],
+                           test_size=test_size, params=params)
+            for columns, s, params in tasks]
+
+
+def evaluate_categories(X, y, categories, n_splits=20, test_size=0.4, seeds=None,
+                        n_jobs=None, tree_params=None, n_classes=None, cache=None):
+    """Fit one decision tree per (category, split) and collect the metrics.
+
+    ``categories`` maps a name to the feature column indices it uses.
+    Split ``i`` uses ``random_state=seeds[i]`` (default ``range(n_splits)``),
+    so results match the serial loop of murzyme_classical_classification.py.
+    ``n_jobs=1`` runs in-process; ``None`` uses every core.
+
+    With an experiment_cache.ExperimentCache, each (category, split) output is
+    looked up first and only the missing ones are fitted.
+    """
+    X = np.asarray(X)
+    y = np.asarray(y)
+    seeds = list(range(n_splits)) if seeds is None else list(seeds)
+    params = dict(DEFAULT_TREE_PARAMS if tree_params is None else tree_params)
+    if n_classes is None:
+        n_classes = int(y.max()) + 1
+
+    with stage("make_splits", n_splits=len(seeds)):
+        train, test = make_splits(len(y), seeds, test_size)
+    names = list(categories)
+    tasks = [(list(categories[name]), s, params) for name in names for s in range(len(seeds))]
+
+    outputs = [None] * len(tasks)
+    if cache is not None:
+        with stage("cache_lookup", n_tasks=len(tasks)):
+            keys = _split_keys(X, y, tasks, seeds, test_size)
+            outputs = [cache.get(key) for key in keys]
+    pending = [i for i, out in enumerate(outputs) if out is None]
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = max(1, min(n_jobs, len(pending)))
+
+    if pending:
+        with stage("fit_predict", n_tasks=len(pending), n_jobs=n_jobs):
+            with split_pool(X, y, train, test, n_jobs) as run:
+                fitted = run(_fit_split, [tasks[i] for i in pending])
+        for i, out in zip(pending, fitted):
+            outputs[i] = out
+            if cache is not None:
+                cache.put(keys[i], out)
+
+    with stage("metrics"):
+        return _collect_results(outputs, names, len(seeds), y[test], n_classes)
+
+
+# ------------------------------
+# Adaptive number of splits
+# ------------------------------
+def _concat_results(parts):
+    return SplitResults(*(np.concatenate(arrays) for arrays in zip(*parts)))
+
+
+def ci_half_width(samples, confidence=0.95):
+    """Student-t confidence interval half-width of the mean, per column."""
+    from scipy.stats import t
+
+    samples = np.asarray(samples, dtype=np.float64)
+    n = samples.shape[0]
+    if n < 2:
+        return np.full(samples.shape[1:], np.inf)
+    sem = samples.std(axis=0, ddof=1) / np.sqrt(n)
+    return t.ppf(0.5 + confidence / 2.0, n - 1) * sem
+
+
+def settled(results, tol, confidence=0.95, metrics=TRACKED_METRICS):
+    """True when every tracked metric's interval half-width is at most ``tol``."""
+    return all(np.all(ci_half_width(getattr(results, m), confidence) <= tol) for m in metrics)
+
+
+def evaluate_adaptive(X, y, categories, tol=0.01, max_splits=200, batch=None, min_splits=None,
+                      confidence=0.95, metrics=TRACKED_METRICS, n_jobs=None, n_classes=None, **kwargs):
+    """evaluate_categories, adding splits until the metrics' intervals are narrow enough.
+
+    Splits are drawn in batches (seeds 0, 1, 2, ... as in the fixed mode) and
+    fitted in parallel. A category stops once the ``confidence`` interval of
+    the mean of every metric in ``metrics`` (every class for per-class ones)
+    is within +-``tol``, or after ``max_splits`` splits. Returns the results
+    and {category: True if it stopped on the tolerance}.
+    """
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    batch = batch or max(10, 2 * n_jobs)
+    min_splits = max(2, batch if min_splits is None else min_splits)
+    if n_classes is None:
+        n_classes = int(np.asarray(y).max()) + 1
+
+    parts = {name: [] for name in categories}
+    converged = {name: False for name in categories}
+    active = list(categories)
+    done = 0
+    while active and done < max_splits:
+        seeds = range(done, min(done + batch, max_splits))
+        with stage("adaptive_batch", first_seed=done, n_splits=len(seeds), categories=len(active)):
+            evaluation = evaluate_categories(X, y, {name: categories[name] for name in active}, seeds=seeds,
+                                             n_jobs=n_jobs, n_classes=n_classes, **kwargs)
+        done = seeds[-1] + 1
+        for name in list(active):
+            parts[name].append(evaluation[name])
+            if done >= min_splits and settled(_concat_results(parts[name]), tol, confidence, metrics):
+                converged[name] = True
+                active.remove(name)
+
+    return {name: _concat_results(parts[name]) for name in categories}, converged
@@ -0,0 +1,298 @@
+import argparse
+import itertools
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from profiling import stage
+from split_evaluation import DEFAULT_TREE_PARAMS, make_splits, split_pool, worker_arrays
+
+# ------------------------------
+# Feature-subset search
+# ------------------------------
+# Scores a feature subset by the mean test accuracy of a decision tree over
+# the same repeated 60:40 splits as murzyme_classical_classification.py, and
+# searches the subset space instead of relying on fixed category ranges:
+#
+#   exhaustive  every subset up to --max-size features
+#   forward     greedy: add the feature that helps most, one at a time
+#   backward    greedy: start from all features, drop the least useful one
+#   beam        forward search that keeps the --beam-width best subsets
+#
+# The encoded matrix and the split indices are built once and shared with a
+# process pool (split_evaluation.split_pool); each task fits one subset on
+# every split. A subset already scored by one strategy is never refitted.
+#
+# Pruning: no classifier that only sees the features in S can beat, on a test
+# set, predicting the majority label of each distinct value pattern of S.
+# That purity bound is the accuracy counterpart of the conditional entropy
+# H(y | x_S) behind information gain, and it is cheap (one bincount over the
+# test rows). Candidates whose mean bound cannot beat the subsets already
+# kept are skipped without fitting a tree; a pruned subset could at best tie.
+
+# Hand-picked groupings currently used by the scripts
+GROUPINGS = {
+    "murzyme_classical_classification.py": {
+        "Structure": list(range(0, 5)),
+        "Theoretical": list(range(5, 10)),
+        "Experimental": list(range(10, 20)),
+    },
+    "Ver4": {
+        "Structure": list(range(0, 5)),
+        "Theoretical": list(range(5, 7)),
+        "Experimental": list(range(7, 20)),
+    },
+}
+
+STRATEGIES = ("exhaustive", "forward", "backward", "beam")
+
+SubsetScore = namedtuple("SubsetScore", ["columns", "accuracy", "std", "bound", "found_by"])
+SubsetScore.__doc__ = """One evaluated subset.
+
+columns   sorted tuple of feature indices
+accuracy  mean test accuracy over the splits
+std       standard deviation of the per-split accuracies
+bound     mean pattern-purity upper bound of the accuracy
+found_by  strategy that first evaluated the subset
+"""
+
+
+# ------------------------------
+# Worker side
+# ------------------------------
+def _score_subset(task):
+    from sklearn.tree import DecisionTreeClassifier
+
+    columns, params = task
+    X, y, train, test = worker_arrays()
+    columns = list(columns)
+    accuracies = np.empty(len(train))
+    for s in range(len(train)):
+        clf = DecisionTreeClassifier(**params)
+        clf.fit(X[train[s]][:, columns], y[train[s]])
+        accuracies[s] = np.mean(clf.predict(X[test[s]][:, columns]) == y[test[s]])
+    return accuracies
+
+
+# ------------------------------
+# Upper bound
+# ------------------------------
+def purity_bound(X, y, test, columns, n_classes):
+    """Best accuracy any function of X[:, columns] can reach on each test split."""
+    if len(columns):
+        patterns = np.unique(X[:, list(columns)], axis=0, return_inverse=True)[1].ravel()
+    else:
+        patterns = np.zeros(len(y), dtype=np.int64)
+    n_patterns = int(patterns.max()) + 1
+    n_splits, n_test = test.shape
+    keys = (np.arange(n_splits)[:, None] * n_patterns + patterns[test]) * n_classes + y[test]
+    counts = np.bincount(keys.ravel(), minlength=n_splits * n_patterns * n_classes)
+    counts = counts.reshape(n_splits, n_patterns, n_classes)
+    return counts.max(axis=2).sum(axis=1) / n_test
+
+
+# ------------------------------
+# Search engine
+# ------------------------------
+class SubsetSearch:
+    """Evaluates feature subsets over fixed splits, with memoization and pruning.
+
+    Use as a context manager so the worker pool is shut down afterwards.
+    """
+
+    def __init__(self, X, y, n_splits=20, test_size=0.4, n_jobs=None, tree_params=None,
+                 keep=5, batch_size=None):
+        self.X = np.asarray(X)
+        self.y = np.unique(np.asarray(y), return_inverse=True)[1].ravel()
+        self.n_classes = int(self.y.max()) + 1
+        self.n_features = self.X.shape[1]
+        self.params = dict(DEFAULT_TREE_PARAMS if tree_params is None else tree_params)
+        self.keep = keep
+        self.n_jobs = (os.cpu_count() or 1) if n_jobs is None else n_jobs
+        self.batch_size = batch_size or max(8, 8 * self.n_jobs)
+
+        self.train, self.test = make_splits(len(self.y), range(n_splits), test_size)
+        self.scores = {}     # columns -> SubsetScore
+        self._bounds = {}    # columns -> mean bound
+        self.fitted = 0
+        self.pruned = 0
+        self._pool = None
+        self._run = None
+
+    def __enter__(self):
+        self._pool = split_pool(self.X, self.y, self.train, self.test, self.n_jobs)
+        self._run = self._pool.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        pool, self._pool, self._run = self._pool, None, None
+        return pool.__exit__(*exc)
+
+    # ------------------------------
+    # Scoring
+    # ------------------------------
+    def bound(self, columns):
+        columns = tuple(sorted(columns))
+        if columns not in self._bounds:
+            self._bounds[columns] = float(purity_bound(self.X, self.y, self.test, columns, self.n_classes).mean())
+        return self._bounds[columns]
+
+    def evaluate(self, candidates, strategy, keep=None):
+        """Score candidate subsets, best bound first.
+
+        With ``keep``, only the ``keep`` most accurate candidates matter:
+        once that many are scored, candidates whose bound cannot beat the
+        ``keep``-th best accuracy are skipped.
+        """
+        candidates = sorted({tuple(sorted(c)) for c in candidates}, key=lambda c: (-self.bound(c), c))
+        results = []
+        pending = []
+        limit = [None]   # keep-th best accuracy among the scored candidates
+
+        def flush():
+            fresh = [c for c in pending if c not in self.scores]
+            if fresh:
+                with stage("subset_fit", strategy=strategy, n_subsets=len(fresh)):
+                    outputs = self._run(_score_subset, [(c, self.params) for c in fresh])
+                for c, acc in zip(fresh, outputs):
+                    self.scores[c] = SubsetScore(c, float(acc.mean()), float(acc.std()), self.bound(c), strategy)
+                self.fitted += len(fresh)
+            results.extend(self.scores[c] for c in pending)
+            pending.clear()
+            if keep is not None and len(results) >= keep:
+                limit[0] = self._top(results, keep)[-1].accuracy
+
+        stop = len(candidates)
+        for i, c in enumerate(candidates):
+            if limit[0] is not None and self.bound(c) <= limit[0]:
+                stop = i
+                break
+            pending.append(c)
+            # Flush full batches, and flush early until ``keep`` scores exist
+            if len(pending) >= self.batch_size or (limit[0] is None and keep is not None
+                                                   and len(results) + len(pending) >= keep):
+                flush()
+        flush()
+        # Candidates are sorted by bound, so none after the first pruned one can win
+        self.pruned += len(candidates) - stop
+        return results
+
+    # ------------------------------
+    # Strategies
+    # ------------------------------
+    def _top(self, scored, n):
+        return sorted(scored, key=lambda s: (-s.accuracy, len(s.columns), s.columns))[:n]
+
+    def exhaustive(self, max_size):
+        """Top subsets of every size up to ``max_size``."""
+        return {
+            k: self._top(self.evaluate(itertools.combinations(range(self.n_features), k), "exhaustive", self.keep),
+                         self.keep)
+            for k in range(1, min(max_size, self.n_features) + 1)
+        }
+
+    def forward(self, max_size=None):
+        max_size = self.n_features if max_size is None else max_size
+        path, current = {}, ()
+        while len(current) < max_size:
+            candidates = [current + (j,) for j in range(self.n_features) if j not in current]
+            winner = self._top(self.evaluate(candidates, "forward", keep=1), 1)[0]
+            current = winner.columns
+            path[len(current)] = [winner]
+        return path
+
+    def backward(self, min_size=1):
+        current = tuple(range(self.n_features))
+        path = {len(current): self.evaluate([current], "backward")}
+        while len(current) > min_size:
+            candidates = [tuple(c for c in current if c != j) for j in current]
+            winner = self._top(self.evaluate(candidates, "backward", keep=1), 1)[0]
+            current = winner.columns
+            path[len(current)] = [winner]
+        return path
+
+    def beam(self, width, max_size=None):
+        max_size = self.n_features if max_size is None else max_size
+        best, frontier = {}, [()]
+        for k in range(1, max_size + 1):
+            candidates = {s + (j,) for s in frontier for j in range(self.n_features) if j not in s}
+            best[k] = self._top(self.evaluate(candidates, "beam", keep=width), width)
+            frontier = [s.columns for s in best[k]]
+        return best
+
+    def ranked(self, top=5):
+        """Best evaluated subsets per size: {size: [SubsetScore, ...]}."""
+        by_size = {}
+        for score in self.scores.values():
+            by_size.setdefault(len(score.columns), []).append(score)
+        return {k: self._top(v, top) for k, v in sorted(by_size.items())}
+
+
+# ------------------------------
+# Report
+# ------------------------------
+def format_table(ranked, feature_names, reference=None):
+    lines = []
+    for k, scores in ranked.items():
+        lines.append(f"Subsets of {k} feature{'s' if k > 1 else ''}:")
+        for rank, s in enumerate(scores, 1):
+            names = ", ".join(feature_names[j] for j in s.columns)
+            lines.append(f"  {rank}. accuracy {s.accuracy:.4f} ± {s.std:.4f} (bound {s.bound:.4f}, {s.found_by}): {names}")
+    if reference:
+        lines.append("Hand-picked groupings:")
+        for label, s in reference:
+            lines.append(f"  {label}: accuracy {s.accuracy:.4f} ± {s.std:.4f} ({len(s.columns)} features)")
+    return lines
+
+
+def main(argv=None):
+    from dataset_cache import load_dataset
+
+    parser = argparse.ArgumentParser(description="Search feature subsets for decision-tree accuracy")
+    parser.add_argument("data", nargs="?", default="Data_CM.xlsx", help="workbook laid out like Data_CM.xlsx")
+    parser.add_argument("--sheet", default="Sheet1")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES),
+                        help=f"comma-separated subset of {', '.join(STRATEGIES)}")
+    parser.add_argument("--max-size", type=int, default=3, help="largest subset for exhaustive search")
+    parser.add_argument("--beam-width", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="subsets listed per size")
+    parser.add_argument("--splits", type=int, default=20)
+    parser.add_argument("--n-jobs", type=int, default=None)
+    parser.add_argument("-o", "--output", help="also write the table to this file")
+    args = parser.parse_args(argv)
+
+    strategies = args.strategies.split(",")
+    unknown = set(strategies) - set(STRATEGIES)
+    if unknown:
+        parser.error(f"unknown strategy: {', '.join(sorted(unknown))}")
+
+    data = load_dataset(args.data, sheet_name=args.sheet)
+    with SubsetSearch(data.X, data.y, n_splits=args.splits, n_jobs=args.n_jobs, keep=args.top) as search:
+        if "exhaustive" in strategies:
+            search.exhaustive(args.max_size)
+        if "forward" in strategies:
+            search.forward()
+        if "backward" in strategies:
+            search.backward()
+        if "beam" in strategies:
+            search.beam(args.beam_width)
+
+        reference = []
+        for source, groups in GROUPINGS.items():
+            for name, columns in groups.items():
+                if max(columns) < data.n_features:
+                    score = search.evaluate([columns], "reference")[0]
+                    reference.append((f"{source} {name}", score))
+
+    lines = format_table(search.ranked(args.top), data.feature_names, reference)
+    lines.append(f"{search.fitted} subsets fitted, {search.pruned} pruned by the purity bound")
+    print("\n".join(lines))
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write("\n".join(lines))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pdb_features import extract_all, write_rows
+
+GOOD = (
+    "ATOM      1  CA  ALA A   1      11.104   6.134  -6.504  1.00  0.00           C\n"
+    "HETATM    2 FE   HEM A 101      12.000   6.000  -6.000  1.00  0.00          FE\n"
+    "HETATM    3  NA  HEM A 101      12.500   6.500  -6.500  1.00  0.00           N\n"
+)
+# Same file with an unparsable x coordinate
+BAD = GOOD.replace("11.104", "1x.1 4")
+
+
+def test_malformed_file_becomes_error_row(tmp_path):
+    bad, good = tmp_path / "bad.pdb", tmp_path / "good.pdb"
+    bad.write_text(BAD)
+    good.write_text(GOOD)
+
+    results = list(extract_all([str(bad), str(good)], n_jobs=1))
+    assert [path for path, _ in results] == [str(bad), str(good)]
+    assert results[0][1]["error"].startswith("ValueError")
+    assert results[1][1]["Heme"] == 1
+
+    out = io.StringIO()
+    n, failed, _ = write_rows(out, results)
+    assert (n, failed) == (2, 1)
+    assert out.getvalue().splitlines()[1:] == ["bad,,,,,", "good,1,0,0,0,"]
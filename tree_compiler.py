@@ -0,0 +1,307 @@
+import argparse
+import time
+
+import numpy as np
+
+# ------------------------------
+# Array-backed tree evaluator
+# ------------------------------
+# Flattens a fitted DecisionTreeClassifier, or every tree of a
+# RandomForestClassifier, into packed node arrays and evaluates whole batches
+# level by level: each step moves every (tree, row) pair one node down with a
+# single vectorized gather/compare. Leaves point to themselves, so running
+# max_depth steps lands every pair on its leaf.
+#
+# Decisions match sklearn exactly: X is cast to float32 like sklearn does and
+# compared against the same float64 thresholds with "<=", and NaN follows
+# each node's missing_go_to_left like sklearn >= 1.3 trees do.
+
+TREE_LEAF = -1  # sklearn.tree._tree.TREE_LEAF
+
+
+class CompiledForest:
+    """Packed node arrays for one or more decision trees.
+
+    feature    (n_nodes,) int32    split feature (0 for leaves)
+    threshold  (n_nodes,) float64  split threshold (go left if x <= threshold)
+    left       (n_nodes,) int32    left child; leaves point to themselves
+    right      (n_nodes,) int32    right child; leaves point to themselves
+    value      (n_nodes, n_classes) float64  normalized class distribution
+    leaf_class (n_nodes,) int32    argmax of value
+    roots      (n_trees,) int32    root node of every tree
+    missing_left (n_nodes,) uint8  1 where a NaN feature value goes left
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, max_depth, n_features,
+                 missing_left=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.leaf_class = np.argmax(value, axis=1).astype(np.int32)
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.missing_left = _missing_left(missing_left, len(feature))
+
+        # Evaluation layout: intp indices, interleaved (left, right) children
+        # and float32 thresholds rounded down, so "x <= t32" in float32 gives
+        # the same answer as sklearn's float32-vs-float64 "x <= t".
+        self._feature = feature.astype(np.intp)
+        self._children = np.stack([left, right], axis=1).astype(np.intp).ravel()
+        t32 = threshold.astype(np.float32)
+        self._threshold32 = np.where(t32 > threshold, np.nextafter(t32, np.float32(-np.inf)), t32)
+        self._value_t = np.ascontiguousarray(value.T)
+
+    @classmethod
+    def from_layout(cls, feature, children, threshold, threshold32, value_t, leaf_class, roots,
+                    classes, max_depth, n_features, missing_left=None):
+        """Wrap arrays already in evaluation layout without copying them.
+
+        feature     (n_nodes,) intp
+        children    (n_nodes, 2) intp, (left, right) per node
+        threshold32 (n_nodes,) float32, rounded down as in __init__
+        value_t     (n_classes, n_nodes) float64
+        Used by tree_store to evaluate directly on memory-mapped pages.
+        """
+        self = cls.__new__(cls)
+        self.feature = feature
+        self.threshold = threshold
+        self.left = children[:, 0]
+        self.right = children[:, 1]
+        self.value = value_t.T
+        self.leaf_class = leaf_class
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.missing_left = _missing_left(missing_left, len(feature))
+        self._feature = feature
+        self._children = children.reshape(-1)
+        self._threshold32 = threshold32
+        self._value_t = value_t
+        return self
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    # ------------------------------
+    # Evaluation
+    # ------------------------------
+    def apply(self, X):
+        """Leaf node of every (tree, row) pair, shape (n_trees, n_rows)."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"expected a (n_rows, {self.n_features}) matrix, got shape {X.shape}")
+
+        flat = X.ravel()
+        has_nan = bool(np.isnan(flat).any())
+        row_base = np.arange(X.shape[0], dtype=np.intp) * self.n_features
+        nodes = np.repeat(self.roots.astype(np.intp)[:, None], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            x = np.take(flat, np.take(self._feature, nodes) + row_base)
+            go_right = x > np.take(self._threshold32, nodes)  # False for NaN
+            if has_nan:
+                go_right |= np.isnan(x) & (np.take(self.missing_left, nodes) == 0)
+            nodes = np.take(self._children, (nodes << 1) | go_right)
+        return nodes
+
+    def predict_proba(self, X, batch_size=16384):
+        X = np.asarray(X, dtype=np.float32)
+        out = np.empty((X.shape[0], len(self.classes_)), dtype=np.float64)
+        for start in range(0, X.shape[0], batch_size):
+            leaves = self.apply(X[start:start + batch_size])
+            # Summed tree by tree, in order, like RandomForestClassifier
+            for c in range(out.shape[1]):
+                out[start:start + batch_size, c] = np.take(self._value_t[c], leaves).sum(axis=0)
+        out /= self.n_trees
+        return out
+
+    def predict(self, X, batch_size=16384):
+        X = np.asarray(X, dtype=np.float32)
+        if self.n_trees == 1:
+            codes = np.concatenate([
+                self.leaf_class[self.apply(X[start:start + batch_size])[0]]
+                for start in range(0, len(X), batch_size)
+            ]) if len(X) else np.empty(0, dtype=np.int32)
+        else:
+            codes = np.argmax(self.predict_proba(X, batch_size), axis=1)
+        return self.classes_[codes]
+
+
+# ------------------------------
+# Flattening sklearn models
+# ------------------------------
+def _missing_left(missing_left, n_nodes):
+    # Trees from before sklearn 1.3 (and older stores) send NaN left everywhere
+    if missing_left is None:
+        return np.ones(n_nodes, dtype=np.uint8)
+    return np.asarray(missing_left, dtype=np.uint8)
+
+
+def _tree_arrays(tree_, offset):
+    left = tree_.children_left.astype(np.int64)
+    right = tree_.children_right.astype(np.int64)
+    idx = np.arange(tree_.node_count)
+    leaf = left == TREE_LEAF
+
+    feature = np.where(leaf, 0, tree_.feature).astype(np.int32)
+    threshold = np.where(leaf, np.inf, tree_.threshold)
+    left = np.where(leaf, idx, left) + offset
+    right = np.where(leaf, idx, right) + offset
+
+    value = tree_.value[:, 0, :].astype(np.float64)
+    normalizer = value.sum(axis=1, keepdims=True)
+    normalizer[normalizer == 0.0] = 1.0
+    missing_left = _missing_left(getattr(tree_, "missing_go_to_left", None), tree_.node_count)
+    return feature, threshold, left.astype(np.int32), right.astype(np.int32), value / normalizer, missing_left
+
+
+def compile_forest(model):
+    """CompiledForest for a DecisionTreeClassifier or RandomForestClassifier."""
+    estimators = getattr(model, "estimators_", [model])
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("multi-output trees are not supported")
+
+    parts, roots, offset, max_depth = [], [], 0, 0
+    for est in estimators:
+        tree_ = est.tree_
+        parts.append(_tree_arrays(tree_, offset))
+        roots.append(offset)
+        offset += tree_.node_count
+        max_depth = max(max_depth, tree_.max_depth)
+
+    feature, threshold, left, right, value, missing_left = (np.concatenate(arrays) for arrays in zip(*parts))
+    return CompiledForest(
+        feature, threshold, left, right, value,
+        roots=np.asarray(roots, dtype=np.int32),
+        classes=np.asarray(model.classes_),
+        max_depth=max_depth,
+        n_features=model.n_features_in_,
+        missing_left=missing_left,
+    )
+
+
+# ------------------------------
+# C-style if/else code generation (Ver4/trainedTree.py)
+# ------------------------------
+def generate_if_else_code(tree, feature_names, label_encoder, reverse_maps):
+    tree_ = tree.tree_
+    feature_name = [
+        feature_names[i] if i != -2 else "undefined!"
+        for i in tree_.feature
+    ]
+
+    def recurse(node, depth):
+        indent = "    " * depth
+        if tree_.feature[node] != -2:
+            name = feature_name[node]
+            threshold = tree_.threshold[node]
+            threshold = int(threshold + 0.5)
+
+            if name in reverse_maps:
+                val = reverse_maps[name].get(threshold, f"<UNK_{threshold}>")
+                left = recurse(tree_.children_left[node], depth + 1)
+                right = recurse(tree_.children_right[node], depth + 1)
+                return (
+                    f'{indent}if (strcmp({name}, "{val}") == 0) {{\n'
+                    f'{left}\n{indent}}} else {{\n{right}\n{indent}}}'
+                )
+            else:
+                left = recurse(tree_.children_left[node], depth + 1)
+                right = recurse(tree_.children_right[node], depth + 1)
+                return (
+                    f"{indent}if ({name} <= {threshold}) {{\n"
+                    f"{left}\n{indent}}} else {{\n{right}\n{indent}}}"
+                )
+        else:
+            value = np.argmax(tree_.value[node])
+            class_name = label_encoder.inverse_transform([value])[0]
+            return f'{indent}return "{class_name}";'
+
+    return recurse(0, 0)
+
+
+# ------------------------------
+# Equivalence check and benchmark
+# ------------------------------
+def check_identical(model, compiled, X, nan_fraction=0.2, seed=0):
+    """True when the compiled evaluator reproduces model.predict on X.
+
+    X is checked as given and again with ``nan_fraction`` of its cells set
+    to NaN, so missing-value routing is covered too.
+    """
+    if not np.array_equal(model.predict(X), compiled.predict(X)):
+        return False
+    values = np.asarray(X, dtype=np.float32)
+    nan = np.random.default_rng(seed).random(values.shape) < nan_fraction
+    X_nan = X.astype(np.float32).mask(nan) if hasattr(X, "mask") else np.where(nan, np.float32(np.nan), values)
+    try:
+        expected = model.predict(X_nan)
+    except ValueError:
+        return True  # this model rejects NaN input, so there is no routing to match
+    return bool(np.array_equal(expected, compiled.predict(X_nan)))
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark(model, X, repeat=3):
+    """Time sklearn predict against the compiled evaluator on the same rows."""
+    compiled = compile_forest(model)
+    sklearn_s = _best_of(lambda: model.predict(X), repeat)
+    compiled_s = _best_of(lambda: compiled.predict(X), repeat)
+    return {
+        "rows": len(X),
+        "trees": compiled.n_trees,
+        "nodes": compiled.n_nodes,
+        "sklearn_s": sklearn_s,
+        "compiled_s": compiled_s,
+        "speedup": sklearn_s / compiled_s if compiled_s > 0 else float("inf"),
+        "identical": check_identical(model, compiled, X),
+    }
+
+
+def main(argv=None):
+    from sklearn.tree import DecisionTreeClassifier
+
+    from random_forest import features, train_data, train_labels, train_forest
+
+    parser = argparse.ArgumentParser(description="Benchmark the compiled tree evaluator against sklearn predict")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # Random vectors over the 20-feature schema (binary and 0-3 ordinals)
+    rng = np.random.default_rng(args.seed)
+    X = rng.integers(0, 4, size=(args.rows, len(features))).astype(np.float32)
+
+    models = {
+        "DecisionTree": DecisionTreeClassifier(random_state=42).fit(train_data, train_labels),
+        "RandomForest (1 core)": train_forest(n_jobs=1),
+    }
+    for name, model in models.items():
+        r = benchmark(model, X, args.repeat)
+        print(
+            f"{name}: {r['rows']} rows, {r['trees']} trees, {r['nodes']} nodes | "
+            f"sklearn {r['sklearn_s']:.3f}s, compiled {r['compiled_s']:.3f}s "
+            f"({r['speedup']:.1f}x) | identical = {r['identical']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
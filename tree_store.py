@@ -0,0 +1,248 @@
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from tree_compiler import CompiledForest
+
+# ------------------------------
+# Memory-mappable model file
+# ------------------------------
+# Ver4/trainedTree.py used to pickle one DecisionTreeClassifier per feature
+# category. Loading a pickle rebuilds the sklearn object graph (and imports
+# sklearn); this format stores what prediction needs as raw arrays in one
+# file instead:
+#
+#   b"MURTREE1" | header length (uint64 LE) | JSON header | padding | arrays
+#
+# The header lists, per category, the feature columns, the reverse_maps of
+# the label encoder, the tree classes and the offset/dtype/shape of every
+# node array. Arrays are stored in tree_compiler's evaluation layout and
+# 64-byte aligned, so a category is loaded as zero-copy views on a shared
+# read-only mmap: nothing is parsed until a category is requested, and every
+# process that opens the file evaluates on the same page-cache pages.
+
+MAGIC = b"MURTREE1"
+FORMAT_VERSION = 1
+ALIGN = 64
+
+# name -> CompiledForest attribute, in file order
+LAYOUT = (
+    ("feature", "_feature"),
+    ("children", "_children"),
+    ("threshold", "threshold"),
+    ("threshold32", "_threshold32"),
+    ("value_t", "_value_t"),
+    ("leaf_class", "leaf_class"),
+    ("roots", "roots"),
+    ("missing_left", "missing_left"),
+)
+
+
+def _layout_arrays(compiled):
+    arrays = {name: getattr(compiled, attr) for name, attr in LAYOUT}
+    arrays["feature"] = arrays["feature"].astype("<i8")
+    arrays["children"] = arrays["children"].astype("<i8").reshape(-1, 2)
+    return {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+
+
+def _to_builtin(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _pad(n):
+    return (-n) % ALIGN
+
+
+# ------------------------------
+# Writing
+# ------------------------------
+def write_store(path, categories, label_classes):
+    """Write trained category trees to ``path``.
+
+    ``categories`` maps a name to a dict with keys
+      model         fitted DecisionTreeClassifier/RandomForestClassifier
+                    (or a CompiledForest)
+      columns       feature indices the model was trained on
+      feature_names names of those features
+      reverse_maps  {feature name: {code: original value}} for encoded features
+    ``label_classes`` decodes the model's class codes into original labels.
+    """
+    from tree_compiler import compile_forest
+
+    header = {"version": FORMAT_VERSION, "label_classes": [_to_builtin(c) for c in label_classes],
+              "categories": {}}
+    blobs = []
+    offset = 0
+    for name, entry in categories.items():
+        model = entry["model"]
+        compiled = model if isinstance(model, CompiledForest) else compile_forest(model)
+        described = {}
+        for array_name, array in _layout_arrays(compiled).items():
+            described[array_name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+            blobs.append((offset, array))
+            offset += array.nbytes + _pad(array.nbytes)
+        header["categories"][name] = {
+            "columns": [int(c) for c in entry["columns"]],
+            "feature_names": list(entry["feature_names"]),
+            "reverse_maps": {
+                col: {str(code): _to_builtin(v) for code, v in rev.items()}
+                for col, rev in entry.get("reverse_maps", {}).items()
+            },
+            "classes": [_to_builtin(c) for c in compiled.classes_],
+            "max_depth": compiled.max_depth,
+            "n_features": compiled.n_features,
+            "arrays": described,
+        }
+
+    encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    prefix = len(MAGIC) + 8 + len(encoded)
+    data_start = prefix + _pad(prefix)
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(encoded)))
+        f.write(encoded)
+        f.write(b"\0" * _pad(prefix))
+        for blob_offset, array in blobs:
+            assert f.tell() == data_start + blob_offset
+            f.write(array.tobytes())
+            f.write(b"\0" * _pad(array.nbytes))
+    os.replace(tmp, path)
+
+
+# ------------------------------
+# Reading
+# ------------------------------
+class CategoryModel:
+    """One category of a TreeStore: compiled trees plus their encoders."""
+
+    def __init__(self, name, compiled, columns, feature_names, reverse_maps, label_classes):
+        self.name = name
+        self.compiled = compiled
+        self.columns = columns
+        self.feature_names = feature_names
+        self.reverse_maps = reverse_maps
+        self.label_classes = label_classes
+        self._encoders = {
+            col: {value: code for code, value in rev.items()} for col, rev in reverse_maps.items()
+        }
+
+    def predict_codes(self, X):
+        """Encoded class of every row of the category's (encoded) feature matrix."""
+        return self.compiled.predict(X)
+
+    def predict(self, X):
+        """Original labels for an encoded (n_rows, len(columns)) matrix."""
+        codes = np.asarray(self.predict_codes(X), dtype=np.int64)
+        return [self.label_classes[c] for c in codes]
+
+    def encode(self, rows):
+        """Encode raw rows (original cell values, in feature order) for predict()."""
+        X = np.empty((len(rows), len(self.feature_names)), dtype=np.float32)
+        for i, row in enumerate(rows):
+            for j, (name, value) in enumerate(zip(self.feature_names, row)):
+                encoder = self._encoders.get(name)
+                if encoder is None:
+                    X[i, j] = value
+                elif value in encoder:
+                    X[i, j] = encoder[value]
+                else:
+                    raise ValueError(f"{name!r}: value {value!r} was not seen in training")
+        return X
+
+
+class TreeStore:
+    """Read-only, lazily loaded view of a file written by write_store()."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a tree store")
+        (length,) = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(bytes(self._mmap[start:start + length]).decode("utf-8"))
+        if self.header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported format version {self.header.get('version')}")
+        self._data_start = start + length + _pad(start + length)
+        self.label_classes = self.header["label_classes"]
+        self._loaded = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._loaded.clear()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Arrays handed out earlier still reference the mapping; it is
+            # released when they are garbage collected
+            pass
+
+    @property
+    def categories(self):
+        return list(self.header["categories"])
+
+    def __contains__(self, name):
+        return name in self.header["categories"]
+
+    def __getitem__(self, name):
+        if name not in self._loaded:
+            self._loaded[name] = self._load(name)
+        return self._loaded[name]
+
+    def _array(self, spec):
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"])) if spec["shape"] else 1
+        array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=self._data_start + spec["offset"])
+        return array.reshape(spec["shape"])
+
+    def _load(self, name):
+        meta = self.header["categories"][name]
+        arrays = {key: self._array(spec) for key, spec in meta["arrays"].items()}
+        if np.dtype(np.intp) != arrays["feature"].dtype:
+            # 32-bit platforms index with int32: one copy of the index arrays
+            arrays["feature"] = arrays["feature"].astype(np.intp)
+            arrays["children"] = arrays["children"].astype(np.intp)
+        compiled = CompiledForest.from_layout(
+            arrays["feature"], arrays["children"], arrays["threshold"], arrays["threshold32"],
+            arrays["value_t"], arrays["leaf_class"], arrays["roots"],
+            classes=np.asarray(meta["classes"]),
+            max_depth=meta["max_depth"],
+            n_features=meta["n_features"],
+            missing_left=arrays.get("missing_left"),  # absent in stores written before NaN routing
+        )
+        reverse_maps = {
+            col: {int(code): v for code, v in rev.items()} for col, rev in meta["reverse_maps"].items()
+        }
+        return CategoryModel(name, compiled, meta["columns"], meta["feature_names"], reverse_maps,
+                             self.label_classes)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Describe a model store written by Ver4/trainedTree.py")
+    parser.add_argument("path", nargs="?", default=os.path.join("Ver4", "models.trees"))
+    args = parser.parse_args(argv)
+
+    with TreeStore(args.path) as store:
+        print(f"{args.path}: {os.path.getsize(args.path)} bytes, labels {store.label_classes}")
+        for name in store.categories:
+            compiled = store[name].compiled
+            print(f"  {name}: {compiled.n_trees} tree(s), {compiled.n_nodes} nodes, depth {compiled.max_depth}, "
+                  f"features {', '.join(store[name].feature_names)}")
+
+
+if __name__ == "__main__":
+    main()